@@ -1,38 +1,236 @@
 # app.py
 import json
 import os
-from flask import Flask, request, jsonify
-from asin_api import fetch_asins
-from star_scraper import scrap_from_amazon
-from screener import Screener
+import threading
+from contextlib import nullcontext
+from flask import (
+    Blueprint,
+    Flask,
+    Response,
+    current_app,
+    request,
+    jsonify,
+    stream_with_context,
+    url_for,
+)
+from jobs import JobManager
+from metrics import (
+    ASIN_RESOLVE_SECONDS,
+    REGISTRY,
+    REQUEST_SECONDS,
+    SKU_PROCESS_SECONDS,
+    get_trace,
+    span,
+    start_trace,
+)
 
-app = Flask(__name__)
+# Nothing heavy is imported or created at import time: LangChain/OpenAI,
+# Selenium and the ASIN client are loaded by the first request that needs
+# them, so a cold start only pays for Flask.
+routes = Blueprint("reviews", __name__)
 
-# Initialize the Screener instance for screening non-compliant reviews
-screener = Screener()
 
-@app.route('/process_reviews', methods=['POST'])
+class ReviewService:
+    """
+    Lazily built dependencies of the API. The screener (and its ChatOpenAI
+    client) is created on first use; the scraper and ASIN modules are
+    imported on first use.
+    """
+
+    def __init__(self, job_workers: int = 2, screener=None) -> None:
+        self._screener = screener
+        self._lock = threading.Lock()
+        # Background jobs: several SKUs are processed at once, bounded by JOB_WORKERS
+        self.job_manager = JobManager(
+            resolve_asins=self.resolve_asins,
+            process_sku=self.process_sku,
+            max_workers=job_workers,
+        )
+
+    @property
+    def screener(self):
+        with self._lock:
+            if self._screener is None:
+                from screener import Screener
+
+                # Initialize the Screener instance for screening non-compliant reviews
+                self._screener = Screener()
+            return self._screener
+
+    def resolve_asins(self, sku_list: list) -> dict:
+        """Map each SKU to its ASIN."""
+        from asin_api import resolve_asins
+
+        with ASIN_RESOLVE_SECONDS.time():
+            return resolve_asins(sku_list)
+
+    def process_sku(self, asin: str, sku: str, full_refresh: bool = False) -> list:
+        """Scrape and screen one SKU, returning its non-compliant reviews."""
+        from star_scraper import record_screened, stream_from_amazon
+
+        screener = self.screener
+        with span("sku", sku=sku, asin=asin), SKU_PROCESS_SECONDS.time():
+            # Reviews are screened while later pages are still being scraped
+            reviews_data = {}
+            unscreened = []
+            reviews = stream_from_amazon(
+                asin_number=asin, full_refresh=full_refresh, reviews_data=reviews_data
+            )
+            results = screener.process_review_stream(
+                reviews, asin, sku=sku, unscreened=unscreened
+            )
+            # Only now, so reviews whose screening failed are scraped again
+            record_screened(asin, reviews_data, unscreened)
+            return results
+
+
+def create_app(service: ReviewService = None) -> Flask:
+    """
+    Build the Flask app.
+
+    Args:
+        service (ReviewService, optional): Dependencies to serve with. Defaults
+            to a lazily initialized one sized by the JOB_WORKERS env var.
+
+    Returns:
+        Flask: The configured application.
+    """
+    flask_app = Flask(__name__)
+    if service is None:
+        service = ReviewService(job_workers=int(os.environ.get("JOB_WORKERS", 2)))
+    flask_app.extensions["review_service"] = service
+    flask_app.register_blueprint(routes)
+    return flask_app
+
+
+def _service() -> ReviewService:
+    return current_app.extensions["review_service"]
+
+
+@routes.route('/healthz', methods=['GET'])
+def healthz():
+    """
+    Liveness check that touches none of the lazily loaded dependencies.
+    """
+    return jsonify({"status": "ok"})
+
+
+@routes.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Counters and histograms for every stage, in the Prometheus text format.
+    """
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
+@routes.route('/process_reviews', methods=['POST'])
 def process_reviews():
     """
     Endpoint to process reviews based on SKU.
-    Expects a JSON payload with SKU codes.
+    Expects a JSON payload with SKU codes. With `?trace=1` (or an
+    `X-Trace: 1` header) the request's spans are recorded and the
+    `X-Trace-Id` response header names them for `/traces/<trace_id>`.
     """
     data = request.json
     sku_list = data.get("sku_list", [])
+    # Re-scrape every review instead of only those newer than the last run
+    full_refresh = data.get("full_refresh", False)
+    traced = "1" in (request.args.get("trace"), request.headers.get("X-Trace"))
+
+    service = _service()
+    tracing = start_trace("process_reviews") if traced else nullcontext()
+    with tracing as trace, REQUEST_SECONDS.time(endpoint="process_reviews"):
+        # Fetch ASINs for the given list of SKU codes
+        asins = service.resolve_asins(sku_list)
+        all_non_compliant_reviews = {}
+
+        for sku, asin in asins.items():
+            non_compliant_reviews = service.process_sku(
+                asin, sku, full_refresh=full_refresh
+            )
+            if non_compliant_reviews:
+                all_non_compliant_reviews[sku] = non_compliant_reviews
+
+    response = jsonify(all_non_compliant_reviews)
+    if trace is not None:
+        response.headers["X-Trace-Id"] = trace.id
+    return response
+
+
+@routes.route('/traces/<trace_id>', methods=['GET'])
+def trace_spans(trace_id):
+    """
+    Spans of a recent traced request, ordered by start time.
+    """
+    trace = get_trace(trace_id)
+    if trace is None:
+        return jsonify({"error": "trace not found"}), 404
+    return jsonify(trace.to_dict())
+
+
+@routes.route('/jobs', methods=['POST'])
+def create_job():
+    """
+    Start processing a SKU list in the background.
+    Expects the same JSON payload as /process_reviews and returns the job ID
+    with the URLs for its status and streamed results.
+    """
+    data = request.json or {}
+    job = _service().job_manager.submit(
+        data.get("sku_list", []), full_refresh=data.get("full_refresh", False)
+    )
+    return (
+        jsonify(
+            {
+                "job_id": job.id,
+                "status": job.status,
+                "status_url": url_for("reviews.job_status", job_id=job.id),
+                "results_url": url_for("reviews.job_results", job_id=job.id),
+            }
+        ),
+        202,
+    )
+
+
+@routes.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """
+    Job status with per-SKU progress.
+    """
+    job = _service().job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "job not found"}), 404
+    return jsonify(job.to_dict())
+
+
+@routes.route('/jobs/<job_id>/results', methods=['GET'])
+def job_results(job_id):
+    """
+    Stream each SKU's result as soon as it is ready, as NDJSON by default or
+    as server-sent events when the client accepts text/event-stream.
+    """
+    job = _service().job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "job not found"}), 404
+    sse = request.accept_mimetypes.best == "text/event-stream"
 
-    # Fetch ASINs for the given list of SKU codes
-    asins = fetch_asins(skus=sku_list)
-    all_non_compliant_reviews = {}
+    def generate():
+        for event in job.iter_events():
+            if event is None:
+                # Keep-alive so proxies don't time out an idle stream
+                yield ": keep-alive\n\n" if sse else "\n"
+            elif sse:
+                yield f"data: {json.dumps(event)}\n\n"
+            else:
+                yield json.dumps(event) + "\n"
 
-    for asin, sku in zip(asins, sku_list):
-        # Scrape reviews from Amazon for the given ASIN and SKU number
-        scrap_data = scrap_from_amazon(asin_number=asin, sky_number=sku)
-        # Process the scraped reviews to find non-compliant ones
-        non_compliant_reviews = screener.process_reviews(scrap_data)
-        if non_compliant_reviews:
-            all_non_compliant_reviews[sku] = non_compliant_reviews
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-    return jsonify(all_non_compliant_reviews)
+app = create_app()
 
 if __name__ == '__main__':
     # Ensure the app runs on the specified host and port for Google Cloud
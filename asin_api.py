@@ -1,26 +1,196 @@
 # asin_api.py
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union
+
 import requests
+from requests.adapters import HTTPAdapter
 
+ASIN_API_URL = "https://bcp-ai.vercel.app/api/bigquery/demand/fetchasins"
 
-def fetch_asins(skus: list) -> list[str]:
-    url = "https://bcp-ai.vercel.app/api/bigquery/demand/fetchasins"
-    headers = {"Content-Type": "application/json"}
 
-    # Ensure the SKUs are formatted correctly in the request body
-    skus_str = ", ".join(f"'{sku}'" for sku in skus)
-    body = {"sku": skus_str}
+class AsinResolver:
+    """
+    SKU -> ASIN lookups against the demand API, with a TTL'd in-memory and
+    on-disk (SQLite) cache. Uncached SKUs are looked up in chunks, several
+    chunks at a time, over one pooled keep-alive session.
+    """
+
+    def __init__(
+        self,
+        url: str = ASIN_API_URL,
+        cache_path: Union[str, None] = "asin_cache.sqlite3",
+        ttl_seconds: float = 24 * 3600,
+        chunk_size: int = 100,
+        max_workers: int = 4,
+        timeout: float = 30,
+        session=None,
+    ) -> None:
+        self.url = url
+        self.ttl_seconds = ttl_seconds
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.timeout = timeout
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_maxsize=max_workers))
+        self.session = session
+        self._memory = {}
+        self._lock = threading.Lock()
+        self._conn = None
+        if cache_path:
+            self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS asin_cache"
+                " (sku TEXT PRIMARY KEY, asin TEXT NOT NULL, fetched_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def _cached(self, skus: list) -> dict:
+        now = time.time()
+        found = {}
+        with self._lock:
+            for sku in skus:
+                entry = self._memory.get(sku)
+                if entry and now - entry[1] < self.ttl_seconds:
+                    found[sku] = entry[0]
+            missing = [sku for sku in skus if sku not in found]
+            if self._conn is not None and missing:
+                for start in range(0, len(missing), 500):
+                    chunk = missing[start : start + 500]
+                    rows = self._conn.execute(
+                        "SELECT sku, asin, fetched_at FROM asin_cache WHERE sku IN"
+                        f" ({','.join('?' * len(chunk))}) AND fetched_at > ?",
+                        [*chunk, now - self.ttl_seconds],
+                    ).fetchall()
+                    for sku, asin, fetched_at in rows:
+                        found[sku] = asin
+                        self._memory[sku] = (asin, fetched_at)
+        return found
+
+    def _store(self, mapping: dict) -> None:
+        now = time.time()
+        with self._lock:
+            for sku, asin in mapping.items():
+                self._memory[sku] = (asin, now)
+            if self._conn is not None and mapping:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO asin_cache (sku, asin, fetched_at)"
+                    " VALUES (?, ?, ?)",
+                    [(sku, asin, now) for sku, asin in mapping.items()],
+                )
+                self._conn.commit()
+
+    def _lookup_chunk(self, skus: list) -> dict:
+        # Ensure the SKUs are formatted correctly in the request body
+        skus_str = ", ".join(f"'{sku}'" for sku in skus)
+        try:
+            response = self.session.post(
+                self.url,
+                json={"sku": skus_str},
+                headers={"Content-Type": "application/json"},
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            print(f"Failed to fetch ASINs for {len(skus)} SKUs: {e}")
+            return {}
+        if response.status_code != 200:
+            print(f"Failed to fetch ASINs, Status Code: {response.status_code}")
+            return {}
+
+        items = response.json()
+        mapping = {}
+        unkeyed = 0
+        for item in items:
+            sku = item.get("sku") or item.get("SKU")
+            if sku is None:
+                unkeyed += 1
+            elif sku in skus and item.get("asin"):
+                mapping[sku] = item["asin"]
+        if not unkeyed:
+            return mapping
+        if len(skus) == 1:
+            # A lone reply can only be for the lone SKU
+            if len(items) == 1 and items[0].get("asin"):
+                return {skus[0]: items[0]["asin"]}
+            print(f"Got {len(items)} ASINs without SKU keys for {skus[0]}; skipping it")
+            return {}
+        # Replies without a SKU cannot be matched to one (the endpoint does
+        # not keep request order), so look the rest up one SKU at a time
+        rest = [sku for sku in skus if sku not in mapping]
+        print(
+            f"Got {unkeyed} ASINs without SKU keys for {len(skus)} SKUs;"
+            f" looking up {len(rest)} SKUs one by one"
+        )
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for single in executor.map(self._lookup_chunk, [[sku] for sku in rest]):
+                mapping.update(single)
+        return mapping
+
+    def resolve(self, skus: list) -> dict:
+        """
+        Map SKUs to ASINs.
+
+        Args:
+            skus (list): SKU codes; duplicates are looked up once.
 
-    response = requests.post(url, json=body, headers=headers)
+        Returns:
+            dict: ASIN by SKU. SKUs that could not be resolved are absent.
+        """
+        skus = list(dict.fromkeys(skus))
+        mapping = self._cached(skus)
+        missing = [sku for sku in skus if sku not in mapping]
+        chunks = [
+            missing[i : i + self.chunk_size]
+            for i in range(0, len(missing), self.chunk_size)
+        ]
+        if len(chunks) == 1:
+            fetched = [self._lookup_chunk(chunks[0])]
+        elif chunks:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                fetched = list(executor.map(self._lookup_chunk, chunks))
+        else:
+            fetched = []
+        for chunk_mapping in fetched:
+            self._store(chunk_mapping)
+            mapping.update(chunk_mapping)
+        if missing:
+            print(
+                f"ASINs: {len(skus) - len(missing)} cached,"
+                f" {sum(map(len, fetched))}/{len(missing)} fetched"
+            )
+        return {sku: mapping[sku] for sku in skus if sku in mapping}
 
-    if response.status_code == 200:
-        print("ASINs fetched successfully!")
-        response_json = response.json()
-        asin_list = [item["asin"] for item in response_json]
-        return asin_list
-    else:
-        print(f"Failed to fetch ASINs, Status Code: {response.status_code}")
-        return None
+
+_default_resolver = None
+_default_resolver_lock = threading.Lock()
+
+
+def default_resolver() -> AsinResolver:
+    """Process-wide resolver caching to ASIN_CACHE_PATH (default asin_cache.sqlite3)."""
+    global _default_resolver
+    with _default_resolver_lock:
+        if _default_resolver is None:
+            _default_resolver = AsinResolver(
+                cache_path=os.getenv("ASIN_CACHE_PATH", "asin_cache.sqlite3")
+            )
+        return _default_resolver
+
+
+def resolve_asins(skus: list) -> dict:
+    """Map SKUs to ASINs with the default resolver."""
+    return default_resolver().resolve(skus)
+
+
+def fetch_asins(skus: list) -> list[str]:
+    """ASINs aligned with `skus`, None where a SKU could not be resolved."""
+    mapping = resolve_asins(skus)
+    return [mapping.get(sku) for sku in skus]
 
 
-asins = fetch_asins(["SKY6105"])
-print(asins)
+if __name__ == "__main__":
+    asins = resolve_asins(["SKY6105"])
+    print(asins)
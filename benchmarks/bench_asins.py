@@ -0,0 +1,57 @@
+# benchmarks/bench_asins.py
+"""
+SKU -> ASIN resolution against an in-process stand-in of the demand API:
+cold lookups (chunked, concurrent) versus warm lookups served by the cache.
+
+    python -m benchmarks.bench_asins --skus 5000 --latency 0.2
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from asin_api import AsinResolver
+from benchmarks.fakes import FakeAsinEndpoint
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--skus", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--chunk-size", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    catalog = {f"SKU{i:06d}": f"B0{i:08d}" for i in range(args.skus)}
+    skus = list(catalog)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "asin_cache.sqlite3")
+        endpoint = FakeAsinEndpoint(catalog, latency=args.latency, shuffle=True)
+
+        def resolver() -> AsinResolver:
+            return AsinResolver(
+                cache_path=cache_path,
+                chunk_size=args.chunk_size,
+                max_workers=args.workers,
+                session=endpoint,
+            )
+
+        cold = resolver()
+        for label, run in (
+            ("cold", cold),
+            ("warm (memory)", cold),
+            ("warm (disk)", resolver()),
+        ):
+            calls = endpoint.calls
+            start = time.perf_counter()
+            mapping = run.resolve(skus)
+            elapsed = time.perf_counter() - start
+            assert mapping == catalog, "misaligned SKU -> ASIN mapping"
+            print(
+                f"{label:>14}: {elapsed * 1000:8.1f} ms,"
+                f" {endpoint.calls - calls} remote calls"
+            )
+
+
+if __name__ == "__main__":
+    main()
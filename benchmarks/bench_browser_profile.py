@@ -0,0 +1,227 @@
+# benchmarks/bench_browser_profile.py
+"""
+Per-page bandwidth, load time and memory of the "default" and "scrape"
+`Browser` profiles, on the recorded review pages served from localhost.
+
+    python -m benchmarks.bench_browser_profile --loads 20
+    python -m benchmarks.bench_browser_profile --profiles scrape --tracker-delay 0.5
+
+Each fixture page is served with the subresources a real review page pulls
+in: product and avatar images, a web font, a video, an ad script and
+metrics beacons, all under paths that keep their real host names (so the
+scrape profile's URL blocking applies). Both profiles run headless so only
+the profile differs. Needs Chrome; memory is the RSS of the whole browser
+process tree when psutil is installed, otherwise the page's JS heap.
+"""
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from benchmarks.review_pages import load_fixtures
+from star_scraper import BROWSER_PROFILES, Browser
+
+# path prefix -> (kind, bytes, content type)
+RESOURCES = {
+    "/m.media-amazon.com/images/": ("image", 45_000, "image/jpeg"),
+    "/images-na.ssl-images-amazon.com/": ("image", 8_000, "image/png"),
+    "/m.media-amazon.com/fonts/": ("font", 60_000, "font/woff2"),
+    "/m.media-amazon.com/video/": ("media", 400_000, "video/mp4"),
+    "/aax-us-east.amazon-adsystem.com/": ("tracker", 30_000, "application/javascript"),
+    "/fls-na.amazon.com/": ("tracker", 43, "image/gif"),
+    "/unagi.amazon.com/": ("tracker", 43, "image/gif"),
+}
+SUBRESOURCES_HEAD = """
+<style>@font-face{font-family:Ember;src:url(/m.media-amazon.com/fonts/AmazonEmber_Rg.woff2)}
+body{font-family:Ember,Arial}</style>
+<script async src="/aax-us-east.amazon-adsystem.com/e/dtb/bid.js"></script>
+"""
+
+
+def subresources_body(images: int) -> str:
+    tags = [
+        f'<img src="/m.media-amazon.com/images/I/{i:02d}._SL1500_.jpg" alt="">'
+        for i in range(images)
+    ]
+    tags.append(
+        '<video src="/m.media-amazon.com/video/review-video.mp4" preload="auto" muted></video>'
+    )
+    tags.append('<img src="/fls-na.amazon.com/1/batch/1/OE/" width="1" height="1" alt="">')
+    tags.append('<img src="/unagi.amazon.com/1/events/com.amazon.csm.csa.prod" width="1" height="1" alt="">')
+    return "\n".join(tags)
+
+
+class RecordedPageSite:
+    """
+    Serves the fixture pages at `/page/<name>` with their subresources, and
+    counts requests and bytes by kind. Trackers answer after
+    `tracker_delay` seconds, other subresources after `asset_delay`.
+    """
+
+    def __init__(self, images: int = 12, asset_delay: float = 0.03, tracker_delay: float = 0.3) -> None:
+        local = "/images-na.ssl-images-amazon.com/"
+        self.pages = {
+            name: html.replace("https://images-na.ssl-images-amazon.com/", local)
+            .replace("</head>", SUBRESOURCES_HEAD + "</head>", 1)
+            .replace("</body>", subresources_body(images) + "</body>", 1)
+            for name, html in load_fixtures().items()
+        }
+        self.asset_delay = asset_delay
+        self.tracker_delay = tracker_delay
+        self.requests = {}
+        self.bytes = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, kind: str, size: int) -> None:
+        with self._lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+            self.bytes[kind] = self.bytes.get(kind, 0) + size
+
+    def reset(self) -> tuple[dict, dict]:
+        with self._lock:
+            counts = (self.requests, self.bytes)
+            self.requests, self.bytes = {}, {}
+        return counts
+
+    def start(self) -> "RecordedPageSite":
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path.startswith("/page/") and path[6:] in site.pages:
+                    kind, body, content_type = (
+                        "document",
+                        site.pages[path[6:]].encode("utf-8"),
+                        "text/html; charset=utf-8",
+                    )
+                else:
+                    for prefix, (kind, size, content_type) in RESOURCES.items():
+                        if path.startswith(prefix):
+                            body = b"\0" * size
+                            time.sleep(
+                                site.tracker_delay if kind == "tracker" else site.asset_delay
+                            )
+                            break
+                    else:
+                        self.send_error(404)
+                        return
+                site.count(kind, len(body))
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def memory_mb(browser: Browser) -> float:
+    driver = browser.current_browser()
+    if psutil is not None:
+        root = psutil.Process(driver.service.process.pid)
+        processes = [root, *root.children(recursive=True)]
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                pass
+        return total / 2**20
+    driver.execute_cdp_cmd("Performance.enable", {})
+    metrics = driver.execute_cdp_cmd("Performance.getMetrics", {})["metrics"]
+    heap = next(m["value"] for m in metrics if m["name"] == "JSHeapUsedSize")
+    return heap / 2**20
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def measure(site: RecordedPageSite, profile: str, loads: int, timeout: int) -> dict:
+    browser = Browser(page_load_timeout=timeout, headless=True, profile=profile)
+    driver = browser.current_browser()
+    names = list(site.pages)
+    try:
+        # One unmeasured load so browser start-up is not counted
+        driver.get(f"{site.base_url}/page/{names[0]}")
+        time.sleep(1)
+        site.reset()
+        times = []
+        for i in range(loads):
+            start = time.perf_counter()
+            driver.get(f"{site.base_url}/page/{names[i % len(names)]}")
+            times.append(time.perf_counter() - start)
+            assert 'data-hook="review"' in driver.page_source or "empty" in names[i % len(names)]
+        # Let requests a page started but did not wait for finish
+        time.sleep(1)
+        requests, sizes = site.reset()
+        return {
+            "kb_per_page": sum(sizes.values()) / loads / 1024,
+            "requests_per_page": sum(requests.values()) / loads,
+            "by_kind": {kind: requests[kind] / loads for kind in sorted(requests)},
+            "p50": percentile(times, 0.5),
+            "p95": percentile(times, 0.95),
+            "memory_mb": memory_mb(browser),
+        }
+    finally:
+        browser.quit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--loads", type=int, default=20)
+    parser.add_argument("--profiles", nargs="+", choices=BROWSER_PROFILES, default=list(BROWSER_PROFILES))
+    parser.add_argument("--images", type=int, default=12)
+    parser.add_argument("--asset-delay", type=float, default=0.03)
+    parser.add_argument("--tracker-delay", type=float, default=0.3)
+    parser.add_argument("--timeout", type=int, default=30)
+    args = parser.parse_args()
+
+    site = RecordedPageSite(
+        images=args.images, asset_delay=args.asset_delay, tracker_delay=args.tracker_delay
+    ).start()
+    memory = "RSS MB" if psutil is not None else "JS heap MB"
+    print(f"{'profile':<10}{'KB/page':>10}{'requests':>10}{'p50 ms':>9}{'p95 ms':>9}{memory:>12}")
+    try:
+        for profile in args.profiles:
+            result = measure(site, profile, args.loads, args.timeout)
+            print(
+                f"{profile:<10}{result['kb_per_page']:>10.1f}"
+                f"{result['requests_per_page']:>10.1f}"
+                f"{1000 * result['p50']:>9.0f}{1000 * result['p95']:>9.0f}"
+                f"{result['memory_mb']:>12.1f}"
+            )
+            print(f"{'':<10}requests per page by kind: {result['by_kind']}")
+    finally:
+        site.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# benchmarks/bench_near_duplicates.py
+"""
+Lookup cost and accuracy of `NearDuplicateIndex` as it grows.
+
+    python -m benchmarks.bench_near_duplicates --stored 100000 --probes 2000
+
+Fills an index with distinct synthetic reviews in steps, and at each size
+times assigning a probe set: lightly edited copies of a few spam templates
+(which should join their template's cluster) and fresh distinct reviews
+(which should not match anything). With banded lookups the time per
+probe stays roughly flat as the index grows.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from near_duplicates import NearDuplicateIndex
+
+TEMPLATES = [
+    "I received this product for free in exchange for my honest review. It "
+    "works great and I would definitely recommend it to friends and family!",
+    "Five stars! Best purchase ever, contact me on my page for a discount code "
+    "and get yours at half the price before the offer ends this week.",
+    "This seller is amazing, fast shipping and great customer service, they "
+    "even refunded me when the box arrived damaged. Will buy again for sure.",
+]
+
+
+def vocabulary(rng: random.Random, size: int = 5_000) -> list[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choices(letters, k=rng.randint(2, 9))) for _ in range(size)]
+
+
+def distinct_review(rng: random.Random, words: list, weights: list) -> str:
+    """A review of a few sentences, words drawn with a Zipf-like frequency."""
+    sentences = []
+    for _ in range(rng.randint(2, 6)):
+        sentence = " ".join(rng.choices(words, weights, k=rng.randint(6, 18)))
+        sentences.append(sentence.capitalize() + ".")
+    return " ".join(sentences)
+
+
+def edited_copy(rng: random.Random, template: str) -> str:
+    """The template with one small edit, as spam copies usually differ."""
+    words = template.split()
+    edit = rng.randrange(3)
+    if edit == 0:
+        words[rng.randrange(len(words))] += "!"
+    elif edit == 1:
+        words.insert(rng.randrange(len(words)), rng.choice(("really", "so", "very")))
+    else:
+        words[0] = words[0].lower()
+    return " ".join(words)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--stored", type=int, default=100_000)
+    parser.add_argument("--steps", type=int, default=4)
+    parser.add_argument("--probes", type=int, default=2_000)
+    parser.add_argument("--threshold", type=float, default=0.85)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    words = vocabulary(rng)
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+
+    def distinct(count: int) -> list[str]:
+        return [distinct_review(rng, words, weights) for _ in range(count)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = NearDuplicateIndex(
+            os.path.join(tmp, "near_duplicates.sqlite3"), threshold=args.threshold
+        )
+        template_clusters = [cluster_id for cluster_id, _ in index.assign_many(TEMPLATES)]
+        print(f"{'stored':>10}{'us/probe':>11}{'recall':>9}{'false matches':>15}")
+        stored = 0
+        step = args.stored // args.steps
+        for _ in range(args.steps):
+            start = time.perf_counter()
+            index.assign_many(distinct(step))
+            fill = time.perf_counter() - start
+            stored += step
+
+            copies = [rng.randrange(len(TEMPLATES)) for _ in range(args.probes // 2)]
+            probes = [edited_copy(rng, TEMPLATES[t]) for t in copies]
+            probes += distinct(args.probes - len(copies))
+            before = index.stats()["matched"]
+            start = time.perf_counter()
+            assigned = index.assign_many(probes)
+            elapsed = time.perf_counter() - start
+            found = sum(
+                1
+                for t, cluster in zip(copies, assigned)
+                if cluster is not None and cluster[0] == template_clusters[t]
+            )
+            matched = index.stats()["matched"] - before
+            print(
+                f"{stored:>10}{1e6 * elapsed / len(probes):>11.0f}"
+                f"{found / len(copies):>9.3f}{matched - found:>15}"
+                f"   (filled at {step / fill:,.0f} reviews/s)"
+            )
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# benchmarks/bench_parser.py
+"""
+Review-page parsing speed and peak memory: `review_parser` against the
+original full-tree BeautifulSoup parser, on the saved fixture pages.
+
+    python -m benchmarks.bench_parser --rounds 20
+
+Memory is the peak RSS of a fresh subprocess parsing one round per parser,
+so lxml's C-side tree is included (tracemalloc only sees Python objects).
+"Growth" is that peak minus the RSS after imports and loading the pages.
+"""
+import argparse
+import resource
+import subprocess
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+import review_parser
+from benchmarks.review_pages import load_fixtures
+
+
+def legacy_parse(page_source: str, reviews_data: dict) -> bool:
+    """The parser `AmazonScraper.scrap_reviews` used before review_parser."""
+    soup = BeautifulSoup(page_source, "html.parser")
+    reviews = soup.find_all("div", {"data-hook": "review"})
+    if not reviews:
+        return False
+    for item in reviews:
+        if "product title" not in reviews_data.keys():
+            reviews_data["product title"] = soup.title.text.replace(
+                "Amazon.com: Customer reviews: ", ""
+            ).strip()
+            reviews_data["overall rating"] = soup.find(
+                "span", {"data-hook": "rating-out-of-text"}
+            ).text.strip()
+            reviews_data["total ratings"] = (
+                soup.find("div", {"data-hook": "total-review-count"})
+                .find("span", {"class": "a-size-base a-color-secondary"})
+                .text.strip()
+                .replace(" global ratings", "")
+            )
+            rating_percentages = {}
+            for r in soup.find_all("tr", {"class": "a-histogram-row a-align-center"}):
+                match = review_parser.RATING_PERCENTAGE_PATTERN.search(
+                    r.get("aria-label")
+                )
+                if match:
+                    rating_percentages[int(match.group(1))] = int(match.group(2))
+            reviews_data["rating percentages"] = rating_percentages
+        review = {
+            "title": "\n".join(
+                item.find("a", {"data-hook": "review-title"}).text.split("\n")[1:]
+            ).strip(),
+            "rating": item.find("i", {"data-hook": "review-star-rating"}).text.strip(),
+            "body": item.find("span", {"data-hook": "review-body"}).text.strip(),
+        }
+        reviews_data.setdefault("reviews", []).append(review)
+    return True
+
+
+def new_parse(page_source: str, reviews_data: dict) -> bool:
+    reviews, errors = review_parser.parse_reviews(page_source)
+    if not reviews and not errors:
+        return False
+    if "product title" not in reviews_data:
+        reviews_data.update(review_parser.parse_header(page_source) or {})
+    reviews_data.setdefault("reviews", []).extend(reviews)
+    return True
+
+
+def parse_asin(parse, pages: list) -> dict:
+    reviews_data = {}
+    for page in pages:
+        parse(page, reviews_data)
+    return reviews_data
+
+
+PARSERS = {"legacy": legacy_parse, "new": new_parse}
+
+
+def max_rss() -> int:
+    """This process's peak RSS in bytes."""
+    # On Linux ru_maxrss keeps the parent's peak across exec; VmHWM does not
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def measure_memory(parser: str) -> tuple[int, int]:
+    """
+    Parse one round with `parser` ("legacy" or "new") in a fresh Python.
+
+    Returns:
+        tuple: Peak RSS bytes, and the peak before parsing.
+    """
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_parser", "--memory-child", parser],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    peak, baseline = map(int, output.split())
+    return peak, baseline
+
+
+def memory_child(parser: str) -> None:
+    pages = list(load_fixtures().values())
+    baseline = max_rss()
+    parse_asin(PARSERS[parser], pages)
+    print(max_rss(), baseline)
+
+
+def run(parser: str, pages: list, rounds: int) -> tuple[float, tuple, dict]:
+    """
+    Parse every page as one ASIN, `rounds` times.
+
+    Returns:
+        tuple: Seconds for all rounds, `measure_memory` for one round, and
+        the parsed data.
+    """
+    parse = PARSERS[parser]
+    memory = measure_memory(parser)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        parse_asin(parse, pages)
+    elapsed = time.perf_counter() - start
+    return elapsed, memory, parse_asin(parse, pages)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--memory-child", choices=PARSERS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.memory_child:
+        memory_child(args.memory_child)
+        return
+
+    pages = list(load_fixtures().values())
+    backend = "lxml" if review_parser.lxml is not None else "html.parser + SoupStrainer"
+    results = {
+        "legacy (html.parser, full tree)": run("legacy", pages, args.rounds),
+        f"review_parser ({backend})": run("new", pages, args.rounds),
+    }
+
+    legacy_data, new_data = (data for _, _, data in results.values())
+    for review in new_data["reviews"]:
+        review.pop("id")
+    assert legacy_data == new_data, "parsers disagree on the fixture pages"
+
+    page_count = len(pages) * args.rounds
+    for name, (elapsed, (peak, baseline), _) in results.items():
+        print(
+            f"{name:<45} {page_count / elapsed:8.1f} pages/s"
+            f"  peak RSS {peak / 2**20:7.1f} MiB"
+            f"  growth {(peak - baseline) / 2**20:7.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+# benchmarks/bench_pipeline.py
+"""
+End-to-end throughput of scrape -> screen -> publish -> subscribe, offline.
+The real `AmazonScraper` paging and parsing, `Screener.process_review_stream`,
+`BatchPublisher` and subscriber callback run against local stand-ins:
+synthetic review pages served from localhost, a fake chat model with a set
+latency and canned verdicts, and an in-memory Pub/Sub.
+
+    python -m benchmarks.bench_pipeline --reviews 10000 --asins 20 --llm-latency 0.5
+    python -m benchmarks.bench_pipeline --reviews 1000000 --asins 500 --llm-latency 0.05
+    python -m benchmarks.bench_pipeline --check-model gpt-4o-mini --check-llm-latency 0.2
+
+With `--check-model` the first pass runs on a separate, faster fake tier
+and only flagged or low-confidence reviews reach the recheck tier.
+
+Reports reviews/second, LLM calls per 1,000 reviews, tokens per review and
+p50/p95 latency per stage. Stage times are wall-clock, so "llm check"
+includes waiting on the rate governor and retries.
+"""
+import argparse
+import contextlib
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import star_scraper
+from benchmarks.fakes import (
+    FakeBrowser,
+    FakeChatModel,
+    FakePublisherClient,
+    FakeSubscription,
+    ReviewSite,
+)
+from publisher import BatchPublisher
+from review_sink import make_sink
+from screener import ModelTier, Screener
+from star_scraper import AmazonScraper, BrowserPool
+from subscriber import make_callback
+
+TOPIC = "projects/bench/topics/Reviews"
+
+
+class StageTimes:
+    """Thread-safe per-stage latency samples."""
+
+    def __init__(self) -> None:
+        self.samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+    def extend(self, stage: str, samples: list) -> None:
+        with self._lock:
+            self.samples.setdefault(stage, []).extend(samples)
+
+    def wrap(self, stage: str, func):
+        """`func`, timing every call under `stage`."""
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+
+        return timed
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class FakeBrowserPool(BrowserPool):
+    """`BrowserPool` handing out `FakeBrowser`s instead of Chrome."""
+
+    def __init__(self, browser_latency: float, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.browser_latency = browser_latency
+
+    def _new_browser(self) -> FakeBrowser:
+        return FakeBrowser(
+            page_load_timeout=self.page_load_timeout,
+            browser_latency=self.browser_latency,
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reviews", type=int, default=10_000)
+    parser.add_argument("--asins", type=int, default=20)
+    parser.add_argument("--asin-workers", type=int, default=4)
+    parser.add_argument("--fetch-concurrency", type=int, default=4)
+    parser.add_argument("--page-kb", type=int, default=20)
+    parser.add_argument("--blocked-rate", type=float, default=0.0)
+    parser.add_argument("--browser-latency", type=float, default=1.0)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-jitter", type=float, default=0.0)
+    parser.add_argument("--llm-concurrency", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--flag-rate", type=float, default=0.1)
+    parser.add_argument("--check-model", help="run the first pass on this tier")
+    parser.add_argument("--check-llm-latency", type=float, default=0.2)
+    parser.add_argument("--check-concurrency", type=int, default=8)
+    parser.add_argument("--check-batch-size", type=int, default=50)
+    parser.add_argument("--low-confidence-rate", type=float, default=0.05)
+    parser.add_argument("--no-rules", action="store_true")
+    parser.add_argument("--no-dedupe", action="store_true")
+    parser.add_argument("--round-trip", type=float, default=0.02)
+    parser.add_argument("--publish-mode", choices=("review", "sku"), default="review")
+    parser.add_argument("--sink", choices=("jsonl", "sqlite", "parquet"), default="jsonl")
+    parser.add_argument("--subscriber-threads", type=int, default=10)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    # ChatOpenAI wants a key at construction; the fake model never uses it
+    os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+    reviews_per_star = max(1, math.ceil(args.reviews / args.asins / 3))
+    site = ReviewSite(
+        reviews_per_star, page_kb=args.page_kb, blocked_rate=args.blocked_rate
+    ).start()
+    times = StageTimes()
+    # AmazonScraper looks the parser up in its module on every page
+    star_scraper.parse_reviews = times.wrap("parse page", star_scraper.parse_reviews)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # Screener keeps its index and result store under the working directory
+        os.chdir(tmp)
+        check_tier = None
+        if args.check_model:
+            check_tier = ModelTier(
+                model=args.check_model,
+                batch_size=args.check_batch_size,
+                max_concurrency=args.check_concurrency,
+            )
+        screener = Screener(
+            batch_size=args.batch_size,
+            max_concurrency=args.llm_concurrency,
+            cache_path=None,
+            dedupe_path=None if args.no_dedupe else "near_duplicates.sqlite3",
+            use_rules=not args.no_rules,
+            check_tier=check_tier,
+        )
+        recheck_model = FakeChatModel(
+            latency=args.llm_latency,
+            jitter=args.llm_jitter,
+            flag_rate=args.flag_rate,
+            count_tokens=screener._count_tokens,
+        )
+        models = {"check": recheck_model, "recheck": recheck_model}
+        if check_tier is not None:
+            models["check"] = FakeChatModel(
+                latency=args.check_llm_latency,
+                jitter=args.llm_jitter,
+                flag_rate=args.flag_rate,
+                count_tokens=screener._count_tokens,
+                low_confidence_rate=args.low_confidence_rate,
+            )
+        for stage, model in models.items():
+            screener.tiers[stage].llm = model
+        screener.check_reviews_compliance = times.wrap(
+            "llm check", screener.check_reviews_compliance
+        )
+        screener.recheck_reviews_compliance = times.wrap(
+            "llm recheck", screener.recheck_reviews_compliance
+        )
+
+        sink = make_sink(args.sink, os.path.join(tmp, f"out.{args.sink}"))
+        subscription = FakeSubscription(
+            make_callback(sink), threads=args.subscriber_threads
+        )
+        client = FakePublisherClient(round_trip=args.round_trip, subscription=subscription)
+        publisher = BatchPublisher(TOPIC, client=client, mode=args.publish_mode)
+        pool = FakeBrowserPool(args.browser_latency, size=args.asin_workers)
+        scraped = []
+        scraped_lock = threading.Lock()
+
+        def process_asin(sku: str, asin: str) -> None:
+            start = time.perf_counter()
+            with pool.checkout() as browser:
+                scraper = AmazonScraper(
+                    asin,
+                    browser=browser,
+                    fetch_concurrency=args.fetch_concurrency,
+                    max_planned_pages=site.pages_per_star,
+                )
+                scraper.review_url = scraper.review_url.replace(
+                    "https://www.amazon.com", site.base_url
+                )
+                scraper.fetcher.fetch = times.wrap("fetch page", scraper.fetcher.fetch)
+                count = 0
+
+                def reviews():
+                    nonlocal count
+                    for review in scraper.iter_reviews():
+                        count += 1
+                        yield review
+
+                results = screener.process_review_stream(reviews(), asin)
+            with scraped_lock:
+                scraped.append(count)
+            if results:
+                publisher.publish_results({sku: results})
+            times.add("asin", time.perf_counter() - start)
+
+        # The scraper and screener print per ASIN
+        output = contextlib.nullcontext(sys.stdout) if args.verbose else open(os.devnull, "w")
+        start = time.perf_counter()
+        with output as out, contextlib.redirect_stdout(out):
+            with ThreadPoolExecutor(max_workers=args.asin_workers) as executor:
+                futures = [
+                    executor.submit(process_asin, f"SKU{i:06d}", f"B{i:09d}")
+                    for i in range(args.asins)
+                ]
+                for future in futures:
+                    future.result()
+            summary = publisher.wait()
+            subscription.wait(summary["published"])
+        elapsed = time.perf_counter() - start
+        subscription.close()
+        sink.close()
+        pool.close()
+        site.close()
+        os.chdir(cwd)
+        assert summary["failed"] == 0, summary
+        assert sink.stats()["written"] == summary["published"], sink.stats()
+
+    times.extend("publish", client.latencies)
+    times.extend("subscribe", subscription.latencies)
+    reviews = sum(scraped)
+    unique = {id(m): m for m in models.values()}.values()
+    calls = sum(m.calls for m in unique)
+    tokens = sum(m.prompt_tokens + m.completion_tokens for m in unique)
+    print(
+        f"{reviews} reviews from {args.asins} ASINs ({site.pages_served} pages,"
+        f" {site.blocked} walled) in {elapsed:.2f}s"
+    )
+    print(f"{'reviews/s':>24}: {reviews / elapsed:10.1f}")
+    print(f"{'LLM calls / 1k reviews':>24}: {1000 * calls / max(1, reviews):10.2f}")
+    print(f"{'tokens / review':>24}: {tokens / max(1, reviews):10.1f}")
+    if check_tier is not None:
+        for stage, model in models.items():
+            tier = f"{stage} ({screener.tiers[stage].model})"
+            print(
+                f"{tier:>24}: {model.calls:10d} calls,"
+                f" {model.prompt_tokens + model.completion_tokens} tokens"
+            )
+    print(f"{'messages published':>24}: {summary['published']:10d}")
+    print(f"{'stage':<14}{'count':>9}{'p50 ms':>11}{'p95 ms':>11}")
+    for stage, samples in times.samples.items():
+        if samples:
+            print(
+                f"{stage:<14}{len(samples):>9}"
+                f"{1000 * percentile(samples, 0.5):>11.1f}"
+                f"{1000 * percentile(samples, 0.95):>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
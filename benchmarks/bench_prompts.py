@@ -0,0 +1,93 @@
+# benchmarks/bench_prompts.py
+"""
+Prompt tokens per review for the verbose and compact prompt encodings, on
+the reviews of the saved fixture pages, for both screening passes. Also
+checks with a fake chat model that both encodings produce the same
+verdicts in the same format.
+
+    python -m benchmarks.bench_prompts --repeat 20 --max-review-chars 500
+
+Tokens are counted with tiktoken when it is installed, otherwise estimated
+as characters / 4 (as `Screener` does).
+"""
+import argparse
+import contextlib
+import os
+
+import review_parser
+from benchmarks.fakes import FakeChatModel
+from benchmarks.review_pages import load_fixtures
+from screener import Screener
+
+# What a first pass typically answers for a flagged review
+PRIOR_REASON = (
+    "The review mentions shipping delays and an unhelpful customer service "
+    "experience, which violates Guideline 1 prohibiting comments about "
+    "sellers, customer service, ordering issues, returns or shipping."
+)
+
+
+def fixture_reviews(repeat: int) -> list:
+    reviews = []
+    for page in load_fixtures().values():
+        reviews += review_parser.parse_reviews(page)[0]
+    return reviews * repeat
+
+
+def prompt_tokens(screener: Screener, stage: str, reviews: list) -> tuple[int, int]:
+    """Prompt tokens and LLM calls to send `reviews` through one pass."""
+    batches = screener._pack_batches(stage, reviews, list(range(len(reviews))))
+    tokens = 0
+    for batch in batches:
+        messages = screener._messages(stage, [reviews[j] for j in batch])
+        tokens += sum(screener._count_tokens(m.content) for m in messages)
+    return tokens, len(batches)
+
+
+def screen(screener: Screener, reviews: list) -> list:
+    model = FakeChatModel(latency=0, flag_rate=0.3)
+    for tier in screener.tiers.values():
+        tier.llm = model
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return screener.process_reviews({"asin": "BENCH", "reviews": reviews})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--max-review-chars", type=int, default=500)
+    args = parser.parse_args()
+
+    # ChatOpenAI wants a key at construction; nothing is sent
+    os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+    reviews = fixture_reviews(args.repeat)
+    flagged = [dict(r, result="No", reason=PRIOR_REASON) for r in reviews]
+    common = dict(cache_path=None, dedupe_path=None, result_store=None, use_rules=False)
+    screeners = {
+        "verbose": Screener(compact_prompts=False, **common),
+        "compact": Screener(**common),
+        f"compact, {args.max_review_chars} chars": Screener(
+            max_review_chars=args.max_review_chars, **common
+        ),
+    }
+
+    print(f"{len(reviews)} reviews")
+    print(f"{'encoding':<24}{'prefix':>8}{'check/review':>14}{'recheck/review':>16}{'calls':>7}")
+    for name, screener in screeners.items():
+        prefix = screener._count_tokens(screener._static_prompt("check"))
+        check, check_calls = prompt_tokens(screener, "check", reviews)
+        recheck, recheck_calls = prompt_tokens(screener, "recheck", flagged)
+        print(
+            f"{name:<24}{prefix:>8}{check / len(reviews):>14.1f}"
+            f"{recheck / len(flagged):>16.1f}{check_calls + recheck_calls:>7}"
+        )
+
+    verbose = screen(screeners["verbose"], reviews)
+    compact = screen(screeners["compact"], reviews)
+    assert [r["body"] for r in verbose] == [r["body"] for r in compact]
+    assert [sorted(r) for r in verbose] == [sorted(r) for r in compact]
+    print(f"same {len(compact)} non-compliant reviews and fields from both encodings")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# benchmarks/bench_publisher.py
+"""
+Publishing throughput against an in-process stand-in for Pub/Sub with a
+simulated round trip per batch: the old one-blocking-publish-per-message
+path versus `BatchPublisher`.
+
+    python -m benchmarks.bench_publisher --skus 50 --reviews 200 --round-trip 0.02
+"""
+import argparse
+import json
+import random
+import time
+
+from benchmarks.fakes import FakePublisherClient
+from publisher import MAX_MESSAGE_BYTES, BatchPublisher, split_results
+
+TOPIC = "projects/bench/topics/Reviews"
+
+
+def make_results(skus: int, reviews: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    return {
+        f"SKU{s:05d}": [
+            {
+                "index": i,
+                "result": "No",
+                "reason": "Mentions an order number " + "x" * rng.randint(50, 400),
+                "percentage_of_relevance": "0%",
+                "rating": "1.0 out of 5 stars",
+                "title": "Broken on arrival",
+            }
+            for i in range(reviews)
+        ]
+        for s in range(skus)
+    }
+
+
+def blocking(results: dict, client: FakePublisherClient) -> int:
+    messages = split_results(results, "review")
+    for sku, payload in messages:
+        client.publish(TOPIC, json.dumps(payload).encode("utf-8")).result()
+    return len(messages)
+
+
+def batched(results: dict, client: FakePublisherClient, mode: str) -> int:
+    publisher = BatchPublisher(TOPIC, client=client, mode=mode)
+    publisher.publish_results(results)
+    summary = publisher.wait()
+    assert summary["failed"] == 0 and summary["outstanding"] == 0, summary
+    return summary["published"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--skus", type=int, default=50)
+    parser.add_argument("--reviews", type=int, default=200)
+    parser.add_argument("--round-trip", type=float, default=0.02)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--blocking-sample", type=int, default=100)
+    args = parser.parse_args()
+
+    results = make_results(args.skus, args.reviews)
+    single_size = len(json.dumps(results).encode("utf-8"))
+    print(
+        f"single message: {single_size / 1e6:.1f} MB"
+        f" ({'over' if single_size > MAX_MESSAGE_BYTES else 'under'} the size limit)"
+    )
+
+    def client(**overrides) -> FakePublisherClient:
+        settings = dict(round_trip=args.round_trip, failure_rate=args.failure_rate)
+        settings.update(overrides)
+        return FakePublisherClient(**settings)
+
+    # The old path: every message waits for its own (single-message) batch,
+    # so it is timed on a sample of the reviews
+    sample = {
+        sku: reviews[: max(1, args.blocking_sample // len(results))]
+        for sku, reviews in results.items()
+    }
+    runs = (
+        ("blocking per review", lambda: blocking(sample, client(failure_rate=0.0))),
+        ("batched per review", lambda: batched(results, client(), "review")),
+        ("batched per SKU", lambda: batched(results, client(), "sku")),
+    )
+    for label, run in runs:
+        start = time.perf_counter()
+        count = run()
+        elapsed = time.perf_counter() - start
+        print(f"{label:>20}: {count / elapsed:10.0f} msg/s ({count} messages, {elapsed:.2f}s)")
+
+if __name__ == "__main__":
+    main()
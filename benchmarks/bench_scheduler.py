@@ -0,0 +1,203 @@
+# benchmarks/bench_scheduler.py
+"""
+Simulate monitoring schedules on a synthetic catalog: `MonitorScheduler`
+against the current round-robin pass over every ASIN, with the same hourly
+page and review budget.
+
+    python -m benchmarks.bench_scheduler --asins 5000 --days 14
+    python -m benchmarks.bench_scheduler --pages-per-hour 300 --burst-fraction 0.1
+
+Each ASIN gets new low-star reviews at its own rate (log-normal, so a few
+ASINs are hot and most are quiet), and some have a burst of reviews at a
+random time. Every ASIN has been scraped once at the start. A check finds
+the reviews posted since the previous one and costs what an incremental
+scrape would. Reported: how long reviews posted after the warm-up day
+waited to be found (those never found count until the end), and the
+pages and checks spent.
+"""
+import argparse
+import bisect
+import math
+import os
+import random
+import tempfile
+import time
+
+from monitor_scheduler import HOUR, MonitorScheduler, check_cost
+
+
+def catalog(rng: random.Random, args) -> list:
+    """Per ASIN: sorted review arrival times (hours), low-star share, start total."""
+    horizon = args.days * 24
+    asins = []
+    for i in range(args.asins):
+        rate = rng.lognormvariate(math.log(args.median_rate), args.rate_sigma)
+        arrivals = []
+        t = rng.expovariate(rate)
+        while t < horizon:
+            arrivals.append(t)
+            t += rng.expovariate(rate)
+        if rng.random() < args.burst_fraction:
+            start = rng.uniform(0, horizon - args.burst_hours)
+            burst_rate = rate * args.burst_multiplier
+            t = start + rng.expovariate(burst_rate)
+            while t < start + args.burst_hours:
+                arrivals.append(t)
+                t += rng.expovariate(burst_rate)
+            arrivals.sort()
+        asins.append(
+            {
+                "asin": f"B0{i:08d}",
+                "arrivals": arrivals,
+                "low_share": rng.uniform(0.1, 0.3),
+                "total": rng.randint(50, 20_000),
+            }
+        )
+    return asins
+
+
+class Tracker:
+    """What each strategy found: per-ASIN last check and the reviews' waits."""
+
+    def __init__(self, asins: list, warmup: float) -> None:
+        self.asins = asins
+        self.warmup = warmup
+        self.last = [0.0] * len(asins)
+        self.delays = []
+        self.checks = 0
+        self.empty_checks = 0
+        self.pages = 0
+        self.reviews = 0
+
+    def check(self, index: int, now: float) -> int:
+        arrivals = self.asins[index]["arrivals"]
+        lo = bisect.bisect_right(arrivals, self.last[index])
+        hi = bisect.bisect_right(arrivals, now)
+        self.delays += [now - a for a in arrivals[lo:hi] if a >= self.warmup]
+        self.last[index] = now
+        found = hi - lo
+        pages, reviews = check_cost(found)
+        self.checks += 1
+        self.empty_checks += found == 0
+        self.pages += pages
+        self.reviews += reviews
+        return found
+
+    def header(self, index: int, now: float) -> dict:
+        asin = self.asins[index]
+        low = bisect.bisect_right(asin["arrivals"], now)
+        total = asin["total"] + low / asin["low_share"]
+        share = (asin["total"] * asin["low_share"] + low) / total
+        return {
+            "total ratings": f"{int(total):,}",
+            "rating percentages": {1: round(100 * share * 0.6), 2: round(100 * share * 0.2),
+                                   3: round(100 * share * 0.2)},
+        }
+
+    def report(self, horizon: float) -> dict:
+        # Reviews still unfound at the end count as waiting until then
+        missed = [
+            horizon - a
+            for asin, last in zip(self.asins, self.last)
+            for a in asin["arrivals"]
+            if last < a and a >= self.warmup
+        ]
+        delays = sorted(self.delays + missed)
+        return {
+            "found": len(self.delays),
+            "missed": len(missed),
+            "mean_h": sum(delays) / len(delays) if delays else 0.0,
+            "p95_h": delays[int(0.95 * (len(delays) - 1))] if delays else 0.0,
+            "checks": self.checks,
+            "empty_checks": self.empty_checks,
+            "pages": self.pages,
+            "reviews": self.reviews,
+        }
+
+
+def round_robin(asins: list, args) -> Tracker:
+    """Check ASINs in a fixed cycle, as many per hour as the budget allows."""
+    tracker = Tracker(asins, warmup=24)
+    position = 0
+    for hour in range(args.days * 24):
+        pages = reviews = 0
+        while pages < args.pages_per_hour and reviews < args.reviews_per_hour:
+            # Checks are spread over the hour
+            now = hour + min(0.999, pages / args.pages_per_hour)
+            before = tracker.pages, tracker.reviews
+            tracker.check(position, now)
+            pages += tracker.pages - before[0]
+            reviews += tracker.reviews - before[1]
+            position = (position + 1) % len(asins)
+    return tracker
+
+
+def prioritized(asins: list, args, path: str) -> Tracker:
+    tracker = Tracker(asins, warmup=24)
+    scheduler = MonitorScheduler(
+        path,
+        pages_per_hour=args.pages_per_hour,
+        reviews_per_hour=args.reviews_per_hour,
+        target_review_hours=args.target_review_hours,
+        min_interval=args.min_interval * HOUR,
+        probe_interval=args.probe_interval * HOUR,
+    )
+    index = {asin["asin"]: i for i, asin in enumerate(asins)}
+    scheduler.add_many({asin["asin"]: asin["asin"] for asin in asins}, now=0)
+    # The starting full scrape, outside the budget
+    for asin in asins:
+        scheduler.record(asin["asin"], tracker.header(index[asin["asin"]], 0), now=0)
+    step = args.tick_minutes / 60
+    for tick in range(int(args.days * 24 / step)):
+        now = tick * step
+        for item in scheduler.next_batch(now=now * HOUR):
+            i = index[item["asin"]]
+            found = tracker.check(i, now)
+            scheduler.record(
+                item["asin"], tracker.header(i, now), new_reviews=found, now=now * HOUR
+            )
+    scheduler.close()
+    return tracker
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--asins", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--median-rate", type=float, default=0.02, help="low-star reviews/hour")
+    parser.add_argument("--rate-sigma", type=float, default=1.5)
+    parser.add_argument("--burst-fraction", type=float, default=0.05)
+    parser.add_argument("--burst-multiplier", type=float, default=20)
+    parser.add_argument("--burst-hours", type=float, default=12)
+    parser.add_argument("--pages-per-hour", type=float, default=600)
+    parser.add_argument("--reviews-per-hour", type=float, default=3000)
+    parser.add_argument("--target-review-hours", type=float, default=1)
+    parser.add_argument("--min-interval", type=float, default=1, help="hours")
+    parser.add_argument("--probe-interval", type=float, default=24, help="hours")
+    parser.add_argument("--tick-minutes", type=float, default=5)
+    args = parser.parse_args()
+
+    asins = catalog(random.Random(7), args)
+    total = sum(len(a["arrivals"]) for a in asins)
+    print(f"{args.asins} ASINs, {total} low-star reviews over {args.days} days")
+    print(
+        f"{'schedule':<12}{'found':>8}{'missed':>8}{'mean h':>8}{'p95 h':>8}"
+        f"{'checks':>9}{'empty':>9}{'pages':>9}{'sim s':>7}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, simulate in (
+            ("round-robin", lambda: round_robin(asins, args)),
+            ("priority", lambda: prioritized(asins, args, os.path.join(tmp, "schedule.sqlite3"))),
+        ):
+            start = time.perf_counter()
+            result = simulate().report(args.days * 24)
+            print(
+                f"{name:<12}{result['found']:>8}{result['missed']:>8}"
+                f"{result['mean_h']:>8.1f}{result['p95_h']:>8.1f}"
+                f"{result['checks']:>9}{result['empty_checks']:>9}{result['pages']:>9}"
+                f"{time.perf_counter() - start:>7.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# benchmarks/bench_startup.py
+"""
+Cold-start cost of the Flask service: the slowest imports of `import app`
+according to `python -X importtime`, and the time from launching
+`python app.py` to the first healthy `/healthz` response.
+
+    python -m benchmarks.bench_startup --runs 3
+    python -m benchmarks.bench_startup --eager   # also import the heavy modules
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EAGER_MODULES = ("screener", "star_scraper", "asin_api")
+
+
+def import_times(statement: str) -> tuple[float, list]:
+    """
+    Run `statement` under -X importtime in a fresh interpreter.
+
+    Returns:
+        tuple: Total import time in ms, and (cumulative ms, module) pairs for
+        the top-level imports, slowest first.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=REPO_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    top_level = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        # Nested imports are indented under their importer
+        if not name.startswith("  "):
+            top_level.append((int(cumulative) / 1000, name.strip()))
+    top_level.sort(reverse=True)
+    return sum(ms for ms, _ in top_level), top_level
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_healthy(timeout: float = 60.0) -> float:
+    """Seconds from starting `python app.py` to a 200 from /healthz."""
+    port = _free_port()
+    env = dict(os.environ, PORT=str(port))
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "app.py"],
+        cwd=REPO_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"app.py exited with code {server.returncode}")
+            try:
+                with urllib.request.urlopen(
+                    f"http://127.0.0.1:{port}/healthz", timeout=1
+                ) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"/healthz not healthy after {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument(
+        "--eager",
+        action="store_true",
+        help="also measure importing the modules the app now loads lazily",
+    )
+    args = parser.parse_args()
+
+    statements = {"import app": "import app"}
+    if args.eager:
+        statements["eager"] = "import app, " + ", ".join(EAGER_MODULES)
+    for label, statement in statements.items():
+        totals = []
+        for _ in range(args.runs):
+            total, top_level = import_times(statement)
+            totals.append(total)
+        print(f"{label}: {statistics.median(totals):.1f} ms median import time")
+        for ms, name in top_level[: args.top]:
+            print(f"  {ms:8.1f} ms  {name}")
+
+    startups = [time_to_healthy() for _ in range(args.runs)]
+    print(
+        f"time to first healthy response: {statistics.median(startups) * 1000:.0f} ms"
+        f" median over {args.runs} runs"
+    )
+
+
+if __name__ == "__main__":
+    main()
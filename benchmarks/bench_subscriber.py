@@ -0,0 +1,106 @@
+# benchmarks/bench_subscriber.py
+"""
+Subscriber throughput: messages/second from the first callback to the last
+ack, with callbacks invoked from a thread pool like the streaming pull
+executor. Compares the old open-append-close-per-message callback with the
+batched JSONL and SQLite sinks.
+
+    python -m benchmarks.bench_subscriber --messages 20000 --threads 10
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fakes import FakeMessage
+from review_sink import make_sink
+from subscriber import make_callback
+
+
+def make_messages(count: int, acked) -> list:
+    messages = []
+    for i in range(count):
+        sku = f"SKU{i % 50:05d}"
+        payload = {
+            "sku": sku,
+            "index": i,
+            "review": {
+                "result": "No",
+                "reason": "Mentions an order number in the review body.",
+                "percentage_of_relevance": "0%",
+                "title": "Broken on arrival",
+            },
+        }
+        messages.append(
+            FakeMessage(
+                str(i),
+                json.dumps(payload).encode("utf-8"),
+                {"sku": sku},
+                on_ack=acked.release,
+            )
+        )
+    return messages
+
+
+def legacy_callback(path: str):
+    def callback(message):
+        non_compliant_reviews = json.loads(message.data.decode("utf-8"))
+        with open(path, "a") as fp:
+            json.dump(non_compliant_reviews, fp, indent=4)
+            fp.write("\n")
+        message.ack()
+
+    return callback
+
+
+def run(label: str, callback, messages: list, acked, threads: int, close=None) -> None:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for message in messages:
+            executor.submit(callback, message)
+    for _ in messages:
+        acked.acquire()
+    elapsed = time.perf_counter() - start
+    if close is not None:
+        close()
+    print(f"{label:>8}: {len(messages) / elapsed:10.0f} msg/s ({elapsed:.2f}s)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=10)
+    parser.add_argument("--max-batch", type=int, default=500)
+    parser.add_argument("--flush-interval", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        acked = threading.Semaphore(0)
+        messages = make_messages(args.messages, acked)
+        run(
+            "legacy",
+            legacy_callback(os.path.join(tmp, "legacy.json")),
+            messages,
+            acked,
+            args.threads,
+        )
+        for kind, filename in (
+            ("jsonl", "out.jsonl"),
+            ("sqlite", "out.sqlite3"),
+            ("parquet", "out_store"),
+        ):
+            sink = make_sink(
+                kind,
+                os.path.join(tmp, filename),
+                max_batch=args.max_batch,
+                flush_interval=args.flush_interval,
+            )
+            run(kind, make_callback(sink), messages, acked, args.threads, sink.close)
+            assert sink.stats()["written"] == args.messages, sink.stats()
+
+
+if __name__ == "__main__":
+    main()
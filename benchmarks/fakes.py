@@ -0,0 +1,498 @@
+# benchmarks/fakes.py
+"""
+In-process stand-ins for the external services the pipeline talks to, so
+benchmarks and local runs work offline and deterministically.
+"""
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from benchmarks.review_pages import render_page
+
+SKU_PATTERN = re.compile(r"'([^']*)'")
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, payload) -> None:
+        self.status_code = status_code
+        self._payload = payload
+        self.text = json.dumps(payload)
+
+    def json(self):
+        return self._payload
+
+
+class FakeAsinEndpoint:
+    """
+    Drop-in for the `requests.Session` given to `asin_api.AsinResolver`.
+
+    Answers like the demand API: a list of {"asin": ...} items for the SKUs it
+    knows, after `latency` seconds. `echo_sku` adds the "sku" field to each
+    item and `shuffle` returns them out of order, to exercise alignment.
+    """
+
+    def __init__(
+        self,
+        catalog: dict,
+        latency: float = 0.05,
+        echo_sku: bool = True,
+        shuffle: bool = False,
+        seed: int = 0,
+    ) -> None:
+        self.catalog = catalog
+        self.latency = latency
+        self.echo_sku = echo_sku
+        self.shuffle = shuffle
+        self.calls = 0
+        self.skus_requested = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def post(self, url, json=None, headers=None, timeout=None) -> FakeResponse:
+        skus = SKU_PATTERN.findall((json or {}).get("sku", ""))
+        with self._lock:
+            self.calls += 1
+            self.skus_requested += len(skus)
+        time.sleep(self.latency)
+        items = []
+        for sku in skus:
+            if sku in self.catalog:
+                item = {"asin": self.catalog[sku]}
+                if self.echo_sku:
+                    item["sku"] = sku
+                items.append(item)
+        if self.shuffle:
+            with self._lock:
+                self._rng.shuffle(items)
+        return FakeResponse(200, items)
+
+
+class FakePublisherClient:
+    """
+    In-process stand-in for `pubsub_v1.PublisherClient`.
+
+    Messages are grouped into batches of up to `max_messages` (or whatever
+    arrived within `max_latency`) and each batch "commits" after
+    `round_trip` seconds, up to `max_concurrent_batches` at a time, resolving
+    the message futures like the real client. `publish` blocks while
+    `max_outstanding_messages` are in flight. `failure_rate` fails that share
+    of batches, and publishing to an ordering key fails until
+    `resume_publish` is called after one of its messages failed. Committed
+    messages are handed to `subscription` (a `FakeSubscription`) if given,
+    and each message's publish-to-commit time is kept in `latencies`.
+    """
+
+    def __init__(
+        self,
+        max_messages: int = 100,
+        max_latency: float = 0.05,
+        round_trip: float = 0.02,
+        max_concurrent_batches: int = 10,
+        max_outstanding_messages: int = 1000,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+        subscription=None,
+    ) -> None:
+        self.max_messages = max_messages
+        self.max_latency = max_latency
+        self.round_trip = round_trip
+        self.failure_rate = failure_rate
+        self.subscription = subscription
+        self.messages = []
+        self.latencies = []
+        self.batches = 0
+        self._rng = random.Random(seed)
+        self._paused = set()
+        self._pending = []
+        self._lock = threading.Condition()
+        self._slots = threading.BoundedSemaphore(max_outstanding_messages)
+        self._commit_pool = ThreadPoolExecutor(max_workers=max_concurrent_batches)
+        threading.Thread(target=self._batcher, daemon=True).start()
+
+    def publish(self, topic: str, data: bytes, ordering_key: str = "", **attrs) -> Future:
+        future = Future()
+        with self._lock:
+            if ordering_key in self._paused:
+                raise RuntimeError(f"ordering key {ordering_key!r} is paused")
+        self._slots.acquire()
+        with self._lock:
+            self._pending.append(
+                (future, data, ordering_key, attrs, time.perf_counter())
+            )
+            self._lock.notify_all()
+        return future
+
+    def resume_publish(self, topic: str, ordering_key: str) -> None:
+        with self._lock:
+            self._paused.discard(ordering_key)
+
+    def _batcher(self) -> None:
+        while True:
+            with self._lock:
+                self._lock.wait_for(lambda: self._pending)
+                self._lock.wait_for(
+                    lambda: len(self._pending) >= self.max_messages, self.max_latency
+                )
+                batch = self._pending[: self.max_messages]
+                del self._pending[: self.max_messages]
+            self.batches += 1
+            self._commit_pool.submit(self._commit, batch)
+
+    def _commit(self, batch: list) -> None:
+        time.sleep(self.round_trip)
+        with self._lock:
+            failed = self._rng.random() < self.failure_rate
+            if failed:
+                self._paused.update(key for _, _, key, _, _ in batch if key)
+            else:
+                start = len(self.messages)
+                self.messages.extend(
+                    (data, key, attrs) for _, data, key, attrs, _ in batch
+                )
+                now = time.perf_counter()
+                self.latencies.extend(now - queued for *_, queued in batch)
+        for offset, (future, data, _, attrs, _) in enumerate(batch):
+            self._slots.release()
+            if failed:
+                future.set_exception(RuntimeError("simulated publish failure"))
+            else:
+                future.set_result(str(start + offset))
+                if self.subscription is not None:
+                    self.subscription.deliver(str(start + offset), data, attrs)
+
+
+class FakeMessage:
+    """
+    The parts of a pubsub_v1 subscriber Message the callback uses. Acks and
+    nacks are reported to `on_ack`/`on_nack`; a nack without `on_nack`
+    fails loudly.
+    """
+
+    def __init__(
+        self, message_id: str, data: bytes, attributes: dict, on_ack=None, on_nack=None
+    ) -> None:
+        self.message_id = message_id
+        self.data = data
+        self.attributes = attributes
+        self._on_ack = on_ack
+        self._on_nack = on_nack
+
+    def ack(self) -> None:
+        if self._on_ack is not None:
+            self._on_ack()
+
+    def nack(self) -> None:
+        if self._on_nack is None:
+            raise AssertionError(f"message {self.message_id} was nacked")
+        self._on_nack()
+
+
+class FakeSubscription:
+    """
+    In-memory subscription fed by a `FakePublisherClient`. Each delivered
+    message is passed to `callback` on a pool of `threads`, like the
+    streaming pull executor; nacked messages are delivered again. The time
+    from delivery to ack is kept in `latencies`.
+    """
+
+    def __init__(self, callback, threads: int = 10) -> None:
+        self.callback = callback
+        self.acked = 0
+        self.nacked = 0
+        self.latencies = []
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=threads)
+
+    def deliver(self, message_id: str, data: bytes, attributes: dict) -> None:
+        delivered = time.perf_counter()
+
+        def on_ack():
+            with self._condition:
+                self.acked += 1
+                self.latencies.append(time.perf_counter() - delivered)
+                self._condition.notify_all()
+
+        def on_nack():
+            with self._condition:
+                self.nacked += 1
+            self.deliver(message_id, data, attributes)
+
+        message = FakeMessage(message_id, data, attributes, on_ack, on_nack)
+        self._executor.submit(self.callback, message)
+
+    def wait(self, count: int, timeout: float = None) -> bool:
+        """Block until `count` messages have been acked."""
+        with self._condition:
+            return self._condition.wait_for(lambda: self.acked >= count, timeout)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+# A review in a batch prompt, verbose ("Review: n / Body: ...") or compact ("[n] ...")
+REVIEW_PROMPT_PATTERN = re.compile(
+    r"^\s*(?:Review: (\d+)\s*\n\s*Body: |\[(\d+)\] )(.*)$", re.M
+)
+
+
+class FakeChatMessage:
+    """What `ChatOpenAI.invoke` returns, as far as `Screener` reads it."""
+
+    def __init__(self, content: str, response_metadata: dict) -> None:
+        self.content = content
+        self.response_metadata = response_metadata
+
+
+class FakeChatModel:
+    """
+    Drop-in for the `ChatOpenAI` client of a `Screener` tier
+    (`screener.tiers[stage].llm`).
+
+    Answers each batch prompt after `latency` seconds (plus up to `jitter`)
+    with canned JSON verdicts for every review in it. A review is flagged
+    "No" when a hash of its body falls in the `flag_rate` share, so verdicts
+    are stable across runs and passes; the recheck pass confirms them. When
+    the prompt asks for a confidence, `low_confidence_rate` of the reviews
+    (by another hash) get 0.5, the rest 0.95.
+    Calls and estimated prompt/completion tokens are counted, using
+    `count_tokens` (e.g. `Screener._count_tokens`) when given.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.5,
+        jitter: float = 0.0,
+        flag_rate: float = 0.1,
+        count_tokens=None,
+        seed: int = 0,
+        low_confidence_rate: float = 0.0,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.flag_rate = flag_rate
+        self.low_confidence_rate = low_confidence_rate
+        self.count_tokens = count_tokens or (lambda text: len(text) // 4 + 1)
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def is_flagged(self, body: str) -> bool:
+        return zlib.crc32(body.strip().encode("utf-8")) % 10_000 < self.flag_rate * 10_000
+
+    def is_unsure(self, body: str) -> bool:
+        digest = zlib.crc32(b"unsure:" + body.strip().encode("utf-8"))
+        return digest % 10_000 < self.low_confidence_rate * 10_000
+
+    def invoke(self, messages) -> FakeChatMessage:
+        prompt = "\n".join(m.content for m in messages)
+        recheck = "percentage_of_relevance" in prompt
+        confidence = not recheck and '"confidence"' in prompt
+        verdicts = {}
+        for verbose_index, compact_index, body in REVIEW_PROMPT_PATTERN.findall(prompt):
+            index = verbose_index or compact_index
+            if not self.is_flagged(body):
+                verdict = {"result": "Yes", "reason": ""}
+            else:
+                verdict = {
+                    "result": "No",
+                    "reason": "Mentions shipping and customer service (Guideline 1)",
+                }
+            if recheck:
+                verdict["percentage_of_relevance"] = (
+                    "20%" if verdict["result"] == "No" else "0%"
+                )
+            if confidence:
+                verdict["confidence"] = 0.5 if self.is_unsure(body) else 0.95
+            verdicts[index] = verdict
+        content = json.dumps(verdicts)
+        prompt_tokens = self.count_tokens(prompt)
+        completion_tokens = self.count_tokens(content)
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+        time.sleep(delay)
+        return FakeChatMessage(
+            content,
+            {
+                "finish_reason": "stop",
+                "token_usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            },
+        )
+
+
+STAR_FILTERS = {"one_star": 1, "two_star": 2, "three_star": 3}
+# Header sent by FakeWebDriver, so the site never walls the "browser"
+BROWSER_HEADER = "X-Bench-Browser"
+CAPTCHA_PAGE = (
+    "<html><body><form action=\"/errors/validateCaptcha\">"
+    "<input id=\"captchacharacters\" name=\"field-keywords\"></form></body></html>"
+)
+
+
+class ReviewSite:
+    """
+    Local HTTP server answering `AmazonScraper` review-page URLs
+    (`/product-reviews/<asin>/?pageNumber=..&filterByStar=..`) with
+    synthetic pages from `benchmarks.review_pages`.
+
+    Every ASIN has `reviews_per_star` reviews under each star filter and a
+    histogram that plans exactly that many pages; pages past the end are
+    empty. `blocked_rate` of the plain HTTP requests get a captcha page, so
+    the browser fallback is exercised too. Review IDs are unique per ASIN,
+    star and page.
+    """
+
+    def __init__(
+        self,
+        reviews_per_star: int,
+        page_kb: int = 20,
+        blocked_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        self.reviews_per_star = reviews_per_star
+        self.page_kb = page_kb
+        self.blocked_rate = blocked_rate
+        self.pages_per_star = max(1, math.ceil(reviews_per_star / 10))
+        self.pages_served = 0
+        self.blocked = 0
+        self._asins = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _asin_index(self, asin: str) -> int:
+        with self._lock:
+            return self._asins.setdefault(asin, len(self._asins))
+
+    def page(self, asin: str, star_filter: str, page: int, from_browser: bool) -> str:
+        with self._lock:
+            self.pages_served += 1
+            if not from_browser and self._rng.random() < self.blocked_rate:
+                self.blocked += 1
+                return CAPTCHA_PAGE
+        stars = STAR_FILTERS[star_filter]
+        remaining = self.reviews_per_star - (page - 1) * 10
+        seed = (self._asin_index(asin) * 3 + stars - 1) * 1_000_000 + page
+        return render_page(
+            seed,
+            reviews_on_page=max(0, min(10, remaining)),
+            stars=stars,
+            total_ratings=self.reviews_per_star * 5,
+            histogram=(25, 15, 20, 20, 20),
+            boilerplate_kb=self.page_kb,
+        )
+
+    def start(self) -> "ReviewSite":
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                parts = url.path.strip("/").split("/")
+                query = parse_qs(url.query)
+                try:
+                    html = site.page(
+                        parts[1],
+                        query["filterByStar"][0],
+                        int(query["pageNumber"][0]),
+                        self.headers.get(BROWSER_HEADER) is not None,
+                    )
+                except (IndexError, KeyError, ValueError):
+                    self.send_error(404)
+                    return
+                body = html.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+class FakeWebDriver:
+    """
+    The parts of a Selenium WebDriver that `PageFetcher` and
+    `AmazonScraper.bypass_captcha` use: `get` loads the page over HTTP as a
+    browser (never walled) after `latency` seconds, and no captcha image is
+    ever found.
+    """
+
+    def __init__(self, session: requests.Session, latency: float) -> None:
+        self.session = session
+        self.latency = latency
+        self.page_source = ""
+
+    def get(self, url: str) -> None:
+        time.sleep(self.latency)
+        self.page_source = self.session.get(url, headers={BROWSER_HEADER: "1"}).text
+
+    def find_element(self, by, value):
+        raise LookupError(f"no element {value!r}")
+
+
+class FakeBrowser:
+    """
+    Stand-in for `star_scraper.Browser` without Chrome: a keep-alive HTTP
+    session for the fast path and a `FakeWebDriver` that takes
+    `browser_latency` seconds per page for the fallback.
+    """
+
+    def __init__(self, page_load_timeout: int = 10, browser_latency: float = 1.0) -> None:
+        self.page_load_timeout = page_load_timeout
+        self.pages_loaded = 0
+        self._http_session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self._http_session.mount("http://", adapter)
+        self._driver = FakeWebDriver(self._http_session, browser_latency)
+
+    def http_session(self) -> requests.Session:
+        return self._http_session
+
+    def sync_cookies(self) -> None:
+        pass
+
+    def current_browser(self) -> FakeWebDriver:
+        return self._driver
+
+    def is_alive(self) -> bool:
+        return True
+
+    def quit(self) -> None:
+        self._http_session.close()
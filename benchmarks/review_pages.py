@@ -0,0 +1,138 @@
+# benchmarks/review_pages.py
+"""
+Synthetic Amazon review pages with the markup `review_parser` reads, padded
+with the scripts, navigation and styles that make up most of a real page.
+
+    python -m benchmarks.review_pages   # regenerate benchmarks/fixtures
+"""
+import os
+import random
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "review_pages")
+
+WORDS = (
+    "the product stopped working after a week and the battery barely holds a "
+    "charge cheap plastic broke when I opened it does not fit as described "
+    "color faded quickly instructions were useless returned it disappointed "
+    "size runs small material feels thin smells strange loud noise overheats"
+).split()
+
+
+def _sentence(rng: random.Random) -> str:
+    words = rng.choices(WORDS, k=rng.randint(6, 18))
+    return " ".join(words).capitalize() + "."
+
+
+def review_item(rng: random.Random, review_id: str, stars: int) -> str:
+    body = " ".join(_sentence(rng) for _ in range(rng.randint(1, 8)))
+    title = _sentence(rng)[:-1]
+    return f"""
+<div id="{review_id}" data-hook="review" class="a-section review aok-relative">
+  <div class="a-row a-spacing-mini">
+    <a class="a-profile" href="/gp/profile/amzn1.account.{review_id}">
+      <div class="a-profile-avatar-wrapper"><img alt="" src="https://images-na.ssl-images-amazon.com/images/S/amazon-avatars-global/default.png"></div>
+      <div class="a-profile-content"><span class="a-profile-name">Customer {review_id[-4:]}</span></div>
+    </a>
+  </div>
+  <div class="a-row">
+    <a data-hook="review-title" class="a-size-base a-link-normal review-title a-color-base review-title-content a-text-bold" href="/gp/customer-reviews/{review_id}"><i data-hook="review-star-rating" class="a-icon a-icon-star a-star-{stars} review-rating"><span class="a-icon-alt">{stars}.0 out of 5 stars</span></i>
+<span>{title}</span>
+    </a>
+  </div>
+  <span data-hook="review-date" class="a-size-base a-color-secondary review-date">Reviewed in the United States on March {rng.randint(1, 28)}, 2024</span>
+  <div class="a-row a-spacing-mini review-data review-format-strip"><span data-hook="avp-badge" class="a-size-mini a-color-state a-text-bold">Verified Purchase</span></div>
+  <div class="a-row a-spacing-small review-data">
+    <span data-hook="review-body" class="a-size-base review-text review-text-content">
+      <span>{body}</span>
+    </span>
+  </div>
+  <div class="a-row a-spacing-none"><span data-hook="helpful-vote-statement" class="a-size-base a-color-tertiary cr-vote-text">{rng.randint(2, 40)} people found this helpful</span></div>
+</div>"""
+
+
+def render_page(
+    seed: int,
+    reviews_on_page: int = 10,
+    stars: int = 1,
+    total_ratings: int = 4_812,
+    histogram: tuple = (61, 17, 9, 5, 8),
+    boilerplate_kb: int = 120,
+) -> str:
+    """
+    Render one review page.
+
+    Args:
+        seed (int): Seed for the review text, so pages are reproducible.
+        reviews_on_page (int): Number of review nodes (0 for an empty page).
+        stars (int): Star rating shown on every review.
+        total_ratings (int): "global ratings" count in the header.
+        histogram (tuple): Percentages for 5 down to 1 stars.
+        boilerplate_kb (int): Approximate size of non-review markup.
+
+    Returns:
+        str: The page HTML.
+    """
+    rng = random.Random(seed)
+    rows = "".join(
+        f'<tr class="a-histogram-row a-align-center" aria-label="{s} stars represent {p}% of rating">'
+        f'<td class="aok-nowrap"><a class="a-link-normal" href="#">{s} star</a></td>'
+        f'<td class="a-span10"><div class="a-meter" role="progressbar" aria-valuenow="{p}%"></div></td>'
+        f'<td class="a-text-right a-nowrap">{p}%</td></tr>'
+        for s, p in zip((5, 4, 3, 2, 1), histogram)
+    )
+    items = "".join(
+        review_item(rng, f"R{seed:04d}{i:03d}{rng.randint(10**6, 10**7)}", stars)
+        for i in range(reviews_on_page)
+    )
+    script = "".join(
+        f"<script>P.when('A','ready').execute(function(A){{var w{i}=A.$('#nav-{i}');"
+        f"w{i}.attr('data-x','{'x' * 200}');}});</script>\n"
+        for i in range(boilerplate_kb * 2)
+    )
+    nav = "".join(
+        f'<li class="nav-li"><a class="nav-a" href="/b?node={i}">Department {i}</a></li>'
+        for i in range(boilerplate_kb * 4)
+    )
+    return f"""<!doctype html>
+<html lang="en-us"><head><meta charset="utf-8">
+<title>Amazon.com: Customer reviews: Synthetic Widget {seed}</title>
+<style>.a-section{{margin-bottom:0}}.review{{padding:0}}</style>
+{script}
+</head><body>
+<header id="navbar"><ul class="nav-ul">{nav}</ul></header>
+<div id="cm_cr-product_info" class="a-section">
+  <span data-hook="rating-out-of-text" class="a-size-medium a-color-base">4.1 out of 5</span>
+  <div data-hook="total-review-count" class="a-row a-spacing-medium averageStarRatingNumerical">
+    <span class="a-size-base a-color-secondary">{total_ratings:,} global ratings</span>
+  </div>
+  <table id="histogramTable" class="a-normal a-align-center a-spacing-base">{rows}</table>
+</div>
+<div id="cm_cr-review_list" class="a-section a-spacing-none review-views celwidget">{items}</div>
+<footer class="navLeftFooter">{nav[: len(nav) // 4]}</footer>
+</body></html>"""
+
+
+def write_fixtures() -> None:
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    pages = {
+        "one_star_page_1.html": render_page(1),
+        "one_star_page_2.html": render_page(2),
+        "three_star_last_page.html": render_page(3, reviews_on_page=4, stars=3),
+        "empty_page.html": render_page(4, reviews_on_page=0),
+    }
+    for name, html in pages.items():
+        with open(os.path.join(FIXTURES_DIR, name), "w", encoding="utf-8") as fp:
+            fp.write(html)
+
+
+def load_fixtures() -> dict:
+    """The saved review pages by file name."""
+    pages = {}
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as fp:
+            pages[name] = fp.read()
+    return pages
+
+
+if __name__ == "__main__":
+    write_fixtures()
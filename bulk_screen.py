@@ -0,0 +1,348 @@
+# bulk_screen.py
+"""
+Re-screen a backlog of scraped product JSON files offline.
+
+    python bulk_screen.py product_data/ --workers 4
+    python bulk_screen.py "product_data/*.json" --chunk-size 200 --db backlog.sqlite3
+
+Each file is a scrape result with "asin" and "reviews". Reviews are split
+into chunks that are spread over a process pool; every worker has its own
+`Screener` making concurrent LLM calls. A chunk's non-compliant reviews and
+its completion are committed together to one SQLite database, so an
+interrupted run started again with the same arguments skips what is done.
+Workers hand their `ResultStore` rows back too; the parent writes them
+only when the chunk completes, so a resumed chunk is not stored twice.
+"""
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Union
+
+
+class BulkManifest:
+    """
+    Checkpoints and results of a bulk run: which chunks of which ASINs are
+    done, and the non-compliant reviews they produced. Only the parent
+    process writes to it.
+    """
+
+    def __init__(self, path: str = "bulk_screen.sqlite3", chunk_size: int = 500) -> None:
+        self.path = path
+        self.chunk_size = chunk_size
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS asins (
+                asin TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                reviews INTEGER NOT NULL,
+                chunks INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                asin TEXT NOT NULL,
+                chunk INTEGER NOT NULL,
+                non_compliant INTEGER NOT NULL,
+                tokens INTEGER NOT NULL,
+                finished_at REAL NOT NULL,
+                PRIMARY KEY (asin, chunk)
+            );
+            CREATE TABLE IF NOT EXISTS non_compliant_reviews (
+                asin TEXT NOT NULL,
+                chunk INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (asin, chunk, position)
+            );
+            """
+        )
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE key = 'chunk_size'"
+        ).fetchone()
+        if row is None:
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('chunk_size', ?)", (str(chunk_size),)
+            )
+        elif int(row[0]) != chunk_size:
+            raise ValueError(
+                f"{path} was started with --chunk-size {row[0]}; resume with the same"
+                " size or use another --db"
+            )
+        self._conn.commit()
+
+    def plan(self, asin: str, path: str, reviews: int) -> Union[int, None]:
+        """
+        Record an ASIN's file and chunk count. Returns the count, or None if
+        the ASIN was already planned from another file.
+        """
+        chunks = max(1, -(-reviews // self.chunk_size))
+        row = self._conn.execute(
+            "SELECT path FROM asins WHERE asin = ?", (asin,)
+        ).fetchone()
+        if row is not None and row[0] != path:
+            return None
+        self._conn.execute(
+            "INSERT OR REPLACE INTO asins (asin, path, reviews, chunks) VALUES (?, ?, ?, ?)",
+            (asin, path, reviews, chunks),
+        )
+        self._conn.commit()
+        return chunks
+
+    def done_chunks(self, asin: str) -> set:
+        rows = self._conn.execute(
+            "SELECT chunk FROM chunks WHERE asin = ?", (asin,)
+        ).fetchall()
+        return {row[0] for row in rows}
+
+    def complete(
+        self,
+        asin: str,
+        chunk: int,
+        results: list,
+        tokens: int,
+        rows: list = (),
+        result_store=None,
+    ) -> None:
+        """
+        Store a chunk's results and mark it done, in one transaction. The
+        chunk's `rows` (`ResultStore.append` arguments, as `_ChunkRows`
+        collects them) go to `result_store` before that transaction commits.
+        """
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO non_compliant_reviews (asin, chunk, position, data)"
+                " VALUES (?, ?, ?, ?)",
+                [
+                    (asin, chunk, position, json.dumps(result, separators=(",", ":")))
+                    for position, result in enumerate(results)
+                ],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chunks (asin, chunk, non_compliant, tokens, finished_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (asin, chunk, len(results), tokens, time.time()),
+            )
+            if result_store is not None:
+                for row in rows:
+                    result_store.append(**row)
+
+    def summary(self) -> dict:
+        (asins, reviews, planned) = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(reviews), 0), COALESCE(SUM(chunks), 0) FROM asins"
+        ).fetchone()
+        (done, non_compliant, tokens) = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(non_compliant), 0), COALESCE(SUM(tokens), 0)"
+            " FROM chunks"
+        ).fetchone()
+        (complete_asins,) = self._conn.execute(
+            "SELECT COUNT(*) FROM asins a WHERE a.chunks ="
+            " (SELECT COUNT(*) FROM chunks c WHERE c.asin = a.asin)"
+        ).fetchone()
+        return {
+            "asins": asins,
+            "complete_asins": complete_asins,
+            "reviews": reviews,
+            "chunks": planned,
+            "done_chunks": done,
+            "non_compliant": non_compliant,
+            "tokens": tokens,
+        }
+
+    def iter_results(self, asin: Union[str, None] = None):
+        """Stored non-compliant reviews, in ASIN and review order."""
+        query = "SELECT data FROM non_compliant_reviews"
+        params = ()
+        if asin is not None:
+            query += " WHERE asin = ?"
+            params = (asin,)
+        for (data,) in self._conn.execute(query + " ORDER BY asin, chunk, position", params):
+            yield json.loads(data)
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def find_files(patterns: list) -> list:
+    """JSON files under each directory, or matching each glob, sorted and unique."""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*.json")
+        files += glob.glob(pattern)
+    return sorted(set(files))
+
+
+class _ChunkRows:
+    """
+    Stands in for a worker `Screener`'s `ResultStore`, keeping the rows of
+    the chunk being screened so the parent can write them on completion.
+    """
+
+    def __init__(self) -> None:
+        self.rows = []
+
+    def append(self, asin, results, sku=None, model=None, screened_at=None) -> int:
+        self.rows.append(
+            {
+                "asin": asin,
+                "results": results,
+                "sku": sku,
+                "model": model,
+                "screened_at": screened_at or datetime.now(timezone.utc),
+            }
+        )
+        return len(results)
+
+
+_screener = None
+
+
+def _init_worker(settings: dict) -> None:
+    global _screener
+    from screener import Screener
+
+    settings = dict(settings)
+    result_store = settings.pop("result_store", "results_store")
+    _screener = Screener(result_store=None, **settings)
+    if result_store:
+        _screener.result_store = _ChunkRows()
+
+
+def _screen_chunk(asin: str, chunk: int, reviews: list) -> tuple:
+    rows = _screener.result_store
+    if rows is not None:
+        rows.rows = []
+    stats = {}
+    results = _screener.process_reviews({"asin": asin, "reviews": reviews}, run_stats=stats)
+    return (
+        asin,
+        chunk,
+        results,
+        stats["total_tokens"],
+        stats["failed_reviews"],
+        rows.rows if rows is not None else [],
+    )
+
+
+def iter_chunks(manifest: BulkManifest, files: list):
+    """`(asin, chunk, reviews)` for every chunk of every file not yet done."""
+    for path in files:
+        try:
+            with open(path, encoding="utf-8") as file:
+                data = json.load(file)
+            asin = data["asin"]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Skipping {path}: {e!r}")
+            continue
+        reviews = data.get("reviews", [])
+        chunks = manifest.plan(asin, path, len(reviews))
+        if chunks is None:
+            print(f"Skipping {path}: {asin} is already screened from another file")
+            continue
+        done = manifest.done_chunks(asin)
+        for chunk in range(chunks):
+            if chunk not in done:
+                start = chunk * manifest.chunk_size
+                yield asin, chunk, reviews[start : start + manifest.chunk_size]
+
+
+def run(
+    files: list,
+    manifest: BulkManifest,
+    workers: int = 4,
+    settings: Union[dict, None] = None,
+) -> dict:
+    """
+    Screen every pending chunk of `files` on a pool of `workers` processes,
+    checkpointing each finished chunk in `manifest`. Chunks with reviews
+    that could not be screened, or whose worker raised, are left pending
+    for the next run.
+    """
+    settings = settings or {}
+    result_store = settings.get("result_store", "results_store")
+    if result_store:
+        from result_store import ResultStore
+
+        result_store = ResultStore(result_store)
+    failed = 0
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(settings,)
+    ) as executor:
+        pending = {}
+        chunks = iter_chunks(manifest, files)
+        try:
+            while True:
+                # Read files only as fast as the pool drains them
+                for asin, chunk, reviews in chunks:
+                    pending[executor.submit(_screen_chunk, asin, chunk, reviews)] = (asin, chunk)
+                    if len(pending) >= 2 * workers:
+                        break
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    asin, chunk = pending.pop(future)
+                    try:
+                        _, _, results, tokens, failed_reviews, rows = future.result()
+                    except Exception as e:
+                        failed += 1
+                        print(f"{asin} chunk {chunk}: failed ({e!r}), left pending")
+                        continue
+                    if failed_reviews:
+                        failed += 1
+                        print(f"{asin} chunk {chunk}: {failed_reviews} reviews failed, left pending")
+                        continue
+                    manifest.complete(asin, chunk, results, tokens, rows, result_store)
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+    return {**manifest.summary(), "failed_chunks": failed}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("paths", nargs="+", help="directories or globs of scraped JSON files")
+    parser.add_argument("--db", default="bulk_screen.sqlite3", help="manifest and results")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--max-concurrency", type=int, default=4, help="LLM calls per worker")
+    parser.add_argument("--requests-per-minute", type=int)
+    parser.add_argument("--tokens-per-minute", type=int)
+    parser.add_argument("--result-store", default="results_store", help="Parquet store of all verdicts")
+    args = parser.parse_args()
+
+    files = find_files(args.paths)
+    print(f"{len(files)} files")
+    settings = {
+        "model": args.model,
+        "batch_size": args.batch_size,
+        "max_concurrency": args.max_concurrency,
+        "result_store": args.result_store,
+    }
+    # Each worker has its own rate governor; split the account's budget
+    if args.requests_per_minute:
+        settings["requests_per_minute"] = max(1, args.requests_per_minute // args.workers)
+    if args.tokens_per_minute:
+        settings["tokens_per_minute"] = max(1, args.tokens_per_minute // args.workers)
+    manifest = BulkManifest(args.db, chunk_size=args.chunk_size)
+    start = time.time()
+    try:
+        summary = run(files, manifest, workers=args.workers, settings=settings)
+    finally:
+        manifest.close()
+    print(f"Done in {time.time() - start:.1f}s: {summary}")
+
+
+if __name__ == "__main__":
+    main()
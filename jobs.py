@@ -0,0 +1,204 @@
+# jobs.py
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Union
+
+
+class Job:
+    """
+    One `/jobs` submission: the SKUs to process, their progress and the
+    per-SKU result events in the order they finished.
+    """
+
+    def __init__(self, sku_list: list, options: dict) -> None:
+        self.id = uuid.uuid4().hex
+        self.sku_list = list(dict.fromkeys(sku_list))
+        self.options = options
+        self.status = "queued"
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.progress = {sku: {"status": "queued"} for sku in self.sku_list}
+        self.events = []
+        self._pending = len(self.sku_list)
+        self._condition = threading.Condition()
+        if not self.sku_list:
+            self.status = "done"
+            self.finished_at = self.created_at
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def _finish(self, status: str, error: Union[str, None] = None) -> None:
+        self.status = status
+        self.error = error
+        self.finished_at = time.time()
+        self._condition.notify_all()
+
+    def set_sku_status(self, sku: str, **fields) -> None:
+        with self._condition:
+            self.progress[sku].update(fields)
+
+    def add_result(self, sku: str, event: dict) -> None:
+        """Record a finished SKU and wake up anyone streaming results."""
+        with self._condition:
+            self.progress[sku].update(
+                {k: v for k, v in event.items() if k != "non_compliant_reviews"}
+            )
+            self.events.append(event)
+            self._pending -= 1
+            if self._pending <= 0:
+                self._finish("done")
+            else:
+                self._condition.notify_all()
+
+    def fail(self, error: str) -> None:
+        with self._condition:
+            self._finish("failed", error)
+
+    def to_dict(self) -> dict:
+        with self._condition:
+            counts = {}
+            for item in self.progress.values():
+                counts[item["status"]] = counts.get(item["status"], 0) + 1
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "error": self.error,
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+                "sku_count": len(self.sku_list),
+                "counts": counts,
+                "progress": {sku: dict(item) for sku, item in self.progress.items()},
+            }
+
+    def iter_events(self, timeout: float = 15.0):
+        """
+        Yield result events as they arrive until the job is finished.
+        Yields None after `timeout` seconds without news so streaming
+        responses can send a keep-alive.
+        """
+        index = 0
+        while True:
+            with self._condition:
+                if index >= len(self.events) and not self.done:
+                    self._condition.wait(timeout)
+                new_events = self.events[index:]
+                finished = self.done
+            index += len(new_events)
+            if new_events:
+                yield from new_events
+            elif not finished:
+                yield None
+            if finished and index >= len(self.events):
+                return
+
+
+class JobManager:
+    """
+    Runs jobs in the background. ASIN lookup happens on a short-lived
+    coordinator thread per job; SKUs from every job share one bounded
+    executor so at most `max_workers` SKUs are scraped and screened at once.
+    """
+
+    def __init__(
+        self,
+        resolve_asins: Callable[[list], dict],
+        process_sku: Callable[..., list],
+        max_workers: int = 2,
+        retention_seconds: float = 3600,
+    ) -> None:
+        self.resolve_asins = resolve_asins
+        self.process_sku = process_sku
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="sku-worker"
+        )
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, sku_list: list, **options) -> Job:
+        """
+        Create a job and start it without waiting for any result.
+
+        Args:
+            sku_list (list): The SKU codes to process.
+            **options: Passed through to `process_sku` (e.g. full_refresh).
+
+        Returns:
+            Job: The queued job.
+        """
+        job = Job(sku_list, options)
+        with self._lock:
+            self._expire()
+            self._jobs[job.id] = job
+        if job.done:
+            return job
+        threading.Thread(
+            target=self._start, args=(job,), name=f"job-{job.id[:8]}", daemon=True
+        ).start()
+        return job
+
+    def get(self, job_id: str) -> Union[Job, None]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _expire(self) -> None:
+        now = time.time()
+        for job_id in [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.done and now - job.finished_at > self.retention_seconds
+        ]:
+            del self._jobs[job_id]
+
+    def _start(self, job: Job) -> None:
+        job.status = "running"
+        try:
+            asins = self.resolve_asins(job.sku_list)
+        except Exception as e:
+            job.fail(f"ASIN lookup failed: {e}")
+            return
+        for sku in job.sku_list:
+            asin = asins.get(sku)
+            if asin is None:
+                job.add_result(
+                    sku,
+                    {
+                        "sku": sku,
+                        "asin": None,
+                        "status": "failed",
+                        "error": "no ASIN found for SKU",
+                    },
+                )
+                continue
+            job.set_sku_status(sku, asin=asin)
+            self._executor.submit(self._run_sku, job, sku, asin)
+
+    def _run_sku(self, job: Job, sku: str, asin: str) -> None:
+        job.set_sku_status(sku, status="running", started_at=time.time())
+        try:
+            non_compliant_reviews = self.process_sku(asin, sku, **job.options)
+        except Exception as e:
+            traceback.print_exc()
+            job.add_result(
+                sku, {"sku": sku, "asin": asin, "status": "failed", "error": str(e)}
+            )
+            return
+        job.add_result(
+            sku,
+            {
+                "sku": sku,
+                "asin": asin,
+                "status": "done",
+                "non_compliant_count": len(non_compliant_reviews),
+                "non_compliant_reviews": non_compliant_reviews,
+            },
+        )
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,339 @@
+# metrics.py
+import contextvars
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Union
+
+# Seconds; covers a fast local parse up to a slow LLM call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    @abstractmethod
+    def _samples(self) -> list:
+        """The metric's sample lines in the Prometheus text format."""
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines += self._samples()
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """A monotonically increasing count, per label combination."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+            for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    """
+    Observations counted into cumulative `buckets`, with their sum and count,
+    per label combination. `time` observes the duration of a block and adds
+    it to the current trace as a span.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(
+                key, ([0] * len(self.buckets), 0.0, 0)
+            )
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels):
+        try:
+            with span(self.name, **labels) as record:
+                yield record
+        finally:
+            self.observe(record["seconds"], **labels)
+
+    def _samples(self) -> list:
+        with self._lock:
+            items = sorted(
+                (key, (counts[:], total, count))
+                for key, (counts, total, count) in self._values.items()
+            )
+        lines = []
+        for key, (counts, total, count) in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                le = _format_labels(self.labelnames, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {bucket_count}")
+            le = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+class Trace:
+    """The spans recorded while handling one traced request."""
+
+    def __init__(self, name: str) -> None:
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.started_at = time.time()
+        self.spans = []
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, record: dict) -> None:
+        with self._lock:
+            self.spans.append(record)
+
+    def offset(self, perf_time: float) -> float:
+        return perf_time - self._start
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start"])
+        return {
+            "trace_id": self.id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "spans": spans,
+        }
+
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_traces = OrderedDict()
+_traces_lock = threading.Lock()
+MAX_TRACES = 100
+
+
+@contextmanager
+def start_trace(name: str):
+    """
+    Record spans from this thread (and from work wrapped with `propagate`)
+    into a new trace, kept among the last `MAX_TRACES` for `get_trace`.
+    """
+    trace = Trace(name)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        with _traces_lock:
+            _traces[trace.id] = trace
+            while len(_traces) > MAX_TRACES:
+                _traces.popitem(last=False)
+
+
+def get_trace(trace_id: str) -> Union[Trace, None]:
+    with _traces_lock:
+        return _traces.get(trace_id)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a block. Yields a dict whose "seconds" is set when the block
+    exits; the span is added to the current trace, if any.
+    """
+    trace = _current_trace.get()
+    start = time.perf_counter()
+    record = {"name": name, "thread": threading.current_thread().name, **attributes}
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        record["seconds"] = time.perf_counter() - start
+        if trace is not None:
+            record["start"] = trace.offset(start)
+            trace.add(record)
+
+
+def propagate(func):
+    """
+    Bind `func` to the caller's trace, for work handed to another thread
+    (executors and `threading.Thread` do not carry context variables).
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return func
+
+    def run(*args, **kwargs):
+        token = _current_trace.set(trace)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current_trace.reset(token)
+
+    return run
+
+
+REGISTRY = Registry()
+
+# Scraper
+PAGE_FETCH_SECONDS = REGISTRY.histogram(
+    "review_page_fetch_seconds",
+    "Time to fetch one review page, by path (http or browser).",
+    ("path",),
+)
+PAGES_TOTAL = REGISTRY.counter(
+    "review_pages_total", "Review pages fetched, by star filter.", ("star",)
+)
+CAPTCHA_ENCOUNTERS_TOTAL = REGISTRY.counter(
+    "captcha_encounters_total",
+    "Captcha or sign-in walls met, by where (http or browser).",
+    ("where",),
+)
+CAPTCHA_SOLVE_SECONDS = REGISTRY.histogram(
+    "captcha_solve_seconds", "Time to solve and submit a browser captcha."
+)
+CAPTCHA_SOLVES_TOTAL = REGISTRY.counter(
+    "captcha_solves_total",
+    "Browser captchas submitted, by outcome (solved or failed).",
+    ("outcome",),
+)
+SESSION_RESTORES_TOTAL = REGISTRY.counter(
+    "session_restores_total",
+    "Cached captcha-cleared or signed-in cookie jars handed to a browser.",
+)
+PAGE_PARSE_SECONDS = REGISTRY.histogram(
+    "review_page_parse_seconds", "Time to parse the reviews of one page."
+)
+PARSE_ERRORS_TOTAL = REGISTRY.counter(
+    "review_parse_errors_total", "Review nodes that could not be parsed."
+)
+
+# Screener
+LLM_CALL_SECONDS = REGISTRY.histogram(
+    "llm_call_seconds",
+    "Latency of one LLM batch call, by pass and model.",
+    ("stage", "model"),
+)
+LLM_PROMPT_TOKENS_TOTAL = REGISTRY.counter(
+    "llm_prompt_tokens_total",
+    "Prompt tokens sent to the LLM, by pass and model.",
+    ("stage", "model"),
+)
+LLM_COMPLETION_TOKENS_TOTAL = REGISTRY.counter(
+    "llm_completion_tokens_total",
+    "Completion tokens returned by the LLM, by pass and model.",
+    ("stage", "model"),
+)
+LLM_RETRIES_TOTAL = REGISTRY.counter(
+    "llm_retries_total", "LLM calls retried after a rate limit or timeout.", ("stage",)
+)
+LLM_BATCH_FAILURES_TOTAL = REGISTRY.counter(
+    "llm_batch_failures_total",
+    "LLM batches that failed, by reason (malformed or error).",
+    ("stage", "reason"),
+)
+SCREENED_REVIEWS_TOTAL = REGISTRY.counter(
+    "screened_reviews_total",
+    "Reviews given a first-pass verdict, by source (rules, cache or llm).",
+    ("source",),
+)
+
+# API
+SKU_PROCESS_SECONDS = REGISTRY.histogram(
+    "sku_process_seconds", "Time to scrape and screen one SKU."
+)
+ASIN_RESOLVE_SECONDS = REGISTRY.histogram(
+    "asin_resolve_seconds", "Time to resolve a request's SKUs to ASINs."
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_seconds", "API request latency, by endpoint.", ("endpoint",)
+)
@@ -0,0 +1,507 @@
+# monitor_scheduler.py
+"""
+Keep a large SKU catalog screened, checking each ASIN as often as its new
+low-star reviews warrant instead of re-running the whole list at once.
+
+    python monitor_scheduler.py skus.txt --pages-per-hour 600 --reviews-per-hour 3000
+    python monitor_scheduler.py skus.txt --workers 4 --topic projects/p/topics/Reviews
+
+SKU files have one SKU per line. Each check scrapes the ASIN incrementally
+(only reviews newer than the last run) and screens what is new; the
+schedule, review velocities and hourly spend live in a local SQLite file,
+so a restarted service picks up where it stopped. `python -m
+benchmarks.bench_scheduler` simulates schedules on synthetic catalogs.
+"""
+import argparse
+import heapq
+import math
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Union
+
+HOUR = 3600.0
+# An incremental check fetches the first page of each star filter, then one
+# more page per REVIEWS_PER_PAGE new reviews
+STAR_FILTERS = (1, 2, 3)
+REVIEWS_PER_PAGE = 10
+
+
+def parse_total_ratings(value) -> Union[int, None]:
+    """ "1,234" (as `parse_header` returns it) -> 1234."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    digits = re.sub(r"[^\d]", "", str(value or ""))
+    return int(digits) if digits else None
+
+
+def low_star_ratings(header: dict) -> Union[float, None]:
+    """Ratings with one to three stars, from a header's total and histogram."""
+    total = parse_total_ratings(header.get("total ratings"))
+    percentages = {int(k): v for k, v in (header.get("rating percentages") or {}).items()}
+    if total is None or not percentages:
+        return None
+    return total * sum(percentages.get(star, 0) for star in STAR_FILTERS) / 100
+
+
+def check_cost(new_reviews: float) -> tuple:
+    """`(pages, reviews)` an incremental check with `new_reviews` new reviews costs."""
+    return len(STAR_FILTERS) + math.ceil(new_reviews / REVIEWS_PER_PAGE), new_reviews
+
+
+class MonitorScheduler:
+    """
+    Priority queue of ASINs ordered by when they are next due.
+
+    Each ASIN's velocity (new low-star reviews per hour, at least
+    `min_velocity`) is a time-weighted average of what its checks found,
+    with a `half_life` in seconds. An ASIN is due once the reviews posted
+    since its last check are expected to have waited `target_review_hours`
+    between them (velocity * hours**2 / 2). That spaces checks by
+    1/sqrt(velocity), which for a fixed number of checks minimizes how long
+    reviews wait: fast-moving ASINs come round often, quiet ones rarely but
+    not never. Intervals are clamped between `min_interval` and
+    `max_interval` seconds. ASINs never
+    checked are due at once; after a first check they are probed again
+    after `probe_interval`. `next_batch` hands out the most overdue ASINs
+    while their estimated cost fits in the hour's `pages_per_hour` and
+    `reviews_per_hour` (reviews sent to screening) budget. With
+    `check_ahead`, budget the due ASINs leave unused goes to the ASINs due
+    soonest, paced evenly through the hour.
+    """
+
+    def __init__(
+        self,
+        path: str = "monitor_schedule.sqlite3",
+        pages_per_hour: float = 600,
+        reviews_per_hour: float = 3000,
+        target_review_hours: float = 1,
+        min_velocity: float = 0.001,
+        min_interval: float = HOUR,
+        max_interval: float = 7 * 24 * HOUR,
+        probe_interval: float = 24 * HOUR,
+        half_life: float = 12 * HOUR,
+        first_check_pages: int = 30,
+        first_check_reviews: int = 300,
+        check_ahead: bool = True,
+    ) -> None:
+        self.path = path
+        self.pages_per_hour = pages_per_hour
+        self.reviews_per_hour = reviews_per_hour
+        self.target_review_hours = target_review_hours
+        self.min_velocity = min_velocity
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.probe_interval = probe_interval
+        self.half_life = half_life
+        self.first_check_pages = first_check_pages
+        self.first_check_reviews = first_check_reviews
+        self.check_ahead = check_ahead
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS asins (
+                asin TEXT PRIMARY KEY,
+                sku TEXT,
+                due REAL NOT NULL,
+                last_checked REAL,
+                total_ratings INTEGER,
+                low_star_ratings REAL,
+                velocity REAL,
+                checks INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS spend (
+                hour INTEGER PRIMARY KEY,
+                pages REAL NOT NULL,
+                reviews REAL NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+        # Working copy of the asins table; the table is its persistence
+        self._asins = {}
+        for row in self._conn.execute(
+            "SELECT asin, sku, due, last_checked, total_ratings, low_star_ratings,"
+            " velocity, checks FROM asins"
+        ):
+            self._asins[row[0]] = dict(
+                zip(
+                    ("sku", "due", "last_checked", "total_ratings",
+                     "low_star_ratings", "velocity", "checks"),
+                    row[1:],
+                )
+            )
+        # (due, asin); entries whose due no longer matches are stale
+        self._heap = [(state["due"], asin) for asin, state in self._asins.items()]
+        heapq.heapify(self._heap)
+        self._in_flight = {}
+
+    def add_many(self, catalog: dict, now: Union[float, None] = None) -> int:
+        """
+        Start monitoring `{asin: sku}`; ASINs already known only get their
+        SKU updated. Returns how many were new.
+        """
+        now = time.time() if now is None else now
+        added = 0
+        with self._lock:
+            for asin, sku in catalog.items():
+                if asin in self._asins:
+                    self._asins[asin]["sku"] = sku
+                    self._conn.execute("UPDATE asins SET sku = ? WHERE asin = ?", (sku, asin))
+                    continue
+                self._asins[asin] = {
+                    "sku": sku,
+                    "due": now,
+                    "last_checked": None,
+                    "total_ratings": None,
+                    "low_star_ratings": None,
+                    "velocity": None,
+                    "checks": 0,
+                }
+                self._conn.execute(
+                    "INSERT INTO asins (asin, sku, due) VALUES (?, ?, ?)", (asin, sku, now)
+                )
+                heapq.heappush(self._heap, (now, asin))
+                added += 1
+            self._conn.commit()
+        return added
+
+    def remove(self, asin: str) -> None:
+        with self._lock:
+            self._asins.pop(asin, None)
+            self._conn.execute("DELETE FROM asins WHERE asin = ?", (asin,))
+            self._conn.commit()
+
+    def estimate(self, asin: str, now: Union[float, None] = None) -> tuple:
+        """`(pages, reviews)` checking `asin` now is expected to cost."""
+        now = time.time() if now is None else now
+        state = self._asins[asin]
+        if state["last_checked"] is None:
+            return self.first_check_pages, self.first_check_reviews
+        hours = max(0.0, now - state["last_checked"]) / HOUR
+        expected = min((state["velocity"] or 0.0) * hours, self.first_check_reviews)
+        return check_cost(expected)
+
+    def _spent(self, hour: int) -> tuple:
+        row = self._conn.execute(
+            "SELECT pages, reviews FROM spend WHERE hour = ?", (hour,)
+        ).fetchone()
+        return row or (0.0, 0.0)
+
+    def _spend(self, hour: int, pages: float, reviews: float) -> None:
+        self._conn.execute(
+            "INSERT INTO spend (hour, pages, reviews) VALUES (?, ?, ?)"
+            " ON CONFLICT (hour) DO UPDATE SET pages = pages + excluded.pages,"
+            " reviews = reviews + excluded.reviews",
+            (hour, pages, reviews),
+        )
+
+    def next_batch(self, now: Union[float, None] = None, limit: Union[int, None] = None) -> list:
+        """
+        Take the most overdue ASINs whose estimated cost fits in what is
+        left of this hour's budget, reserving that cost. An ASIN costing
+        more than a whole hour's budget is still dispatched at the start of
+        an hour, so it cannot be starved. With `check_ahead`, ASINs not yet
+        due follow while spending is behind the hour's elapsed share, if
+        their last check is at least `min_interval` old.
+
+        Returns:
+            list: Dicts with "asin", "sku", "due", and the reserved "pages"
+            and "reviews", hottest first. Report each with `record` or
+            `failed`.
+        """
+        now = time.time() if now is None else now
+        hour = int(now // HOUR)
+        elapsed = (now - hour * HOUR) / HOUR
+        batch = []
+        # Not yet due and checked less than `min_interval` ago
+        held = []
+        with self._lock:
+            spent_pages, spent_reviews = self._spent(hour)
+            while self._heap:
+                if limit is not None and len(batch) >= limit:
+                    break
+                due, asin = self._heap[0]
+                state = self._asins.get(asin)
+                if state is None or state["due"] != due or asin in self._in_flight:
+                    heapq.heappop(self._heap)
+                    continue
+                if due > now and not (
+                    self.check_ahead
+                    and spent_pages < self.pages_per_hour * elapsed
+                    and spent_reviews < self.reviews_per_hour * elapsed
+                ):
+                    break
+                if (
+                    due > now
+                    and state["last_checked"] is not None
+                    and now - state["last_checked"] < self.min_interval
+                ):
+                    held.append(heapq.heappop(self._heap))
+                    continue
+                pages, reviews = self.estimate(asin, now)
+                fresh_hour = spent_pages == 0 and spent_reviews == 0
+                if not fresh_hour and (
+                    spent_pages + pages > self.pages_per_hour
+                    or spent_reviews + reviews > self.reviews_per_hour
+                ):
+                    break
+                heapq.heappop(self._heap)
+                spent_pages += pages
+                spent_reviews += reviews
+                self._spend(hour, pages, reviews)
+                self._in_flight[asin] = (pages, reviews)
+                batch.append(
+                    {"asin": asin, "sku": state["sku"], "due": due, "pages": pages, "reviews": reviews}
+                )
+            for entry in held:
+                heapq.heappush(self._heap, entry)
+            self._conn.commit()
+        return batch
+
+    def _interval(self, velocity: Union[float, None]) -> float:
+        if velocity is None:
+            interval = self.probe_interval
+        else:
+            velocity = max(velocity, self.min_velocity)
+            interval = math.sqrt(2 * self.target_review_hours / velocity) * HOUR
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def _reschedule(self, asin: str, state: dict, due: float) -> None:
+        state["due"] = due
+        self._conn.execute(
+            "UPDATE asins SET due = ?, last_checked = ?, total_ratings = ?,"
+            " low_star_ratings = ?, velocity = ?, checks = ? WHERE asin = ?",
+            (
+                due,
+                state["last_checked"],
+                state["total_ratings"],
+                state["low_star_ratings"],
+                state["velocity"],
+                state["checks"],
+                asin,
+            ),
+        )
+        heapq.heappush(self._heap, (due, asin))
+
+    def record(
+        self,
+        asin: str,
+        header: Union[dict, None] = None,
+        new_reviews: Union[int, None] = None,
+        pages: Union[int, None] = None,
+        now: Union[float, None] = None,
+    ) -> float:
+        """
+        Update an ASIN after a check and schedule its next one.
+
+        Args:
+            asin (str): The checked ASIN.
+            header (dict, optional): The scraped "total ratings" and "rating
+                percentages".
+            new_reviews (int, optional): Low-star reviews the check found
+                that earlier checks had not; preferred over the change in
+                the header's counts, which are rounded percentages.
+            pages (int, optional): Pages fetched, if known; estimated from
+                `new_reviews` otherwise.
+            now (float, optional): Defaults to the current time.
+
+        Returns:
+            float: When the ASIN is next due.
+        """
+        now = time.time() if now is None else now
+        header = header or {}
+        total = parse_total_ratings(header.get("total ratings"))
+        low = low_star_ratings(header)
+        with self._lock:
+            state = self._asins.get(asin)
+            reserved = self._in_flight.pop(asin, (0, 0))
+            if state is None:
+                return math.inf
+            last = state["last_checked"]
+            # A first check scrapes every review, which says nothing of their rate
+            if last is not None and now > last:
+                if new_reviews is not None:
+                    found = new_reviews
+                elif low is not None and state["low_star_ratings"] is not None:
+                    found = max(0.0, low - state["low_star_ratings"])
+                else:
+                    found = None
+                if found is not None:
+                    rate = found / ((now - last) / HOUR)
+                    if state["velocity"] is None:
+                        state["velocity"] = rate
+                    else:
+                        weight = 1 - 0.5 ** ((now - last) / self.half_life)
+                        state["velocity"] += weight * (rate - state["velocity"])
+            state["last_checked"] = now
+            state["checks"] += 1
+            if total is not None:
+                state["total_ratings"] = total
+            if low is not None:
+                state["low_star_ratings"] = low
+            # Settle the reservation against what the check actually cost
+            if new_reviews is not None:
+                cost_pages, cost_reviews = check_cost(new_reviews)
+                if pages is not None:
+                    cost_pages = pages
+                self._spend(
+                    int(now // HOUR), cost_pages - reserved[0], cost_reviews - reserved[1]
+                )
+            due = now + self._interval(state["velocity"])
+            self._reschedule(asin, state, due)
+            self._conn.commit()
+        return due
+
+    def failed(self, asin: str, now: Union[float, None] = None) -> None:
+        """Retry a check that could not finish after `min_interval`."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._in_flight.pop(asin, None)
+            state = self._asins.get(asin)
+            if state is not None:
+                self._reschedule(asin, state, now + self.min_interval)
+                self._conn.commit()
+
+    def seconds_until_next(self, now: Union[float, None] = None) -> float:
+        """How long until `next_batch` could return something."""
+        now = time.time() if now is None else now
+        with self._lock:
+            while self._heap:
+                due, asin = self._heap[0]
+                state = self._asins.get(asin)
+                if state is None or state["due"] != due or asin in self._in_flight:
+                    heapq.heappop(self._heap)
+                    continue
+                if due > now:
+                    return due - now
+                # Due but over budget: wait for the next hour
+                return (int(now // HOUR) + 1) * HOUR - now
+        return self.max_interval
+
+    def stats(self, now: Union[float, None] = None) -> dict:
+        now = time.time() if now is None else now
+        with self._lock:
+            spent_pages, spent_reviews = self._spent(int(now // HOUR))
+            return {
+                "asins": len(self._asins),
+                "due": sum(
+                    1
+                    for asin, state in self._asins.items()
+                    if state["due"] <= now and asin not in self._in_flight
+                ),
+                "in_flight": len(self._in_flight),
+                "never_checked": sum(1 for s in self._asins.values() if s["checks"] == 0),
+                "pages_this_hour": spent_pages,
+                "reviews_this_hour": spent_reviews,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def read_skus(paths: list) -> list:
+    skus = []
+    for path in paths:
+        with open(path, encoding="utf-8") as file:
+            skus += [line.strip() for line in file if line.strip()]
+    return list(dict.fromkeys(skus))
+
+
+def run(scheduler: MonitorScheduler, service, workers: int = 2, publisher=None, poll: float = 60) -> None:
+    """
+    Check due ASINs forever on `workers` threads through a `ReviewService`,
+    publishing non-compliant reviews with `publisher` (a `BatchPublisher`)
+    when given.
+    """
+    from scrape_state import default_state_store
+
+    state_store = default_state_store()
+
+    def check(item: dict) -> None:
+        asin, sku = item["asin"], item["sku"]
+        start = time.time()
+        try:
+            results = service.process_sku(asin, sku)
+        except Exception as e:
+            print(f"{asin} ({sku}) check failed, retrying later: {e!r}")
+            scheduler.failed(asin)
+            return
+        new_reviews = state_store.count_reviews_since(asin, start)
+        due = scheduler.record(asin, state_store.header(asin), new_reviews=new_reviews)
+        print(
+            f"{asin} ({sku}): {new_reviews} new low-star reviews,"
+            f" {len(results)} non-compliant, next check in {(due - time.time()) / HOUR:.1f}h"
+        )
+        if results and publisher is not None:
+            publisher.publish_results({sku: results})
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        while True:
+            # Dispatch only as workers free up, so priorities are current
+            if len(pending) < workers:
+                for item in scheduler.next_batch(limit=workers - len(pending)):
+                    pending.add(executor.submit(check, item))
+            timeout = min(poll, scheduler.seconds_until_next())
+            if len(pending) >= workers:
+                _, pending = wait(pending, return_when=FIRST_COMPLETED)
+            elif pending:
+                _, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            else:
+                print(f"Idle for {timeout:.0f}s: {scheduler.stats()}")
+                time.sleep(timeout)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("paths", nargs="+", help="files with one SKU per line")
+    parser.add_argument("--db", default="monitor_schedule.sqlite3")
+    parser.add_argument("--workers", type=int, default=2, help="ASINs checked at once")
+    parser.add_argument("--pages-per-hour", type=float, default=600)
+    parser.add_argument("--reviews-per-hour", type=float, default=3000, help="reviews screened per hour")
+    parser.add_argument(
+        "--target-review-hours", type=float, default=1, help="waiting allowed before a check"
+    )
+    parser.add_argument("--min-interval-hours", type=float, default=1)
+    parser.add_argument("--max-interval-hours", type=float, default=7 * 24)
+    parser.add_argument("--topic", help="Pub/Sub topic to publish non-compliant reviews to")
+    args = parser.parse_args()
+
+    from app import ReviewService
+
+    scheduler = MonitorScheduler(
+        args.db,
+        pages_per_hour=args.pages_per_hour,
+        reviews_per_hour=args.reviews_per_hour,
+        target_review_hours=args.target_review_hours,
+        min_interval=args.min_interval_hours * HOUR,
+        max_interval=args.max_interval_hours * HOUR,
+    )
+    service = ReviewService()
+    skus = read_skus(args.paths)
+    catalog = {asin: sku for sku, asin in service.resolve_asins(skus).items()}
+    print(f"{len(skus)} SKUs, {len(catalog)} ASINs, {scheduler.add_many(catalog)} new")
+    publisher = None
+    if args.topic:
+        from publisher import BatchPublisher
+
+        publisher = BatchPublisher(args.topic)
+    try:
+        run(scheduler, service, workers=args.workers, publisher=publisher)
+    finally:
+        if publisher is not None:
+            print(f"Published: {publisher.wait()}")
+        scheduler.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+# near_duplicates.py
+import hashlib
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from array import array
+from typing import Union
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from verdict_cache import normalize_body
+
+MASK64 = (1 << 64) - 1
+# Stored clusters compared in full per lookup
+MAX_CANDIDATES = 8
+
+
+def shingles(body: str, size: int = 5) -> list[int]:
+    """crc32 of every `size`-character window of the normalized, lowercased body."""
+    text = normalize_body(body).lower().encode("utf-8")
+    windows = range(max(1, len(text) - size + 1))
+    return sorted({zlib.crc32(text[i : i + size]) for i in windows})
+
+
+class NearDuplicateIndex:
+    """
+    On-disk index clustering near-identical review bodies across runs.
+
+    Each body gets a MinHash signature of its character shingles. The first
+    body of a cluster is its representative; its signature is split into
+    `bands` locality-sensitive keys, so a lookup reads only the clusters that
+    share a key (an indexed SQLite query) instead of every stored body, and
+    joins the most similar one whose estimated Jaccard similarity is at
+    least `threshold`. Bodies shorter than `min_chars` are not clustered;
+    exact repeats of those are already caught by the `VerdictCache`. The
+    least recently matched clusters are dropped past `max_clusters`.
+    """
+
+    def __init__(
+        self,
+        path: str = "near_duplicates.sqlite3",
+        threshold: float = 0.85,
+        num_perm: int = 128,
+        bands: int = 16,
+        min_chars: int = 60,
+        max_clusters: int = 2_000_000,
+    ) -> None:
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = path
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.min_chars = min_chars
+        self.max_clusters = max_clusters
+        # Fixed seed: signatures must stay comparable across processes
+        rng = random.Random(1)
+        self._a = [rng.randrange(1, 1 << 64) | 1 for _ in range(num_perm)]
+        self._b = [rng.randrange(0, 1 << 64) for _ in range(num_perm)]
+        if numpy is not None:
+            self._np_a = numpy.array(self._a, dtype=numpy.uint64)[:, None]
+            self._np_b = numpy.array(self._b, dtype=numpy.uint64)[:, None]
+        self.matched = 0
+        self.created = 0
+        self._lock = threading.Lock()
+        # Bulk screening workers share the file; wait out each other's writes
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Losing the last few clusters on a crash only costs a re-screen
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS clusters (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                body TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS bands (key INTEGER NOT NULL, cluster_id INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS bands_key ON bands (key)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS bands_cluster ON bands (cluster_id)")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS clusters_last_used ON clusters (last_used)"
+        )
+        self._conn.commit()
+        (self._size,) = self._conn.execute("SELECT COUNT(*) FROM clusters").fetchone()
+
+    def signature(self, body: str) -> tuple:
+        """MinHash of the body: per permutation, the smallest 32-bit shingle hash."""
+        hashes = shingles(body)
+        if numpy is not None:
+            values = numpy.array(hashes, dtype=numpy.uint64)[None, :]
+            # uint64 arithmetic wraps, i.e. is mod 2**64 as below
+            mins = ((self._np_a * values + self._np_b) >> numpy.uint64(32)).min(axis=1)
+            return tuple(int(v) for v in mins)
+        return tuple(
+            min(((a * x + b) & MASK64) >> 32 for x in hashes)
+            for a, b in zip(self._a, self._b)
+        )
+
+    def band_keys(self, signature: tuple) -> list[int]:
+        keys = []
+        for band in range(self.bands):
+            rows = signature[band * self.rows : (band + 1) * self.rows]
+            digest = hashlib.blake2b(
+                array("I", (band, *rows)).tobytes(), digest_size=8
+            ).digest()
+            keys.append(int.from_bytes(digest, "big", signed=True))
+        return keys
+
+    @staticmethod
+    def similarity(first: tuple, second: tuple) -> float:
+        """Estimated Jaccard similarity of two signatures."""
+        return sum(x == y for x, y in zip(first, second)) / len(first)
+
+    def assign_many(self, bodies: list[str]) -> list:
+        """
+        Place each body in a cluster, starting a new one (with the body as
+        its representative) when no stored cluster is similar enough.
+
+        Args:
+            bodies (list[str]): Review bodies.
+
+        Returns:
+            list: Per body, `(cluster_id, representative_body)`, or None for
+            bodies too short to cluster.
+        """
+        signatures = [
+            self.signature(body) if len(normalize_body(body)) >= self.min_chars else None
+            for body in bodies
+        ]
+        now = time.time()
+        assigned = []
+        with self._lock:
+            for body, signature in zip(bodies, signatures):
+                if signature is None:
+                    assigned.append(None)
+                    continue
+                keys = self.band_keys(signature)
+                match = self._best_match(keys, signature)
+                if match is not None:
+                    cluster_id, representative = match
+                    self._conn.execute(
+                        "UPDATE clusters SET last_used = ? WHERE id = ?",
+                        (now, cluster_id),
+                    )
+                    self.matched += 1
+                    assigned.append(match)
+                    continue
+                cursor = self._conn.execute(
+                    "INSERT INTO clusters (body, signature, last_used) VALUES (?, ?, ?)",
+                    (body, array("I", signature).tobytes(), now),
+                )
+                self._conn.executemany(
+                    "INSERT INTO bands (key, cluster_id) VALUES (?, ?)",
+                    [(key, cursor.lastrowid) for key in keys],
+                )
+                self._size += 1
+                self.created += 1
+                assigned.append((cursor.lastrowid, body))
+            self._evict()
+            self._conn.commit()
+        return assigned
+
+    def _best_match(self, keys: list[int], signature: tuple) -> Union[tuple, None]:
+        # A near-duplicate shares several band keys; chance collisions in
+        # common phrasing mostly share one, so only the top few are compared
+        placeholders = ",".join("?" * len(keys))
+        rows = self._conn.execute(
+            f"SELECT id, body, signature FROM clusters WHERE id IN"
+            f" (SELECT cluster_id FROM bands WHERE key IN ({placeholders})"
+            f" GROUP BY cluster_id ORDER BY COUNT(*) DESC LIMIT ?)",
+            (*keys, MAX_CANDIDATES),
+        ).fetchall()
+        best, best_score = None, self.threshold
+        for cluster_id, body, stored in rows:
+            score = self.similarity(signature, tuple(array("I", stored)))
+            if score >= best_score:
+                best, best_score = (cluster_id, body), score
+        return best
+
+    def _evict(self) -> None:
+        if self._size <= self.max_clusters:
+            return
+        stale = [
+            (cluster_id,)
+            for (cluster_id,) in self._conn.execute(
+                "SELECT id FROM clusters ORDER BY last_used LIMIT ?",
+                (self._size - self.max_clusters,),
+            )
+        ]
+        self._conn.executemany("DELETE FROM bands WHERE cluster_id = ?", stale)
+        self._conn.executemany("DELETE FROM clusters WHERE id = ?", stale)
+        self._size -= len(stale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "matched": self.matched,
+                "created": self.created,
+                "clusters": self._size,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -1,19 +1,47 @@
 # publisher.py
 import json
 import os
+import threading
 import requests
-from google.cloud import pubsub_v1
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Union
+
+try:
+    from google.cloud import pubsub_v1
+    from google.cloud.pubsub_v1.types import (
+        BatchSettings,
+        LimitExceededBehavior,
+        PublishFlowControl,
+        PublisherOptions,
+    )
+except ImportError:
+    pubsub_v1 = None
+
+from rate_limiter import backoff_delay
 
 credentials_path = r"xxx.json"
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = credentials_path
 
 topic_path = "projects/qwerty-dev/topics/Reviews"
-publisher = pubsub_v1.PublisherClient()
 
 sku_list = []
 api_url = ""
 
+# Pub/Sub rejects messages over 10 MB; keep headroom for attributes
+MAX_MESSAGE_BYTES = 9_000_000
+
+_publisher = None
+_publisher_lock = threading.Lock()
+
+
+def get_publisher():
+    """The shared PublisherClient, created on first use."""
+    global _publisher
+    with _publisher_lock:
+        if _publisher is None:
+            _publisher = pubsub_v1.PublisherClient()
+        return _publisher
+
+
 def publish_message(message, topic_path):
     """
     Publish a message to a Pub/Sub topic.
@@ -26,10 +54,189 @@ def publish_message(message, topic_path):
         str: The ID of the published message.
     """
     message_json = json.dumps(message).encode("utf-8")
-    future = publisher.publish(topic_path, data=message_json)
+    future = get_publisher().publish(topic_path, data=message_json)
     print(f" [x] Sent {message}")
     return future.result()
 
+
+def split_results(
+    results: dict, mode: str = "review", max_bytes: int = MAX_MESSAGE_BYTES
+) -> list:
+    """
+    Split a `/process_reviews` result into Pub/Sub-sized messages.
+
+    Args:
+        results (dict): Non-compliant reviews by SKU.
+        mode (str): "review" for one message per review, "sku" for one message
+            per SKU (split into parts if it would exceed `max_bytes`).
+        max_bytes (int): Size limit of one message's data.
+
+    Returns:
+        list: (sku, payload) pairs in publish order.
+    """
+    if mode not in ("review", "sku"):
+        raise ValueError(f"unknown publish mode {mode!r}")
+    messages = []
+    for sku, reviews in results.items():
+        if mode == "review":
+            for index, review in enumerate(reviews):
+                messages.append(
+                    (
+                        sku,
+                        {"sku": sku, "index": index, "count": len(reviews), "review": review},
+                    )
+                )
+            continue
+        parts, part, size = [], [], 0
+        for review in reviews:
+            review_size = len(json.dumps(review).encode("utf-8")) + 2
+            if part and size + review_size > max_bytes:
+                parts.append(part)
+                part, size = [], 0
+            part.append(review)
+            size += review_size
+        parts.append(part)
+        for index, part in enumerate(parts):
+            messages.append(
+                (
+                    sku,
+                    {
+                        "sku": sku,
+                        "part": index,
+                        "parts": len(parts),
+                        "non_compliant_reviews": part,
+                    },
+                )
+            )
+    return messages
+
+
+class BatchPublisher:
+    """
+    Publishes results without waiting on each message.
+
+    The client batches messages (`max_messages`, `max_bytes`, `max_latency`)
+    and blocks `publish` once `max_outstanding_messages` or
+    `max_outstanding_bytes` are in flight. Completions are handled in future
+    callbacks; failed messages are republished after a backoff, up to
+    `max_retries` times, and `wait` blocks until every message has settled.
+    Messages carry their SKU as ordering key, so a consumer on an ordered
+    subscription sees each SKU's messages in order (a retried message can
+    arrive after its successors; per-review messages carry an `index`).
+    """
+
+    def __init__(
+        self,
+        topic_path: str,
+        client=None,
+        mode: str = "review",
+        max_messages: int = 100,
+        max_bytes: int = 1_000_000,
+        max_latency: float = 0.05,
+        max_outstanding_messages: int = 1000,
+        max_outstanding_bytes: int = 100_000_000,
+        max_retries: int = 3,
+        ordering: bool = True,
+    ) -> None:
+        self.topic_path = topic_path
+        self.mode = mode
+        self.max_retries = max_retries
+        self.ordering = ordering
+        if client is None:
+            client = pubsub_v1.PublisherClient(
+                batch_settings=BatchSettings(
+                    max_messages=max_messages,
+                    max_bytes=max_bytes,
+                    max_latency=max_latency,
+                ),
+                publisher_options=PublisherOptions(
+                    enable_message_ordering=ordering,
+                    flow_control=PublishFlowControl(
+                        message_limit=max_outstanding_messages,
+                        byte_limit=max_outstanding_bytes,
+                        limit_exceeded_behavior=LimitExceededBehavior.BLOCK,
+                    ),
+                ),
+            )
+        self.client = client
+        self.published = 0
+        self.retries = 0
+        self.failed = []
+        self._outstanding = 0
+        self._condition = threading.Condition()
+
+    def publish(self, sku: str, payload: dict, attempt: int = 0) -> None:
+        """Publish one message; returns as soon as the client has queued it."""
+        data = json.dumps(payload).encode("utf-8")
+        if attempt == 0:
+            with self._condition:
+                self._outstanding += 1
+        kwargs = {"ordering_key": sku} if self.ordering else {}
+        try:
+            future = self.client.publish(self.topic_path, data=data, sku=sku, **kwargs)
+        except Exception as e:
+            self._failed(sku, payload, attempt, e)
+            return
+        future.add_done_callback(
+            lambda f: self._done(f, sku, payload, attempt)
+        )
+
+    def _done(self, future, sku: str, payload: dict, attempt: int) -> None:
+        error = future.exception()
+        if error is not None:
+            self._failed(sku, payload, attempt, error)
+            return
+        with self._condition:
+            self.published += 1
+            self._settle()
+
+    def _failed(self, sku: str, payload: dict, attempt: int, error) -> None:
+        if self.ordering:
+            # The client pauses an ordering key after a failure
+            self.client.resume_publish(self.topic_path, sku)
+        if attempt < self.max_retries:
+            with self._condition:
+                self.retries += 1
+            timer = threading.Timer(
+                backoff_delay(attempt, base=0.5, cap=10.0),
+                self.publish,
+                args=(sku, payload, attempt + 1),
+            )
+            timer.daemon = True
+            timer.start()
+            return
+        print(f"Failed to publish a message for SKU {sku}: {error}")
+        with self._condition:
+            self.failed.append({"sku": sku, "payload": payload, "error": str(error)})
+            self._settle()
+
+    def _settle(self) -> None:
+        self._outstanding -= 1
+        if self._outstanding == 0:
+            self._condition.notify_all()
+
+    def publish_results(self, results: dict) -> None:
+        """Queue every message of a `/process_reviews` result."""
+        for sku, payload in split_results(results, self.mode):
+            self.publish(sku, payload)
+
+    def wait(self, timeout: Union[float, None] = None) -> dict:
+        """
+        Block until all queued messages are published or have given up.
+
+        Returns:
+            dict: Counts of published, retried and failed messages.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._outstanding == 0, timeout)
+            return {
+                "published": self.published,
+                "retries": self.retries,
+                "failed": len(self.failed),
+                "outstanding": self._outstanding,
+            }
+
+
 def call_flask_api(sku_list, api_url):
     """
     Call the Flask API to process reviews for a list of SKUs.
@@ -48,6 +255,11 @@ if __name__ == "__main__":
     # Call the Flask API to process reviews
     non_compliant_reviews = call_flask_api(sku_list, api_url)
 
-    # Publish non-compliant reviews to the Pub/Sub topic
+    # Publish non-compliant reviews to the Pub/Sub topic, one message per
+    # review (PUBLISH_MODE=sku for one per SKU)
     if non_compliant_reviews:
-        publish_message(non_compliant_reviews, topic_path)
+        batch_publisher = BatchPublisher(
+            topic_path, mode=os.environ.get("PUBLISH_MODE", "review")
+        )
+        batch_publisher.publish_results(non_compliant_reviews)
+        print(f" [x] Sent {batch_publisher.wait()}")
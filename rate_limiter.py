@@ -0,0 +1,82 @@
+# rate_limiter.py
+import random
+import threading
+import time
+from collections import deque
+from typing import Union
+
+
+class RateLimiter:
+    """
+    Sliding one-minute window governor for requests and tokens.
+
+    Callers reserve a slot with an estimated token count before each request
+    and settle the reservation with the real usage once the response is in.
+    """
+
+    window = 60.0
+
+    def __init__(
+        self,
+        requests_per_minute: Union[int, None] = None,
+        tokens_per_minute: Union[int, None] = None,
+    ) -> None:
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._entries = deque()
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        while self._entries and now - self._entries[0][0] >= self.window:
+            self._entries.popleft()
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        if not self._entries:
+            return 0.0
+        if (
+            self.requests_per_minute
+            and len(self._entries) >= self.requests_per_minute
+        ):
+            return self._entries[0][0] + self.window - now
+        if self.tokens_per_minute:
+            used = sum(entry[1] for entry in self._entries)
+            if used + tokens > self.tokens_per_minute:
+                # Wait until enough of the oldest usage has left the window.
+                freed = 0
+                for timestamp, entry_tokens in self._entries:
+                    freed += entry_tokens
+                    if used - freed + tokens <= self.tokens_per_minute:
+                        return timestamp + self.window - now
+                return self._entries[-1][0] + self.window - now
+        return 0.0
+
+    def acquire(self, tokens: int = 0) -> list:
+        """
+        Block until a request of `tokens` estimated tokens fits in the window.
+
+        Args:
+            tokens (int): Estimated tokens the request will consume.
+
+        Returns:
+            list: The reservation, to be passed to `settle`.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._prune(now)
+                delay = self._wait_time(tokens, now)
+                if delay <= 0:
+                    entry = [now, tokens]
+                    self._entries.append(entry)
+                    return entry
+            time.sleep(min(delay, self.window))
+
+    def settle(self, entry: list, tokens: int) -> None:
+        """Replace a reservation's estimated tokens with the actual usage."""
+        with self._lock:
+            entry[1] = tokens
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """Full-jitter exponential backoff for the given zero-based retry attempt."""
+    return random.uniform(0, min(cap, base * 2**attempt))
@@ -0,0 +1,231 @@
+# result_store.py
+import glob
+import os
+import re
+import threading
+import uuid
+from datetime import date, datetime, timezone
+from typing import Union
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# "1.0 out of 5 stars" -> 1.0
+RATING_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+# Guideline references in a final reason ("Guideline 5", "G5", "Guideline #5")
+GUIDELINE_REF_PATTERN = re.compile(r"\b(?:G|Guideline\s*#?)(\d{1,2})\b", re.I)
+
+if pa is not None:
+    SCHEMA = pa.schema(
+        [
+            ("asin", pa.string()),
+            ("sku", pa.string()),
+            ("title", pa.string()),
+            ("body", pa.string()),
+            ("rating", pa.float32()),
+            # "compliant" or "non_compliant"
+            ("verdict", pa.string()),
+            ("reason", pa.string()),
+            ("guideline_ids", pa.list_(pa.int8())),
+            ("percentage_of_relevance", pa.float32()),
+            # "rules", "llm" or "near_duplicate" (a fanned-out verdict)
+            ("source", pa.string()),
+            ("duplicate_of", pa.int64()),
+            ("model", pa.string()),
+            ("screened_at", pa.timestamp("ms", tz="UTC")),
+        ]
+    )
+    # Directory partitions: <root>/date=YYYY-MM-DD/part-*.parquet
+    PARTITIONING = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+
+
+def parse_rating(rating) -> Union[float, None]:
+    if isinstance(rating, (int, float)):
+        return float(rating)
+    match = RATING_PATTERN.search(str(rating or ""))
+    return float(match.group()) if match else None
+
+
+def parse_percentage(value) -> Union[float, None]:
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = RATING_PATTERN.search(str(value or ""))
+    return float(match.group()) if match else None
+
+
+def guideline_ids(result: dict) -> list:
+    """The guideline numbers a result cites, from "guidelines" or its reason."""
+    if result.get("guidelines"):
+        return sorted({int(g) for g in result["guidelines"]})
+    refs = GUIDELINE_REF_PATTERN.findall(result.get("reason") or "")
+    return sorted({int(g) for g in refs if 1 <= int(g) <= 99})
+
+
+class ResultStore:
+    """
+    Screening results, compliant and non-compliant, as typed Parquet files
+    partitioned by screening date.
+
+    Every `append` writes a new file, so appends never rewrite data and can
+    run from several threads or processes; `compact` merges a day's files
+    into one sorted by ASIN. Reads prune by date partition and by the ASIN
+    statistics of each row group.
+    """
+
+    def __init__(self, root: str = "results_store", row_group_size: int = 65_536) -> None:
+        if pa is None:
+            raise ImportError("ResultStore needs pyarrow: pip install pyarrow")
+        self.root = root
+        self.row_group_size = row_group_size
+        self.rows_written = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def append(
+        self,
+        asin: str,
+        results: list,
+        sku: Union[str, None] = None,
+        model: Union[str, list, None] = None,
+        screened_at: Union[datetime, None] = None,
+    ) -> int:
+        """
+        Store one row per result.
+
+        Args:
+            asin (str): The ASIN the results belong to.
+            results (list): Result dicts with "title", "rating", "body",
+                "result" ("Yes"/"No") and "reason", as `Screener` builds them;
+                "percentage_of_relevance", "guidelines", "source" and
+                "duplicate_of" are used when present.
+            sku (str, optional): The SKU the ASIN was requested for.
+            model (str or list, optional): The model behind every result, or
+                one per result (None for rule verdicts).
+            screened_at (datetime, optional): Defaults to now.
+
+        Returns:
+            int: Rows written.
+        """
+        if not results:
+            return 0
+        screened_at = screened_at or datetime.now(timezone.utc)
+        models = model if isinstance(model, list) else [model] * len(results)
+        # Built column by column straight from the results; no per-row copies
+        table = pa.table(
+            {
+                "asin": [asin] * len(results),
+                "sku": [sku] * len(results),
+                "title": [r.get("title") for r in results],
+                "body": [r.get("body") for r in results],
+                "rating": [parse_rating(r.get("rating")) for r in results],
+                "verdict": [
+                    "non_compliant" if str(r.get("result")).lower() == "no" else "compliant"
+                    for r in results
+                ],
+                "reason": [r.get("reason") for r in results],
+                "guideline_ids": [guideline_ids(r) for r in results],
+                "percentage_of_relevance": [
+                    parse_percentage(r.get("percentage_of_relevance")) for r in results
+                ],
+                "source": [r.get("source", "llm") for r in results],
+                "duplicate_of": [r.get("duplicate_of") for r in results],
+                "model": models,
+                "screened_at": [screened_at] * len(results),
+            },
+            schema=SCHEMA,
+        )
+        self._write(table, screened_at.astimezone(timezone.utc).date().isoformat())
+        with self._lock:
+            self.rows_written += len(results)
+        return len(results)
+
+    def _partition(self, day: str) -> str:
+        return os.path.join(self.root, f"date={day}")
+
+    def _write(self, table, day: str) -> str:
+        directory = self._partition(day)
+        os.makedirs(directory, exist_ok=True)
+        name = f"part-{datetime.now(timezone.utc):%H%M%S}-{uuid.uuid4().hex[:12]}.parquet"
+        # Readers skip dot-files, so a file is only seen once complete
+        tmp_path = os.path.join(directory, f".{name}")
+        pq.write_table(table, tmp_path, row_group_size=self.row_group_size)
+        path = os.path.join(directory, name)
+        os.replace(tmp_path, path)
+        return path
+
+    def dataset(self):
+        return ds.dataset(
+            self.root,
+            schema=SCHEMA.append(pa.field("date", pa.string())),
+            format="parquet",
+            partitioning=PARTITIONING,
+        )
+
+    def read_table(
+        self,
+        asins: Union[str, list, None] = None,
+        start: Union[date, str, None] = None,
+        end: Union[date, str, None] = None,
+        verdict: Union[str, None] = None,
+        columns: Union[list, None] = None,
+    ):
+        """
+        Rows matching every given filter, as an Arrow table.
+
+        Args:
+            asins (str or list, optional): One ASIN or several.
+            start, end (date or str, optional): Inclusive screening dates
+                ("YYYY-MM-DD", UTC).
+            verdict (str, optional): "compliant" or "non_compliant".
+            columns (list, optional): Columns to read; all by default.
+        """
+        conditions = []
+        if asins is not None:
+            asins = [asins] if isinstance(asins, str) else list(asins)
+            conditions.append(pc.field("asin").isin(asins))
+        if start is not None:
+            conditions.append(pc.field("date") >= str(start))
+        if end is not None:
+            conditions.append(pc.field("date") <= str(end))
+        if verdict is not None:
+            conditions.append(pc.field("verdict") == verdict)
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return self.dataset().to_table(columns=columns, filter=expression)
+
+    def read(self, *args, **kwargs):
+        """`read_table` as a pandas DataFrame."""
+        return self.read_table(*args, **kwargs).to_pandas()
+
+    def compact(self, day: Union[date, str, None] = None) -> int:
+        """
+        Merge each day's files (or only `day`'s) into one file sorted by
+        ASIN and time, so ASIN filters skip most row groups. Returns the
+        number of files removed.
+        """
+        days = (
+            [str(day)]
+            if day is not None
+            else [
+                os.path.basename(d).split("=", 1)[1]
+                for d in glob.glob(os.path.join(self.root, "date=*"))
+            ]
+        )
+        removed = 0
+        for day in days:
+            files = sorted(glob.glob(os.path.join(self._partition(day), "part-*.parquet")))
+            if len(files) < 2:
+                continue
+            table = pa.concat_tables(pq.read_table(f, schema=SCHEMA) for f in files)
+            table = table.sort_by([("asin", "ascending"), ("screened_at", "ascending")])
+            self._write(table, day)
+            for path in files:
+                os.remove(path)
+            removed += len(files)
+        return removed
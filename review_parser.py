@@ -0,0 +1,135 @@
+# review_parser.py
+import re
+from typing import Union
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+from bs4 import BeautifulSoup, SoupStrainer
+
+RATING_PERCENTAGE_PATTERN = re.compile(r"(\d+)\s+stars represent (\d+)% of rating")
+TITLE_PREFIX = "Amazon.com: Customer reviews: "
+
+REVIEW_STRAINER = SoupStrainer("div", attrs={"data-hook": "review"})
+
+
+def _title_text(text: str) -> str:
+    # The title link's first line is the star-rating text
+    return "\n".join(text.split("\n")[1:]).strip()
+
+
+def _rating_percentages(aria_labels) -> dict:
+    rating_percentages = {}
+    for label in aria_labels:
+        match = RATING_PERCENTAGE_PATTERN.search(label or "")
+        if match:
+            rating_percentages[int(match.group(1))] = int(match.group(2))
+    return rating_percentages
+
+
+def _parse_reviews_lxml(page_source: str) -> tuple[list, list]:
+    tree = lxml.html.fromstring(page_source)
+    reviews, errors = [], []
+    for item in tree.xpath('//div[@data-hook="review"]'):
+        title = item.xpath('.//a[@data-hook="review-title"]')
+        rating = item.xpath('.//i[@data-hook="review-star-rating"]')
+        body = item.xpath('.//span[@data-hook="review-body"]')
+        if not (title and rating and body):
+            errors.append(f"incomplete review node {item.get('id')}")
+            continue
+        reviews.append(
+            {
+                "id": item.get("id"),
+                "title": _title_text(title[0].text_content()),
+                "rating": rating[0].text_content().strip(),
+                "body": body[0].text_content().strip(),
+            }
+        )
+    return reviews, errors
+
+
+def _parse_reviews_soup(page_source: str) -> tuple[list, list]:
+    soup = BeautifulSoup(page_source, "html.parser", parse_only=REVIEW_STRAINER)
+    reviews, errors = [], []
+    for item in soup.find_all("div", {"data-hook": "review"}):
+        try:
+            reviews.append(
+                {
+                    "id": item.get("id"),
+                    "title": _title_text(
+                        item.find("a", {"data-hook": "review-title"}).text
+                    ),
+                    "rating": item.find(
+                        "i", {"data-hook": "review-star-rating"}
+                    ).text.strip(),
+                    "body": item.find("span", {"data-hook": "review-body"}).text.strip(),
+                }
+            )
+        except AttributeError as e:
+            errors.append(str(e))
+    return reviews, errors
+
+
+def parse_reviews(page_source: str) -> tuple[list, list]:
+    """
+    Extract the reviews on one review page.
+
+    Args:
+        page_source (str): The review page HTML.
+
+    Returns:
+        tuple: The review dicts ("id", "title", "rating", "body") in page
+        order, and one error message per review node that could not be read.
+    """
+    if lxml is not None:
+        return _parse_reviews_lxml(page_source)
+    return _parse_reviews_soup(page_source)
+
+
+def parse_header(page_source: str) -> Union[dict, None]:
+    """
+    Extract the product header shown on every review page: title, overall
+    rating, total ratings and the star histogram. Call it once per ASIN.
+
+    Returns:
+        dict or None: The header fields, or None if the page has no header.
+    """
+    if lxml is not None:
+        tree = lxml.html.fromstring(page_source)
+        title = tree.findtext(".//title")
+        overall = tree.xpath('//span[@data-hook="rating-out-of-text"]')
+        total = tree.xpath(
+            '//div[@data-hook="total-review-count"]'
+            '//span[@class="a-size-base a-color-secondary"]'
+        )
+        if title is None or not overall or not total:
+            return None
+        labels = tree.xpath(
+            '//tr[@class="a-histogram-row a-align-center"]/@aria-label'
+        )
+        overall_text = overall[0].text_content()
+        total_text = total[0].text_content()
+    else:
+        # Parsed once per ASIN, so the full tree is affordable here
+        soup = BeautifulSoup(page_source, "html.parser")
+        title = soup.title.text if soup.title else None
+        overall = soup.find("span", {"data-hook": "rating-out-of-text"})
+        total_div = soup.find("div", {"data-hook": "total-review-count"})
+        total = total_div and total_div.find(
+            "span", {"class": "a-size-base a-color-secondary"}
+        )
+        if title is None or overall is None or total is None:
+            return None
+        labels = [
+            r.get("aria-label")
+            for r in soup.find_all("tr", {"class": "a-histogram-row a-align-center"})
+        ]
+        overall_text = overall.text
+        total_text = total.text
+    return {
+        "product title": title.replace(TITLE_PREFIX, "").strip(),
+        "overall rating": overall_text.strip(),
+        "total ratings": total_text.strip().replace(" global ratings", ""),
+        "rating percentages": _rating_percentages(labels),
+    }
@@ -0,0 +1,209 @@
+# review_sink.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from queue import Empty, Queue
+from typing import Callable, Union
+
+
+class BatchSink(ABC):
+    """
+    Buffers decoded messages and writes them in batches from one writer
+    thread. A batch is written once `max_batch` records are queued or
+    `flush_interval` seconds after its first record arrived; each record's
+    `on_done` callback (e.g. `message.ack`) runs only after its batch is
+    durably on disk, and `on_error` (e.g. `message.nack`) if writing failed.
+    """
+
+    def __init__(self, max_batch: int = 500, flush_interval: float = 1.0) -> None:
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        self._queue = Queue()
+        self._closed = False
+        self._writer = threading.Thread(
+            target=self._run, name=f"{type(self).__name__}-writer", daemon=True
+        )
+        self._writer.start()
+
+    def put(
+        self,
+        record: dict,
+        on_done: Union[Callable[[], None], None] = None,
+        on_error: Union[Callable[[], None], None] = None,
+    ) -> None:
+        """Queue a record for the next batch."""
+        if self._closed:
+            raise RuntimeError("sink is closed")
+        self._queue.put((record, on_done, on_error))
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+            if stop:
+                return
+
+    def _flush(self, batch: list) -> None:
+        try:
+            self.write_batch([record for record, _, _ in batch])
+        except Exception as e:
+            print(f"Failed to write {len(batch)} messages: {e}")
+            self.errors += len(batch)
+            for _, _, on_error in batch:
+                if on_error is not None:
+                    on_error()
+            return
+        self.written += len(batch)
+        self.batches += 1
+        for _, on_done, _ in batch:
+            if on_done is not None:
+                on_done()
+
+    @abstractmethod
+    def write_batch(self, records: list) -> None:
+        """Write and durably flush `records`; raise if they are not stored."""
+
+    def close(self) -> None:
+        """Write everything still queued, then stop the writer."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._writer.join()
+
+    def stats(self) -> dict:
+        return {"written": self.written, "batches": self.batches, "errors": self.errors}
+
+
+class JsonlSink(BatchSink):
+    """Appends one compact JSON object per line and fsyncs every batch."""
+
+    def __init__(self, path: str = "non_compliant_reviews_output.jsonl", **kwargs) -> None:
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        super().__init__(**kwargs)
+
+    def write_batch(self, records: list) -> None:
+        self._file.write(
+            "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+        )
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        super().close()
+        self._file.close()
+
+
+class SqliteSink(BatchSink):
+    """
+    Inserts messages into a `messages` table, one transaction per batch.
+    Redelivered messages (same `message_id`) are stored once.
+    """
+
+    def __init__(self, path: str = "non_compliant_reviews.sqlite3", **kwargs) -> None:
+        self.path = path
+        # Only the writer thread uses the connection after setup
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS messages (
+                message_id TEXT PRIMARY KEY,
+                sku TEXT,
+                received_at REAL NOT NULL,
+                data TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        super().__init__(**kwargs)
+
+    def write_batch(self, records: list) -> None:
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO messages (message_id, sku, received_at, data)"
+                " VALUES (?, ?, ?, ?)",
+                [
+                    (
+                        record["message_id"],
+                        record.get("sku"),
+                        record["received_at"],
+                        json.dumps(record["data"], separators=(",", ":")),
+                    )
+                    for record in records
+                ],
+            )
+
+    def close(self) -> None:
+        super().close()
+        self._conn.close()
+
+
+class ParquetSink(BatchSink):
+    """
+    Appends the reviews of each batch to a `ResultStore`, one row per
+    review in the typed, date-partitioned Parquet layout. Messages are not
+    deduplicated, so a redelivered message is stored twice.
+    """
+
+    def __init__(self, path: str = "non_compliant_reviews_store", **kwargs) -> None:
+        from result_store import ResultStore
+
+        self.path = path
+        self.store = ResultStore(path)
+        super().__init__(**kwargs)
+
+    def write_batch(self, records: list) -> None:
+        groups = {}
+        for record in records:
+            data = record["data"]
+            reviews = (
+                [data["review"]] if "review" in data else data.get("non_compliant_reviews", [])
+            )
+            for review in reviews:
+                groups.setdefault((review.get("asin"), record.get("sku")), []).append(review)
+        received_at = datetime.fromtimestamp(records[-1]["received_at"], timezone.utc)
+        for (asin, sku), reviews in groups.items():
+            self.store.append(asin, reviews, sku=sku, screened_at=received_at)
+
+
+def make_sink(kind: str = "jsonl", path: Union[str, None] = None, **kwargs) -> BatchSink:
+    """
+    Build a sink by name.
+
+    Args:
+        kind (str): "jsonl", "sqlite" or "parquet".
+        path (str, optional): Output file; each sink has its own default.
+        **kwargs: `max_batch` and `flush_interval`.
+
+    Returns:
+        BatchSink: The running sink.
+    """
+    sinks = {"jsonl": JsonlSink, "sqlite": SqliteSink, "parquet": ParquetSink}
+    if kind not in sinks:
+        raise ValueError(f"unknown sink {kind!r}, expected one of {sorted(sinks)}")
+    if path:
+        kwargs["path"] = path
+    return sinks[kind](**kwargs)
@@ -0,0 +1,132 @@
+# scrape_state.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Union
+
+
+class ScrapeStateStore:
+    """
+    Per-ASIN scraping watermarks: the review IDs already seen and the last
+    product header (total ratings, rating percentages) for each ASIN.
+    """
+
+    def __init__(self, path: str = "scrape_state.sqlite3") -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS seen_reviews (
+                asin TEXT NOT NULL,
+                review_id TEXT NOT NULL,
+                first_seen REAL NOT NULL,
+                PRIMARY KEY (asin, review_id)
+            );
+            CREATE TABLE IF NOT EXISTS asins (
+                asin TEXT PRIMARY KEY,
+                last_scraped REAL NOT NULL,
+                total_ratings TEXT,
+                rating_percentages TEXT
+            );
+            """
+        )
+        self._conn.commit()
+
+    def known_review_ids(self, asin: str) -> set:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT review_id FROM seen_reviews WHERE asin = ?", (asin,)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def count_reviews_since(self, asin: str, since: float) -> int:
+        """How many of an ASIN's reviews were first seen at or after `since`."""
+        with self._lock:
+            (count,) = self._conn.execute(
+                "SELECT COUNT(*) FROM seen_reviews WHERE asin = ? AND first_seen >= ?",
+                (asin, since),
+            ).fetchone()
+        return count
+
+    def last_scraped(self, asin: str) -> Union[float, None]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_scraped FROM asins WHERE asin = ?", (asin,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def header(self, asin: str) -> Union[dict, None]:
+        """The last recorded `total ratings` and `rating percentages` for an ASIN."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_scraped, total_ratings, rating_percentages"
+                " FROM asins WHERE asin = ?",
+                (asin,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "last scraped": row[0],
+            "total ratings": row[1],
+            "rating percentages": {
+                int(k): v for k, v in json.loads(row[2] or "{}").items()
+            },
+        }
+
+    def record_scrape(self, asin: str, header: dict, review_ids) -> None:
+        """
+        Record the reviews and product header of a finished scrape.
+
+        Args:
+            asin (str): The scraped ASIN.
+            header (dict): The scraped "total ratings" and "rating percentages".
+            review_ids (iterable): IDs of the reviews scraped in this run.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO seen_reviews (asin, review_id, first_seen)"
+                " VALUES (?, ?, ?)",
+                [(asin, review_id, now) for review_id in review_ids],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO asins"
+                " (asin, last_scraped, total_ratings, rating_percentages)"
+                " VALUES (?, ?, ?, ?)",
+                (
+                    asin,
+                    now,
+                    header.get("total ratings"),
+                    json.dumps(header.get("rating percentages", {})),
+                ),
+            )
+            self._conn.commit()
+
+    def forget(self, asin: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM seen_reviews WHERE asin = ?", (asin,))
+            self._conn.execute("DELETE FROM asins WHERE asin = ?", (asin,))
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def default_state_store() -> ScrapeStateStore:
+    """Process-wide store at SCRAPE_STATE_PATH (default scrape_state.sqlite3)."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ScrapeStateStore(
+                os.getenv("SCRAPE_STATE_PATH", "scrape_state.sqlite3")
+            )
+        return _default_store
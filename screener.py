@@ -3,16 +3,422 @@ import os
 from langchain_openai import OpenAI, ChatOpenAI
 from langchain.schema import SystemMessage, HumanMessage
 import json
+import re
+from collections import Counter
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty, Queue
+from typing import Union
+
+import openai
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
 from langchain_community.callbacks import get_openai_callback
 from dotenv import load_dotenv
 
+from metrics import (
+    LLM_BATCH_FAILURES_TOTAL,
+    LLM_CALL_SECONDS,
+    LLM_COMPLETION_TOKENS_TOTAL,
+    LLM_PROMPT_TOKENS_TOTAL,
+    LLM_RETRIES_TOTAL,
+    SCREENED_REVIEWS_TOTAL,
+    propagate,
+)
+from rate_limiter import RateLimiter, backoff_delay
+from near_duplicates import NearDuplicateIndex
+from result_store import ResultStore
+from verdict_cache import VerdictCache, fingerprint, normalize_body
+
 load_dotenv(override=True)
 
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+# Marks the end of input on a streaming pipeline queue
+STREAM_END = object()
+MODERATOR_ROLE = "You are an expert moderator following Amazon's community guidelines."
+# "3. **Supported languages only**: ..." -> "G3 Supported languages only: ..."
+GUIDELINE_LINE_PATTERN = re.compile(r"^\s*(\d+)\.\s*(.+?)\s*$", re.M)
+# Guideline references in a first-pass reason ("G5", "Guideline 5", "Guideline #5")
+GUIDELINE_REF_PATTERN = re.compile(r"\b(?:G|Guideline\s*#?)(\d{1,2})\b", re.I)
+COMPACT_REF_PATTERN = re.compile(r"\bG(\d{1,2})\b")
+# Asked of the first tier of a cascade, to decide what the second tier sees
+CONFIDENCE_INSTRUCTION = (
+    'Also give "confidence": how sure you are of the result, from 0 to 1.'
+)
+
+
+class MalformedResponseError(ValueError):
+    """The LLM reply was truncated or could not be parsed as verdicts."""
+
+# Mechanical checks for guidelines that do not need an LLM. Only order
+# numbers, emails and URLs are taken as clear-cut violations. Phone-like
+# numbers, bare domain names, character runs and the language and repetition
+# checks also match innocent text ("100 200 3000 mm", "docs.python.org"), so
+# on their own they are only passed to the LLM as hints.
+# Each regex is guarded by a cheap substring test so the common case (a plain
+# complaint) never runs them.
+ORDER_NUMBER_PATTERN = re.compile(r"\b\d{3}-\d{7}-\d{7}\b")
+PHONE_PATTERN = re.compile(
+    r"(?<![\w-])(?:\+?1[\s.-]?)?(?:\(\d{3}\)\s?|\d{3}[\s.-])\d{3}[\s.-]\d{4}(?![\w-])"
+)
+EMAIL_PATTERN = re.compile(r"\b[\w.+-]+@[\w-]+(?:\.[\w-]+)*\.[a-z]{2,}\b", re.I)
+LINK_PATTERN = re.compile(
+    r"\b(?:https?://|www\.)([\w.-]+)"
+    r"|\b((?:[\w-]+\.)+(?:com|net|org|io|info|biz|shop|store|ly))\b(?!\.\w)",
+    re.I,
+)
+AMAZON_HOST_PATTERN = re.compile(
+    r"(?:^|\.)(?:amazon\.[a-z.]+|amzn\.(?:to|com|eu)|a\.co)$", re.I
+)
+ANY_RUN_PATTERN = re.compile(r"(\S)\1\1\1\1\1\1\1")
+PUNCTUATION_RUN_PATTERN = re.compile(r"[!?]{6,}")
+LETTER_PATTERN = re.compile(r"[^\W\d_]")
+LATIN_LETTER_PATTERN = re.compile(r"[a-zA-Z\u00c0-\u024f]")
+SENTENCE_SPLIT_PATTERN = re.compile(r"(?<=[.!?])\s+|\n+")
+
+DIGITS = "0123456789"
+LINK_MARKERS = (
+    "http", "www.", ".com", ".net", ".org", ".io", ".info", ".biz", ".shop",
+    ".store", ".ly",
+)
+SUPPORTED_STOPWORDS = frozenset(
+    "the and is it to i this was of for not in my that but with a you on they "
+    "el la de que y en los no es un una por para con muy se lo las del me"
+    .split()
+)
+OTHER_LATIN_STOPWORDS = frozenset(
+    "le les et est une pas avec pour dans ce qui sur der die und ist nicht das "
+    "ein eine mit auf sehr het een niet ik och att det som är il di che "
+    "non per sono não com uma mas"
+    .split()
+)
+
+GUIDELINE_NAMES = {
+    3: "Supported languages only",
+    4: "No spam or repetitive content",
+    5: "No private information",
+    9: "No external links",
+}
+
+
+class RuleScreener:
+    """
+    Deterministic pre-screening for the guidelines that can be checked
+    mechanically: #3 language, #4 repetition and excessive punctuation,
+    #5 phone numbers, emails and order numbers, and #9 external links.
+
+    `screen` only returns a verdict when a violation is clear-cut; every
+    other review is left for the LLM, with `hints` naming the weaker
+    matches for it to judge.
+    """
+
+    def __init__(
+        self,
+        min_words_for_language: int = 6,
+        min_letters_for_script: int = 12,
+        min_words_for_repetition: int = 8,
+        max_unique_word_ratio: float = 0.3,
+    ) -> None:
+        self.min_words_for_language = min_words_for_language
+        self.min_letters_for_script = min_letters_for_script
+        self.min_words_for_repetition = min_words_for_repetition
+        self.max_unique_word_ratio = max_unique_word_ratio
+
+    @staticmethod
+    def _private_information(body: str) -> tuple[list[str], list[str]]:
+        """Order numbers and emails, and phone-like numbers."""
+        found, phones = [], []
+        if sum(body.count(d) for d in DIGITS) >= 10:
+            found += ORDER_NUMBER_PATTERN.findall(body)
+            phones = PHONE_PATTERN.findall(body)
+        if "@" in body:
+            found += EMAIL_PATTERN.findall(body)
+        return found, phones
+
+    @staticmethod
+    def _external_links(body: str, lower: str) -> tuple[list[str], list[str]]:
+        """Non-Amazon URLs ("http://...", "www..."), and bare domain names."""
+        if not any(marker in lower for marker in LINK_MARKERS):
+            return [], []
+        if "@" in body:
+            body = EMAIL_PATTERN.sub(" ", body)
+        links, domains = [], []
+        for match in LINK_PATTERN.finditer(body):
+            host = (match.group(1) or match.group(2)).rstrip(".").lower()
+            if not AMAZON_HOST_PATTERN.search(host):
+                (links if match.group(1) else domains).append(match.group(0))
+        return links, domains
+
+    def _unsupported_language(self, body: str, words: list[str]) -> bool:
+        if not body.isascii():
+            letters = LETTER_PATTERN.findall(body)
+            if len(letters) >= self.min_letters_for_script:
+                latin = LATIN_LETTER_PATTERN.findall(body)
+                if len(latin) / len(letters) < 0.2:
+                    return True
+        if len(words) < self.min_words_for_language:
+            return False
+        return (
+            SUPPORTED_STOPWORDS.isdisjoint(words)
+            and len(OTHER_LATIN_STOPWORDS.intersection(words)) >= 3
+        )
+
+    @staticmethod
+    def _unsupported_sentence(sentence: str) -> bool:
+        """`_unsupported_language` for one sentence, without the length minimums."""
+        if not sentence.isascii():
+            letters = LETTER_PATTERN.findall(sentence)
+            if letters and len(LATIN_LETTER_PATTERN.findall(sentence)) / len(letters) < 0.2:
+                return True
+        words = sentence.lower().split()
+        return SUPPORTED_STOPWORDS.isdisjoint(words) and not OTHER_LATIN_STOPWORDS.isdisjoint(words)
+
+    def _is_repetitive(self, words: list[str]) -> bool:
+        if len(words) >= self.min_words_for_repetition:
+            return len(set(words)) / len(words) <= self.max_unique_word_ratio
+        return False
+
+    def _percentage(self, body: str, snippets: list[str], guidelines: list[int]) -> str:
+        """
+        The share of sentences holding a matched span: a snippet, a sentence
+        in an unsupported language (#3), or one made mostly of the review's
+        repeated words (#4).
+        """
+        sentences = [s for s in SENTENCE_SPLIT_PATTERN.split(body) if s.strip()]
+        if not sentences:
+            return "100%"
+        repeated = set()
+        if 4 in guidelines:
+            counts = Counter(body.lower().split())
+            repeated = {word for word, count in counts.items() if count >= 3}
+        flagged = 0
+        for sentence in sentences:
+            words = sentence.lower().split()
+            if (
+                any(x in sentence for x in snippets)
+                or (3 in guidelines and self._unsupported_sentence(sentence))
+                or (repeated and 2 * sum(w in repeated for w in words) >= len(words))
+            ):
+                flagged += 1
+        if not flagged:
+            # Spread over the review rather than held in any one sentence
+            return "100%"
+        return f"{max(1, round(100 * flagged / len(sentences)))}%"
+
+    def hints(self, review: dict) -> list[str]:
+        """
+        Weaker matches to point the LLM at, e.g. "G5 phone number?
+        (555) 123-4567". They can be false positives, so they never make a
+        verdict by themselves.
+        """
+        body = review["body"]
+        lower = body.lower()
+        words = lower.split()
+        hints = []
+        if self._unsupported_language(body, words):
+            hints.append("G3 not English or Spanish?")
+        if self._is_repetitive(words):
+            hints.append("G4 repetitive text?")
+        _, phones = self._private_information(body)
+        if phones:
+            hints.append(f"G5 phone number? {', '.join(phones[:3])}")
+        _, domains = self._external_links(body, lower)
+        if domains:
+            hints.append(f"G9 website? {', '.join(domains[:3])}")
+        if ("!!" in body or "??" in body) and PUNCTUATION_RUN_PATTERN.search(body):
+            hints.append("G4 excessive punctuation?")
+        run = ANY_RUN_PATTERN.search(body)
+        if run and not (hints and run.group(1) in "!?"):
+            hints.append(f"G4 repeated character {run.group(1)!r}?")
+        return hints
+
+    def screen(self, review: dict) -> Union[dict, None]:
+        """
+        Check one review against the mechanical guidelines.
+
+        Args:
+            review (dict): A scraped review with a "body".
+
+        Returns:
+            dict or None: A final "No" verdict with "reason",
+            "percentage_of_relevance", "guidelines" and "source": "rules" if
+            the review clearly violates a rule, otherwise None.
+        """
+        body = review["body"]
+        lower = body.lower()
+        words = lower.split()
+        reasons = []
+        snippets = []
+        guidelines = []
+
+        private, _ = self._private_information(body)
+        if private:
+            reasons.append("Contains private information (email or order number)")
+            snippets += private
+            guidelines.append(5)
+        links, _ = self._external_links(body, lower)
+        if links:
+            reasons.append(f"Links to external sites ({', '.join(links[:3])})")
+            snippets += links
+            guidelines.append(9)
+        if not guidelines:
+            return None
+        # Reported alongside a clear-cut violation, but never on their own
+        if self._is_repetitive(words):
+            reasons.append("Repetitive text")
+            guidelines.append(4)
+        if self._unsupported_language(body, words):
+            reasons.append("Not written in English or Spanish")
+            guidelines.append(3)
+        percentage = self._percentage(body, snippets, guidelines)
+        reason = "; ".join(
+            f"{r} (Guideline {g}: {GUIDELINE_NAMES[g]})"
+            for r, g in zip(reasons, guidelines)
+        )
+        return {
+            "result": "No",
+            "reason": reason,
+            "percentage_of_relevance": percentage,
+            "guidelines": sorted(guidelines),
+            "source": "rules",
+        }
+
+
+class ModelTier:
+    """
+    The model used for a screening pass, with its own client, rate governor,
+    concurrency and batch settings.
+    """
+
+    def __init__(
+        self,
+        model: str = "gpt-4o",
+        batch_size: int = 50,
+        max_prompt_tokens: int = 12000,
+        max_completion_tokens: int = 3500,
+        max_concurrency: int = 4,
+        requests_per_minute: Union[int, None] = None,
+        tokens_per_minute: Union[int, None] = None,
+        request_timeout: float = 120,
+        api_key: Union[str, None] = None,
+    ) -> None:
+        self.model = model
+        self.batch_size = batch_size
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_completion_tokens = max_completion_tokens
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_limiter = RateLimiter(
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+        )
+        # Retries are handled by `Screener._invoke` so they go through the governor.
+        self.llm = ChatOpenAI(
+            model=model,
+            temperature=0,
+            api_key=api_key or os.getenv("OPENAI_API_KEY"),
+            max_retries=0,
+            timeout=request_timeout,
+            max_tokens=max_completion_tokens,
+        )
+
+
 class Screener:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        model: str = "gpt-4o",
+        batch_size: int = 50,
+        max_prompt_tokens: int = 12000,
+        max_completion_tokens: int = 3500,
+        completion_tokens_per_review: int = 70,
+        max_concurrency: int = 4,
+        requests_per_minute: Union[int, None] = None,
+        tokens_per_minute: Union[int, None] = None,
+        max_retries: int = 3,
+        request_timeout: float = 120,
+        cache_path: Union[str, None] = "verdict_cache.sqlite3",
+        use_rules: bool = True,
+        compact_prompts: bool = True,
+        max_review_chars: Union[int, None] = None,
+        check_tier: Union[ModelTier, None] = None,
+        min_confidence: float = 0.8,
+        dedupe_path: Union[str, None] = "near_duplicates.sqlite3",
+        dedupe_threshold: float = 0.85,
+        results_dir: Union[str, None] = None,
+        result_store: Union[str, None] = "results_store",
+    ) -> None:
+        """
+        Args:
+            model, batch_size, max_prompt_tokens, max_completion_tokens,
+            max_concurrency, requests_per_minute, tokens_per_minute,
+            request_timeout: Settings of the tier that runs the recheck pass
+                (and the first pass too, unless `check_tier` is given).
+            check_tier (ModelTier, optional): A cheaper model for the first
+                pass. Only the reviews it flags, or answers with a
+                confidence below `min_confidence`, go to the second tier.
+            dedupe_path (str, optional): `NearDuplicateIndex` database; bodies
+                at least `dedupe_threshold` similar to an already seen one
+                share its verdict. None screens every body separately.
+            results_dir (str, optional): Where each run also writes
+                `{asin}_noncompliant_reviews.json`; None writes no file.
+            result_store (str, optional): `ResultStore` directory that every
+                run appends all its verdicts to, compliant or not. None
+                keeps no results.
+        """
         self.api_key = os.getenv("OPENAI_API_KEY")
-        self.llm = ChatOpenAI(model="gpt-4o", temperature=0, api_key = self.api_key)
+        self.model = model
+        self.compact_prompts = compact_prompts
+        self.max_review_chars = max_review_chars
+        self.completion_tokens_per_review = completion_tokens_per_review
+        self.min_confidence = min_confidence
+        self.results_dir = results_dir
+        self.result_store = ResultStore(result_store) if result_store else None
+        self.max_retries = max_retries
+        # The last finished run's stats. Runs may overlap when the Screener is
+        # shared between threads; pass `run_stats` to get a run's own.
+        self.last_run_stats = {}
+        self._stats_lock = threading.Lock()
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                try:
+                    self._encoding = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    self._encoding = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                # tiktoken downloads encodings on first use, so it fails offline
+                print(
+                    f"Warning: no tiktoken encoding for {model} ({type(e).__name__});"
+                    " estimating tokens as characters / 4"
+                )
+        self.cache = VerdictCache(cache_path) if cache_path else None
+        self.near_duplicates = (
+            NearDuplicateIndex(dedupe_path, threshold=dedupe_threshold)
+            if dedupe_path
+            else None
+        )
+        self.rule_screener = RuleScreener() if use_rules else None
+        recheck_tier = ModelTier(
+            model=model,
+            batch_size=batch_size,
+            max_prompt_tokens=max_prompt_tokens,
+            max_completion_tokens=max_completion_tokens,
+            max_concurrency=max_concurrency,
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+            request_timeout=request_timeout,
+            api_key=self.api_key,
+        )
+        self.cascade = check_tier is not None
+        self.tiers = {"check": check_tier or recheck_tier, "recheck": recheck_tier}
         self.guidelines = """
 1. Reviews must not mention sellers, customer service, ordering issues, returns, shipping, or damage during.
 2. Acceptable if related to product value. No individual pricing experiences or specific store availability.
@@ -49,6 +455,7 @@ Give the output in the following format:
     "reason" : "If no then why"
 }
 }
+Some reviews have "Hints" from automated pattern checks. They can be false positives, so judge each review by its text.
 {{reviews_text}}
         """
         self.prompt_template_2 = """
@@ -76,185 +483,842 @@ Provide the output in the following format:
 Reviews:-
 {{reviews_text}}
 """
+        # Compact mode: everything static sits in the system message, so
+        # the prefix is identical across batches (and eligible for prompt
+        # caching); the user message holds only "[n] body" lines.
+        self.compact_template_1 = """{{role}}
+Guidelines:
+{{guidelines}}
 
-    def check_reviews_compliance(self, reviews):
-        reviews_text = ""
-        for i, review in enumerate(reviews, 1):
-            reviews_text += f"""
-            Review: {i}
-            Body: {review['body']}
-            """
+Each review is given as "[n] text", sometimes followed by "hint: ..." from automated pattern checks, which can be false positives. Decide for each whether it complies with every guideline.
+Reply with JSON only, one key per review number:
+{"1":{"result":"Yes","reason":""},"2":{"result":"No","reason":"G5: gives a phone number"}}"""
+        self.compact_template_2 = """{{role}}
+Guidelines:
+{{guidelines}}
 
-        self.prompt_1 = self.prompt_template_1.replace(
-            "{{guidelines}}", self.guidelines
-        ).replace("{{reviews_text}}", reviews_text)
+Each review is given as "[n] text" followed by "prior: <result> <guideline ids>", a first-pass verdict. Confirm or correct it. For a non-compliant review, name the violated guideline ids in the reason and give percentage_of_relevance, the share of the review that violates them (1 of 10 sentences = "10%").
+Reply with JSON only, one key per review number:
+{"1":{"result":"No","reason":"G1: complains about shipping","percentage_of_relevance":"20%"},"2":{"result":"Yes","reason":"","percentage_of_relevance":"0%"}}"""
 
-        messages_1 = [
-            SystemMessage(
-                content="You are an expert moderator following Amazon's community guidelines."
-            ),
-            HumanMessage(content=self.prompt_1),
-        ]
+    def _count_tokens(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return len(text) // 4 + 1
 
-        start_time = time.time()
-        with get_openai_callback() as cb:
-            response = self.llm.invoke(messages_1)
-            token_usage = cb.total_tokens
-        end_time = time.time()
-        response_content = response.content
-
-        if "```json" in response_content:
-            response_content = response_content[7:]
-            response_content = response_content[:-3]
-        # print(response_content)
-
-        result = {
-            "response": json.loads(response_content),
-            "tokens": token_usage,
-            "time_taken": end_time - start_time,
-        }
+    def _keep(self, stats: dict, results: list, stage: Union[str, None]) -> None:
+        """Queue final results for the result store, with the model behind them."""
+        if self.result_store is None or not results:
+            return
+        model = self.tiers[stage].model if stage else None
+        with self._stats_lock:
+            stats["rows"].extend((result, model) for result in results)
+
+    def _unscreened(self, stats: dict, item: dict) -> None:
+        with self._stats_lock:
+            stats["unscreened"].append(item)
 
-        return result
+    def _record(self, stats: Union[dict, None], **counts) -> None:
+        if stats is None:
+            return
+        with self._stats_lock:
+            for name, value in counts.items():
+                stats[name] += value
+
+    def _invoke(self, messages, stats: Union[dict, None] = None, stage: str = "check"):
+        """
+        Send one batch prompt through the rate governor, retrying rate limits
+        and timeouts with jittered exponential backoff. Malformed or truncated
+        replies raise ValueError so the caller can bisect the batch.
+        """
+        tier = self.tiers[stage]
+        estimated_tokens = sum(self._count_tokens(m.content) for m in messages)
+        for attempt in range(self.max_retries + 1):
+            reservation = tier.rate_limiter.acquire(estimated_tokens)
+            start_time = time.time()
+            try:
+                with LLM_CALL_SECONDS.time(
+                    stage=stage, model=tier.model
+                ), get_openai_callback() as cb:
+                    response = tier.llm.invoke(messages)
+                    token_usage = cb.total_tokens
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                LLM_RETRIES_TOTAL.inc(stage=stage)
+                delay = backoff_delay(attempt)
+                print(
+                    f"Batch attempt {attempt + 1} failed ({type(e).__name__}: {e}),"
+                    f" retrying in {delay:.1f}s"
+                )
+                self._record(stats, retries=1)
+                time.sleep(delay)
+                continue
+            metadata = getattr(response, "response_metadata", None) or {}
+            # Clients the OpenAI callback does not see still report usage
+            usage = metadata.get("token_usage") or {}
+            token_usage = token_usage or usage.get("total_tokens", 0)
+            tier.rate_limiter.settle(reservation, token_usage)
+            end_time = time.time()
+            LLM_PROMPT_TOKENS_TOTAL.inc(
+                cb.prompt_tokens or usage.get("prompt_tokens", 0),
+                stage=stage,
+                model=tier.model,
+            )
+            LLM_COMPLETION_TOKENS_TOTAL.inc(
+                cb.completion_tokens or usage.get("completion_tokens", 0),
+                stage=stage,
+                model=tier.model,
+            )
+            self._record(
+                stats,
+                total_tokens=token_usage,
+                total_time=end_time - start_time,
+                llm_calls=1,
+                **{
+                    f"{stage}_calls": 1,
+                    f"{stage}_tokens": token_usage,
+                    f"{stage}_time": end_time - start_time,
+                },
+            )
+            response_content = response.content
 
-    def recheck_reviews_compliance(self, reviews):
-        reviews_text = str()
-        for i, review in enumerate(reviews, 1):
-            reviews_text += f"""
-            Review: {i}
+            if metadata.get("finish_reason") == "length":
+                raise MalformedResponseError("response truncated at max_tokens")
+
+            if "```json" in response_content:
+                response_content = response_content[7:]
+                response_content = response_content[:-3]
+
+            return {
+                "response": json.loads(response_content),
+                "tokens": token_usage,
+                "time_taken": end_time - start_time,
+            }
+
+    def _pack_batches(self, stage: str, reviews: list, pending: list) -> list:
+        """
+        Group the `pending` review indices into batches that fit the prompt
+        and completion token budgets, capped at `batch_size` reviews each.
+        """
+        tier = self.tiers[stage]
+        base_tokens = self._count_tokens(self._static_prompt(stage))
+        max_reviews = min(
+            tier.batch_size,
+            max(1, tier.max_completion_tokens // self.completion_tokens_per_review),
+        )
+        batches = []
+        current = []
+        prompt_tokens = base_tokens
+        for j in pending:
+            text = self._review_text(stage, len(current) + 1, reviews[j])
+            tokens = self._count_tokens(text)
+            if current and (
+                len(current) >= max_reviews
+                or prompt_tokens + tokens > tier.max_prompt_tokens
+            ):
+                batches.append(current)
+                current = []
+                prompt_tokens = base_tokens
+            current.append(j)
+            prompt_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def _check_batch(
+        self, stage: str, check, fields: tuple, batch: list, stats: dict
+    ) -> list:
+        """
+        Screen one batch, returning a verdict (or None) per review.
+
+        A malformed reply is bisected and both halves are resubmitted;
+        reviews missing from an otherwise valid reply are resubmitted on
+        their own, so a bad batch costs only its affected reviews.
+        """
+        with self._stats_lock:
+            stats["batch_sizes"].append(len(batch))
+        try:
+            compliance_results = check(batch, stats)
+        except ValueError as e:
+            LLM_BATCH_FAILURES_TOTAL.inc(stage=stage, reason="malformed")
+            return self._bisect(stage, check, fields, batch, stats, e)
+        except Exception as e:
+            LLM_BATCH_FAILURES_TOTAL.inc(stage=stage, reason="error")
+            print(f"Batch of {len(batch)} reviews failed: {e}")
+            with self._stats_lock:
+                stats["failed_batches"].append(batch)
+            self._record(stats, failed_reviews=len(batch))
+            return [None] * len(batch)
+
+        verdicts = []
+        missing = []
+        for idx, review in enumerate(batch, start=1):
+            try:
+                response = compliance_results["response"][str(idx)]
+                verdict = {field: response[field] for field in fields}
+                if "confidence" in response:
+                    verdict["confidence"] = response["confidence"]
+                verdicts.append(verdict)
+            except (KeyError, TypeError):
+                verdicts.append(None)
+                missing.append(idx - 1)
+        if len(missing) == len(batch):
+            LLM_BATCH_FAILURES_TOTAL.inc(stage=stage, reason="malformed")
+            return self._bisect(
+                stage, check, fields, batch, stats, ValueError("no usable verdicts")
+            )
+        if missing:
+            self._record(stats, resubmitted=len(missing))
+            retried = self._check_batch(
+                stage, check, fields, [batch[i] for i in missing], stats
+            )
+            for i, verdict in zip(missing, retried):
+                verdicts[i] = verdict
+        return verdicts
+
+    def _bisect(self, stage, check, fields, batch, stats, error) -> list:
+        if len(batch) == 1:
+            print(f"Giving up on review after a malformed response: {error}")
+            with self._stats_lock:
+                stats["failed_batches"].append(batch)
+            self._record(stats, failed_reviews=1)
+            return [None]
+        self._record(stats, bisections=1, resubmitted=len(batch))
+        mid = len(batch) // 2
+        return self._check_batch(stage, check, fields, batch[:mid], stats) + (
+            self._check_batch(stage, check, fields, batch[mid:], stats)
+        )
+
+    def _run_batches(self, tier: ModelTier, run, batches):
+        """
+        Run `run` over every batch with at most the tier's `max_concurrency`
+        calls in flight. Results come back in batch order.
+        """
+        with ThreadPoolExecutor(max_workers=tier.max_concurrency) as executor:
+            return list(executor.map(propagate(run), batches))
+
+    def _compact_guidelines(self) -> str:
+        """`self.guidelines` as one "G<n> ..." line per guideline."""
+        return "\n".join(
+            f"G{number} {text.replace('**', '')}"
+            for number, text in GUIDELINE_LINE_PATTERN.findall(self.guidelines)
+        )
+
+    def _template(self, stage: str) -> str:
+        """The prompt template of a pass in the current encoding."""
+        if self.compact_prompts:
+            if stage == "recheck":
+                return self.compact_template_2
+            template = self.compact_template_1
+            if self.cascade:
+                template += "\n" + CONFIDENCE_INSTRUCTION
+            return template
+        if stage == "recheck":
+            return self.prompt_template_2
+        template = self.prompt_template_1
+        if self.cascade:
+            template = template.replace(
+                "{{reviews_text}}", CONFIDENCE_INSTRUCTION + "\n{{reviews_text}}"
+            )
+        return template
+
+    def _static_prompt(self, stage: str) -> str:
+        """The part of a batch prompt that does not depend on the reviews."""
+        template = self._template(stage)
+        if self.compact_prompts:
+            return template.replace("{{role}}", MODERATOR_ROLE).replace(
+                "{{guidelines}}", self._compact_guidelines()
+            )
+        return MODERATOR_ROLE + template.replace("{{guidelines}}", self.guidelines)
+
+    def _review_text(self, stage: str, index: int, review: dict) -> str:
+        """One review as it appears in a batch prompt."""
+        if not self.compact_prompts:
+            if stage == "check":
+                text = f"""
+            Review: {index}
+            Body: {review['body']}
+            """
+                hints = self._hints(review)
+                if hints:
+                    text += f"Hints: {'; '.join(hints)}\n            "
+                return text
+            return f"""
+            Review: {index}
             Body: {review['body']}
             Result: {review['result']}
             Reason: {review['reason']}
             """
-        self.prompt_2 = self.prompt_template_2.replace(
-            "{{guidelines}}", self.guidelines
-        ).replace("{{reviews_text}}", reviews_text)
-        messages_2 = [
-            SystemMessage(
-                content="You are an expert moderator following Amazon's community guidelines."
+        body = " ".join(review["body"].split())
+        if self.max_review_chars and len(body) > self.max_review_chars:
+            body = body[: self.max_review_chars].rstrip() + " [truncated]"
+        text = f"[{index}] {body}\n"
+        if stage == "check":
+            hints = self._hints(review)
+            if hints:
+                text += f"hint: {'; '.join(hints)}\n"
+        if stage == "recheck":
+            refs = dict.fromkeys(GUIDELINE_REF_PATTERN.findall(review["reason"]))
+            prior = " ".join(f"G{n}" for n in refs) or review["reason"][:120]
+            text += f"prior: {review['result']} {prior}\n"
+        return text
+
+    def _hints(self, review: dict) -> list:
+        """`RuleScreener.hints` for a first-pass review, if rules are on."""
+        if self.rule_screener is None:
+            return []
+        return self.rule_screener.hints(review)
+
+    def _messages(self, stage: str, reviews: list) -> list:
+        reviews_text = "".join(
+            self._review_text(stage, i, review) for i, review in enumerate(reviews, 1)
+        )
+        if self.compact_prompts:
+            return [
+                SystemMessage(content=self._static_prompt(stage)),
+                HumanMessage(content=reviews_text),
+            ]
+        prompt = self._template(stage).replace("{{guidelines}}", self.guidelines).replace(
+            "{{reviews_text}}", reviews_text
+        )
+        return [SystemMessage(content=MODERATOR_ROLE), HumanMessage(content=prompt)]
+
+    @staticmethod
+    def _expand_refs(reason: str) -> str:
+        """Spell out compact "G5" references as "Guideline 5"."""
+        return COMPACT_REF_PATTERN.sub(r"Guideline \1", reason)
+
+    def check_reviews_compliance(self, reviews, stats: Union[dict, None] = None):
+        return self._invoke(self._messages("check", reviews), stats, stage="check")
+
+    def recheck_reviews_compliance(self, reviews, stats: Union[dict, None] = None):
+        return self._invoke(self._messages("recheck", reviews), stats, stage="recheck")
+
+    def _cache_fingerprint(self, stage: str) -> str:
+        model = self.tiers[stage].model
+        if self.compact_prompts:
+            return fingerprint(
+                stage,
+                model,
+                "compact",
+                self._static_prompt(stage),
+                str(self.max_review_chars),
+            )
+        return fingerprint(stage, model, self.guidelines, self._template(stage))
+
+    def _screen(self, stage: str, reviews: list, stats: dict) -> list:
+        """
+        Get a verdict for every review of one pass ("check" or "recheck").
+
+        Near-duplicates are screened once, as their cluster's representative
+        body, and the verdict is fanned out to them with a "duplicate_of"
+        cluster id. Cached verdicts are reused; only the misses are batched
+        to the LLM and their verdicts are written back. Returns a list
+        aligned with `reviews` holding each verdict dict, or None where none
+        was obtained.
+        """
+        if stage == "check":
+            check = self.check_reviews_compliance
+            fields = ("result", "reason")
+        else:
+            check = self.recheck_reviews_compliance
+            fields = ("result", "reason", "percentage_of_relevance")
+
+        subjects, targets, cluster_ids = self._group_near_duplicates(reviews)
+        subject_verdicts = [None] * len(subjects)
+        keys = []
+        if self.cache is not None:
+            stage_fingerprint = self._cache_fingerprint(stage)
+            keys = [self.cache.key(stage_fingerprint, r["body"]) for r in subjects]
+            cached = self.cache.get_many(keys)
+            for i, key in enumerate(keys):
+                subject_verdicts[i] = cached.get(key)
+        pending = [i for i, verdict in enumerate(subject_verdicts) if verdict is None]
+        self._record(
+            stats,
+            cache_hits=len(subjects) - len(pending),
+            cache_misses=len(pending),
+        )
+
+        batches = self._pack_batches(stage, subjects, pending)
+        batch_results = self._run_batches(
+            self.tiers[stage],
+            lambda batch: self._check_batch(
+                stage, check, fields, [subjects[j] for j in batch], stats
             ),
-            HumanMessage(content=self.prompt_2),
-        ]
-        start_time = time.time()
-        with get_openai_callback() as cb:
-            response = self.llm.invoke(messages_2)
-            token_usage = cb.total_tokens
-        end_time = time.time()
-        response_content = response.content
-
-        if "```json" in response_content:
-            response_content = response_content[7:]
-            response_content = response_content[:-3]
-        print(response_content)
-
-        result = {
-            "response": json.loads(response_content),
-            "tokens": token_usage,
-            "time_taken": end_time - start_time,
+            batches,
+        )
+        fresh = {}
+        for batch, batch_verdicts in zip(batches, batch_results):
+            for j, verdict in zip(batch, batch_verdicts):
+                if verdict is None:
+                    continue
+                subject_verdicts[j] = verdict
+                if keys:
+                    fresh[keys[j]] = verdict
+        if fresh:
+            self.cache.put_many(fresh)
+
+        verdicts = [None] * len(reviews)
+        sources = dict.fromkeys(("cache", "llm", "near_duplicate"), 0)
+        fresh_subjects = set(j for batch in batches for j in batch)
+        for j, verdict in enumerate(subject_verdicts):
+            if verdict is None:
+                continue
+            representative = normalize_body(subjects[j]["body"])
+            for i in targets[j]:
+                if normalize_body(reviews[i]["body"]) == representative:
+                    verdicts[i] = verdict
+                    sources["llm" if j in fresh_subjects else "cache"] += 1
+                else:
+                    verdicts[i] = dict(verdict, duplicate_of=cluster_ids[j])
+                    sources["near_duplicate"] += 1
+        if stage == "check":
+            self._record(stats, near_duplicates=sources["near_duplicate"])
+            for source, count in sources.items():
+                if count:
+                    SCREENED_REVIEWS_TOTAL.inc(count, source=source)
+        return verdicts
+
+    def _group_near_duplicates(self, reviews: list) -> tuple[list, list, list]:
+        """
+        The reviews to screen for a pass: one per near-duplicate cluster
+        (carrying the cluster's representative body) and every unclustered
+        review. Returns them with the indices into `reviews` each one stands
+        for and its cluster id (None if unclustered).
+        """
+        if self.near_duplicates is None or not reviews:
+            return reviews, [[i] for i in range(len(reviews))], [None] * len(reviews)
+        subjects, targets, cluster_ids = [], [], []
+        by_cluster = {}
+        assigned = self.near_duplicates.assign_many([r["body"] for r in reviews])
+        for i, (review, cluster) in enumerate(zip(reviews, assigned)):
+            if cluster is None:
+                subjects.append(review)
+                targets.append([i])
+                cluster_ids.append(None)
+                continue
+            cluster_id, representative = cluster
+            if cluster_id in by_cluster:
+                targets[by_cluster[cluster_id]].append(i)
+                continue
+            by_cluster[cluster_id] = len(subjects)
+            subjects.append(dict(review, body=representative))
+            targets.append([i])
+            cluster_ids.append(cluster_id)
+        return subjects, targets, cluster_ids
+
+    @staticmethod
+    def _new_stats() -> dict:
+        return {
+            "total_tokens": 0,
+            "total_time": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "rule_flagged": 0,
+            "llm_calls": 0,
+            "retries": 0,
+            "bisections": 0,
+            "resubmitted": 0,
+            "failed_reviews": 0,
+            "escalated": 0,
+            "near_duplicates": 0,
+            "check_calls": 0,
+            "check_tokens": 0,
+            "check_time": 0,
+            "recheck_calls": 0,
+            "recheck_tokens": 0,
+            "recheck_time": 0,
+            "batch_sizes": [],
+            # (result, model) pairs for the result store
+            "rows": [],
+            # Inputs of `_check`/`_recheck` that got no verdict
+            "unscreened": [],
+            # Batches given up on, as sent
+            "failed_batches": [],
         }
 
-        return result
+    def _rule_results(self, asin: str, reviews: list, stats: dict) -> list:
+        """
+        Apply the rule stage. Returns a list aligned with `reviews` holding a
+        final non-compliant result for clear-cut violations, otherwise None.
+        """
+        if self.rule_screener is None:
+            return [None] * len(reviews)
+        results = []
+        for review in reviews:
+            verdict = self.rule_screener.screen(review)
+            if verdict is not None:
+                verdict = {
+                    "asin": asin,
+                    "title": review["title"],
+                    "rating": review["rating"],
+                    "body": review["body"],
+                    **verdict,
+                }
+            results.append(verdict)
+        flagged = [r for r in results if r is not None]
+        self._keep(stats, flagged, None)
+        rule_flagged = len(flagged)
+        self._record(stats, rule_flagged=rule_flagged)
+        if rule_flagged:
+            SCREENED_REVIEWS_TOTAL.inc(rule_flagged, source="rules")
+        return results
 
-    def process_reviews(self, data: dict):
+    def _check(self, reviews: list, stats: dict) -> list:
+        """First pass; a result per review, or None where none was obtained."""
+        verdicts = self._screen("check", reviews, stats)
+        results = []
+        for review, verdict in zip(reviews, verdicts):
+            if verdict is None:
+                self._unscreened(stats, review)
+                results.append(None)
+                continue
+            result = {
+                "title": review["title"],
+                "rating": review["rating"],
+                "body": review["body"],
+                "result": verdict["result"],
+                "reason": verdict["reason"],
+                "confidence": verdict.get("confidence"),
+                "source": "llm",
+            }
+            if "duplicate_of" in verdict:
+                result["duplicate_of"] = verdict["duplicate_of"]
+                result["source"] = "near_duplicate"
+            results.append(result)
+        return results
+
+    def _needs_recheck(self, result: dict, stats: dict) -> bool:
+        """
+        Flagged reviews go to the recheck pass; in a cascade, so do those the
+        first tier was not confident about.
+        """
+        if result["result"].lower() == "no":
+            return True
+        if not self.cascade:
+            return False
+        try:
+            confident = float(result["confidence"]) >= self.min_confidence
+        except (TypeError, ValueError):
+            confident = False
+        if not confident:
+            self._record(stats, escalated=1)
+        return not confident
+
+    def _recheck(self, asin: str, reviews: list, stats: dict) -> list:
+        """Second pass; the confirmed non-compliant result per review, or None."""
+        verdicts = self._screen("recheck", reviews, stats)
+        results = []
+        for review, verdict in zip(reviews, verdicts):
+            if verdict is None:
+                self._unscreened(stats, review)
+                results.append(None)
+                continue
+            result = {
+                "asin": asin,
+                # "sky": sky,
+                "title": review["title"],
+                "rating": review["rating"],
+                "body": review["body"],
+                "result": verdict["result"],
+                "reason": (
+                    self._expand_refs(verdict["reason"])
+                    if self.compact_prompts
+                    else verdict["reason"]
+                ),
+                "percentage_of_relevance": verdict["percentage_of_relevance"],
+                "source": "llm",
+            }
+            if "duplicate_of" in verdict:
+                result["duplicate_of"] = verdict["duplicate_of"]
+                result["source"] = "near_duplicate"
+            self._keep(stats, [result], "recheck")
+            results.append(result if verdict["result"].lower() == "no" else None)
+        return results
+
+    def process_reviews(self, data: dict, run_stats: Union[dict, None] = None):
     # def process_reviews(self, file_path:str):
     #     with open(file_path, "r") as file:
     #         data = json.load(file)
-        reviews = data["reviews"]
+        # Incremental scrapes have no "reviews" when nothing new was posted
+        reviews = data.get("reviews", [])
         asin = data["asin"]
+        sku = data.get("sku")
         # sky = data["sky"]
-        batch_size = 25
-        results = []
-        total_tokens = 0
-        total_time = 0
+        stats = self._new_stats()
+        wall_start = time.time()
 
-        non_compliant_reviews = []
+        # Clear-cut violations of the mechanical guidelines skip the LLM.
+        # Results are kept with their review's index so they come back in
+        # input order, as from `process_review_stream`.
+        rule_results = self._rule_results(asin, reviews, stats)
+        final = [(i, r) for i, r in enumerate(rule_results) if r is not None]
+        pending = [i for i, r in enumerate(rule_results) if r is None]
 
         # Initial processing of reviews
-        for i in range(0, len(reviews), batch_size):
-            try:
-                batch_reviews = reviews[i : i + batch_size]
-                compliance_results = self.check_reviews_compliance(batch_reviews)
+        results = self._check([reviews[i] for i in pending], stats)
+        non_compliant_reviews = []
+        for i, result in zip(pending, results):
+            if result is None:
+                continue
+            if self._needs_recheck(result, stats):
+                non_compliant_reviews.append((i, result))
+            else:
+                self._keep(stats, [result], "check")
+
+        # Reprocess non-compliant reviews
+        rechecked = self._recheck(asin, [r for _, r in non_compliant_reviews], stats)
+        final += [(i, r) for (i, _), r in zip(non_compliant_reviews, rechecked) if r]
+        final.sort(key=lambda item: item[0])
+        recheck_results = [r for _, r in final]
+
+        # # Save initial results
+        # with open("compliance_results.json", "w") as outfile:
+        #     json.dump(results, outfile, indent=2) 
+
+        return self._finish_run(asin, recheck_results, stats, wall_start, sku, run_stats)
+
+    def _run_stage(
+        self, tier: ModelTier, in_queue: Queue, handle, flush_interval: float
+    ) -> None:
+        """
+        Consume `(seq, item)` pairs from `in_queue` until STREAM_END, calling
+        `handle` on chunks of up to the tier's `batch_size` items as soon as
+        a chunk fills (or after `flush_interval` idle seconds) with at most
+        its `max_concurrency` chunks in flight. Errors are re-raised once the
+        input is drained so upstream stages never block on a full queue.
+        """
+        handle = propagate(handle)
+        in_flight = threading.BoundedSemaphore(tier.max_concurrency)
+        buffer = []
+        futures = []
+        error = None
+        with ThreadPoolExecutor(max_workers=tier.max_concurrency) as executor:
 
-                total_tokens += compliance_results["tokens"]
-                total_time += compliance_results["time_taken"]
+            def submit():
+                in_flight.acquire()
+                future = executor.submit(handle, buffer[:])
+                future.add_done_callback(lambda _: in_flight.release())
+                futures.append(future)
+                buffer.clear()
 
-                for idx, review in enumerate(batch_reviews, start=1):
+            while True:
+                try:
+                    item = in_queue.get(timeout=flush_interval)
+                except Empty:
+                    if buffer and error is None:
+                        submit()
+                    continue
+                if item is STREAM_END:
+                    break
+                if error is not None:
+                    continue
+                buffer.append(item)
+                if len(buffer) >= tier.batch_size:
                     try:
-                        result = {
-                            "title": review["title"],
-                            "rating": review["rating"],
-                            "body": review["body"],
-                            "result": compliance_results["response"][str(idx)][
-                                "result"
-                            ],
-                            "reason": compliance_results["response"][str(idx)][
-                                "reason"
-                            ],
-                        }
-                        results.append(result)
-                        if result["result"].lower() == "no":
-                            non_compliant_reviews.append(result)
+                        submit()
                     except Exception as e:
-                        print(e)
-                        pass
-            except Exception as e:
-                print(e)
-                pass
+                        error = e
+            if buffer and error is None:
+                submit()
+        for future in futures:
+            future.result()
+        if error is not None:
+            raise error
 
-        # Reprocess non-compliant reviews
-        recheck_results = []
-        for i in range(0, len(non_compliant_reviews), batch_size):
+    def process_review_stream(
+        self,
+        reviews,
+        asin: str,
+        queue_size: Union[int, None] = None,
+        flush_interval: float = 5.0,
+        sku: Union[str, None] = None,
+        unscreened: Union[list, None] = None,
+        run_stats: Union[dict, None] = None,
+    ) -> list:
+        """
+        Screen reviews while they are still being scraped.
+
+        Reviews from the `reviews` iterable (e.g. `AmazonScraper.iter_reviews`)
+        flow through bounded queues: the first pass fires each batch as soon
+        as it fills and hands flagged reviews straight to the recheck pass,
+        so scraping, checking and rechecking overlap.
+
+        Args:
+            reviews (iterable): Review dicts with "title", "rating" and "body".
+            asin (str): The ASIN the reviews belong to.
+            queue_size (int, optional): Capacity of each inter-stage queue;
+                defaults to twice the first tier's `batch_size`.
+            flush_interval (float): Seconds to wait for more reviews before
+                firing a partial batch.
+            sku (str, optional): Recorded with the results in the store.
+            unscreened (list, optional): Filled with the input reviews that
+                got no verdict from either pass, so the caller can leave
+                them to be screened again.
+            run_stats (dict, optional): Filled with this run's stats (tokens,
+                calls, "failed_reviews", "failed_batches", ...), which
+                `last_run_stats` may not hold if other runs share the Screener.
+
+        Returns:
+            list: The non-compliant reviews, in the order they were scraped,
+            as returned by `process_reviews`.
+        """
+        stats = self._new_stats()
+        wall_start = time.time()
+        queue_size = queue_size or 2 * self.tiers["check"].batch_size
+        check_queue = Queue(maxsize=queue_size)
+        recheck_queue = Queue(maxsize=queue_size)
+        final = []
+        final_lock = threading.Lock()
+        errors = []
+        # Recheck inputs are first-pass results; map them back to their review
+        origins = {}
+
+        def produce():
             try:
-                batch_reviews = non_compliant_reviews[i : i + batch_size]
-                recheck_compliance_results = self.recheck_reviews_compliance(
-                    batch_reviews
+                for item in enumerate(reviews):
+                    check_queue.put(item)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                check_queue.put(STREAM_END)
+
+        def first_pass(items):
+            seqs = [seq for seq, _ in items]
+            batch = [review for _, review in items]
+            rule_results = self._rule_results(asin, batch, stats)
+            with final_lock:
+                final.extend(
+                    (seq, r) for seq, r in zip(seqs, rule_results) if r is not None
                 )
+            pending = [
+                (seq, review)
+                for seq, review, r in zip(seqs, batch, rule_results)
+                if r is None
+            ]
+            results = self._check([review for _, review in pending], stats)
+            for (seq, review), result in zip(pending, results):
+                if result is None:
+                    continue
+                if self._needs_recheck(result, stats):
+                    with final_lock:
+                        origins[id(result)] = (result, review)
+                    recheck_queue.put((seq, result))
+                else:
+                    self._keep(stats, [result], "check")
 
-                total_tokens += recheck_compliance_results["tokens"]
-                total_time += recheck_compliance_results["time_taken"]
+        def second_pass(items):
+            results = self._recheck(asin, [review for _, review in items], stats)
+            with final_lock:
+                final.extend(
+                    (seq, r) for (seq, _), r in zip(items, results) if r is not None
+                )
 
-                for idx, review in enumerate(batch_reviews, start=1):
-                    try:
-                        result = {
-                            "asin": asin,
-                            # "sky": sky,
-                            "title": review["title"],
-                            "rating": review["rating"],
-                            "body": review["body"],
-                            "result": recheck_compliance_results["response"][str(idx)][
-                                "result"
-                            ],
-                            "reason": recheck_compliance_results["response"][str(idx)][
-                                "reason"
-                            ],
-                            "percentage_of_relevance": recheck_compliance_results[
-                                "response"
-                            ][str(idx)]["percentage_of_relevance"],
-                        }
-                        if result["result"].lower() == "no":
-                            recheck_results.append(result)
-                    except Exception as e:
-                        print(e)
-                        pass
+        def check_stage():
+            try:
+                self._run_stage(
+                    self.tiers["check"], check_queue, first_pass, flush_interval
+                )
             except Exception as e:
-                print(e)
-                pass
+                errors.append(e)
+            finally:
+                recheck_queue.put(STREAM_END)
 
-        # # Save initial results
-        # with open("compliance_results.json", "w") as outfile:
-        #     json.dump(results, outfile, indent=2) 
+        threads = [
+            threading.Thread(
+                target=propagate(produce), name=f"{asin}-scrape", daemon=True
+            ),
+            threading.Thread(
+                target=propagate(check_stage), name=f"{asin}-check", daemon=True
+            ),
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            self._run_stage(
+                self.tiers["recheck"], recheck_queue, second_pass, flush_interval
+            )
+        finally:
+            for thread in threads:
+                thread.join()
+        if errors:
+            raise errors[0]
 
+        if unscreened is not None:
+            unscreened.extend(
+                origins[id(item)][1] if id(item) in origins else item
+                for item in stats["unscreened"]
+            )
+        final.sort(key=lambda item: item[0])
+        recheck_results = [result for _, result in final]
+        return self._finish_run(asin, recheck_results, stats, wall_start, sku, run_stats)
+
+    def _finish_run(
+        self,
+        asin: str,
+        recheck_results: list,
+        stats: dict,
+        wall_start: float,
+        sku: Union[str, None] = None,
+        run_stats: Union[dict, None] = None,
+    ) -> list:
+        rows = stats.pop("rows")
+        stats.pop("unscreened")
+        if rows:
+            self.result_store.append(
+                asin,
+                [result for result, _ in rows],
+                sku=sku,
+                model=[model for _, model in rows],
+            )
         # Save recheck results
-        with open(f"./nc_reviews/{asin}_noncompliant_reviews.json", "w") as outfile:
-            json.dump(recheck_results, outfile, indent=2)
+        if self.results_dir is not None:
+            path = os.path.join(self.results_dir, f"{asin}_noncompliant_reviews.json")
+            with open(path, "w") as outfile:
+                json.dump(recheck_results, outfile, indent=2)
 
-        print(f"Total tokens used: {total_tokens}")
-        print(f"Total time taken: {total_time} seconds")
+        print(f"Total tokens used: {stats['total_tokens']}")
+        print(f"Total time taken: {stats['total_time']} seconds")
+        print(f"Rule-based violations (LLM skipped): {stats['rule_flagged']}")
+        print(
+            f"Verdict cache: {stats['cache_hits']} hits,"
+            f" {stats['cache_misses']} misses"
+        )
+        if self.near_duplicates is not None:
+            print(f"Near-duplicate verdicts reused: {stats['near_duplicates']}")
+        print(f"Wall time: {time.time() - wall_start} seconds")
+        batch_sizes = stats["batch_sizes"]
+        if batch_sizes:
+            print(
+                f"LLM calls: {stats['llm_calls']}, batch sizes"
+                f" min/avg/max {min(batch_sizes)}/"
+                f"{sum(batch_sizes) / len(batch_sizes):.1f}/{max(batch_sizes)}"
+            )
+        for stage in ("check", "recheck"):
+            calls = stats[f"{stage}_calls"]
+            if calls:
+                print(
+                    f"{stage.capitalize()} tier ({self.tiers[stage].model}): {calls}"
+                    f" calls, {stats[f'{stage}_tokens']} tokens,"
+                    f" {stats[f'{stage}_time'] / calls:.2f}s per call"
+                )
+        if self.cascade:
+            print(f"Low-confidence reviews escalated: {stats['escalated']}")
+        print(
+            f"Retries: {stats['retries']}, bisections: {stats['bisections']},"
+            f" resubmitted reviews: {stats['resubmitted']},"
+            f" failed reviews: {stats['failed_reviews']}"
+        )
+        self.last_run_stats = stats
+        if run_stats is not None:
+            run_stats.update(stats)
         return recheck_results
 
 
 if __name__ == "__main__":
-    screener = Screener()
-    for file in os.listdir("./reviews_file_generator/output"):
-        screener.process_reviews(
-            f"D:/BCP/Reviews Screener - Copy/reviews_pipeline/reviews_file_generator/output/{file}"
-        )
+    # Screen a backlog of scraped JSON files; see bulk_screen.py for options
+    from bulk_screen import main
+
+    main()
@@ -0,0 +1,185 @@
+# session_cache.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Union
+from urllib.parse import urlsplit
+
+
+def session_domain(url: str) -> str:
+    """The site a URL belongs to, as cookie jars are keyed: "www.amazon.com" -> "amazon.com"."""
+    host = (urlsplit(url).hostname or url).lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class SessionCache:
+    """
+    Captcha-cleared and signed-in cookie jars per site, shared by every
+    scraper (and, through the SQLite file, every process) so a captcha or
+    sign-in is solved once per session lifetime instead of once per browser.
+
+    Each stored jar gets a new `generation`; browsers remember the generation
+    they were given, so a jar re-solved by one browser reaches the others on
+    their next page. A jar expires after `max_age` seconds, when its cookies
+    have expired, or when `invalidate` reports that it no longer clears the
+    wall.
+    """
+
+    def __init__(self, path: str = "session_cache.sqlite3", max_age: float = 6 * 3600) -> None:
+        self.path = path
+        self.max_age = max_age
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "stored": 0,
+            "invalidated": 0,
+            "solves": 0,
+            "solve_failures": 0,
+            "solve_seconds": 0.0,
+        }
+        self._lock = threading.Lock()
+        self._solve_locks = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                domain TEXT PRIMARY KEY,
+                cookies TEXT NOT NULL,
+                signed_in INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                generation INTEGER NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def _row(self, domain: str) -> Union[tuple, None]:
+        return self._conn.execute(
+            "SELECT cookies, signed_in, stored_at, generation FROM sessions WHERE domain = ?",
+            (domain,),
+        ).fetchone()
+
+    def get(self, domain: str) -> Union[dict, None]:
+        """
+        The domain's live jar as `{"cookies", "signed_in", "stored_at",
+        "generation"}`, or None when there is none or it has expired.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._row(domain)
+            if row is not None:
+                cookies, signed_in, stored_at, generation = row
+                # Selenium's "expiry" is in epoch seconds; session cookies have none
+                cookies = [c for c in json.loads(cookies) if c.get("expiry", now + 1) > now]
+                if now - stored_at <= self.max_age and cookies:
+                    self.stats["hits"] += 1
+                    return {
+                        "cookies": cookies,
+                        "signed_in": bool(signed_in),
+                        "stored_at": stored_at,
+                        "generation": generation,
+                    }
+                self._conn.execute("DELETE FROM sessions WHERE domain = ?", (domain,))
+                self._conn.commit()
+            self.stats["misses"] += 1
+            return None
+
+    def generation(self, domain: str) -> int:
+        """The generation of the domain's stored jar, 0 if there is none."""
+        with self._lock:
+            row = self._row(domain)
+        return row[3] if row else 0
+
+    def store(self, domain: str, cookies: list, signed_in: bool = False) -> int:
+        """
+        Keep a jar that just cleared a captcha or signed in.
+
+        Args:
+            domain (str): See `session_domain`.
+            cookies (list): Cookie dicts as Selenium's `get_cookies` returns them.
+            signed_in (bool): Whether the jar carries a signed-in session. A
+                jar replacing a live signed-in one stays marked signed in,
+                as it comes from a browser that was handed that session.
+
+        Returns:
+            int: The jar's generation.
+        """
+        with self._lock:
+            row = self._row(domain)
+            generation = (row[3] if row else 0) + 1
+            signed_in = signed_in or bool(row and row[1] and time.time() - row[2] <= self.max_age)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions"
+                " (domain, cookies, signed_in, stored_at, generation) VALUES (?, ?, ?, ?, ?)",
+                (domain, json.dumps(cookies), int(signed_in), time.time(), generation),
+            )
+            self._conn.commit()
+            self.stats["stored"] += 1
+        return generation
+
+    def invalidate(self, domain: str, generation: Union[int, None] = None) -> None:
+        """
+        Drop the domain's jar because it was met with a wall again. With
+        `generation`, only that jar is dropped, so a newer one stored
+        meanwhile by another scraper survives.
+        """
+        with self._lock:
+            if generation is None:
+                cursor = self._conn.execute("DELETE FROM sessions WHERE domain = ?", (domain,))
+            else:
+                cursor = self._conn.execute(
+                    "DELETE FROM sessions WHERE domain = ? AND generation = ?",
+                    (domain, generation),
+                )
+            self._conn.commit()
+            self.stats["invalidated"] += cursor.rowcount
+
+    @contextmanager
+    def solving(self, domain: str):
+        """Serialize captcha and sign-in solving per domain within this process."""
+        with self._lock:
+            lock = self._solve_locks.setdefault(domain, threading.Lock())
+        with lock:
+            yield
+
+    def record_solve(self, solved: bool, seconds: float) -> None:
+        with self._lock:
+            self.stats["solves" if solved else "solve_failures"] += 1
+            self.stats["solve_seconds"] += seconds
+
+    def solve_stats(self) -> dict:
+        """Captcha solve rate and mean latency since this cache was opened."""
+        with self._lock:
+            attempts = self.stats["solves"] + self.stats["solve_failures"]
+            return {
+                "attempts": attempts,
+                "solve_rate": self.stats["solves"] / attempts if attempts else None,
+                "mean_seconds": self.stats["solve_seconds"] / attempts if attempts else None,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def default_session_cache() -> SessionCache:
+    """
+    Process-wide cache at SESSION_CACHE_PATH (default session_cache.sqlite3),
+    with jars kept for SESSION_MAX_AGE seconds (default 6 hours).
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = SessionCache(
+                os.getenv("SESSION_CACHE_PATH", "session_cache.sqlite3"),
+                max_age=float(os.getenv("SESSION_MAX_AGE", str(6 * 3600))),
+            )
+        return _default_cache
@@ -1,41 +1,192 @@
 # star_scraper.py
+import math
 import os
 import re
+import threading
+import time
 import warnings
 from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from functools import lru_cache
+from queue import Empty, Queue
 from typing import Union
 
 from json import dump
+import requests
 from amazoncaptcha import AmazonCaptcha
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 from selenium import webdriver
-from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import NoSuchElementException, WebDriverException
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.webdriver import WebDriver
 from selenium.webdriver.common.by import By
 from webdriver_manager.chrome import ChromeDriverManager
 
+from metrics import (
+    CAPTCHA_ENCOUNTERS_TOTAL,
+    CAPTCHA_SOLVE_SECONDS,
+    CAPTCHA_SOLVES_TOTAL,
+    PAGE_FETCH_SECONDS,
+    PAGE_PARSE_SECONDS,
+    PAGES_TOTAL,
+    PARSE_ERRORS_TOTAL,
+    SESSION_RESTORES_TOTAL,
+    propagate,
+)
+from review_parser import parse_header, parse_reviews
+from scrape_state import ScrapeStateStore, default_state_store
+from session_cache import SessionCache, default_session_cache, session_domain
+
 warnings.filterwarnings("ignore")
 
-RATING_PERCENTAGE_PATTERN = re.compile(r"(\d+)\s+stars represent (\d+)% of rating")
+REVIEWS_PER_PAGE = 10
+STAR_VALUES = {"one_star": 1, "two_star": 2, "three_star": 3}
+# Markers of pages that need the real browser: captcha and sign-in walls
+BLOCKED_PAGE_MARKERS = (
+    "captchacharacters",
+    "/errors/validateCaptcha",
+    "Type the characters you see in this image",
+    'id="ap_email"',
+    'name="signIn"',
+)
+
+BROWSER_PROFILES = ("default", "scrape")
+# Requests the scrape profile never makes (Chrome DevTools URL patterns):
+# images, media and fonts, and Amazon's ad, metrics and beacon endpoints
+SCRAPE_BLOCKED_URLS = (
+    "*.jpg*",
+    "*.jpeg*",
+    "*.png*",
+    "*.gif*",
+    "*.webp*",
+    "*.svg*",
+    "*.ico*",
+    "*.mp4*",
+    "*.webm*",
+    "*.m3u8*",
+    "*.woff*",
+    "*.ttf*",
+    "*.otf*",
+    "*amazon-adsystem.com*",
+    "*fls-na.amazon.com*",
+    "*unagi.amazon.com*",
+    "*unagi-na.amazon.com*",
+    "*/uedata*",
+    "*/rd/uedata*",
+    "*doubleclick.net*",
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*facebook.net*",
+)
+SCRAPE_CHROME_ARGUMENTS = (
+    "--headless=new",
+    "--window-size=1366,900",
+    "--blink-settings=imagesEnabled=false",
+    "--disable-extensions",
+    "--disable-gpu",
+    "--disable-dev-shm-usage",
+    "--disable-background-networking",
+    "--disable-background-timer-throttling",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-notifications",
+    "--disable-features=Translate,MediaRouter,OptimizationHints,AutofillServerCommunication",
+    "--no-first-run",
+    "--mute-audio",
+)
+
+
+@lru_cache(maxsize=None)
+def chrome_driver_path() -> str:
+    """Resolve (and download if needed) the ChromeDriver binary once per process."""
+    return ChromeDriverManager().install()
+
+
+def set_browser_cookies(driver: WebDriver, cookies: list) -> None:
+    """
+    Add Selenium-style cookie dicts to a Chrome instance without first
+    navigating to their domain, as `add_cookie` would require.
+    """
+    driver.execute_cdp_cmd(
+        "Network.setCookies",
+        {
+            "cookies": [
+                {
+                    "name": c["name"],
+                    "value": c["value"],
+                    "domain": c.get("domain"),
+                    "path": c.get("path", "/"),
+                    "secure": c.get("secure", False),
+                    "httpOnly": c.get("httpOnly", False),
+                    **({"expires": c["expiry"]} if "expiry" in c else {}),
+                    **({"sameSite": c["sameSite"]} if c.get("sameSite") else {}),
+                }
+                for c in cookies
+            ]
+        },
+    )
 
 
 class Browser:
+    """
+    A Chrome instance driven by Selenium.
 
-    def __init__(self, page_load_timeout: int, headless: bool) -> None:
-        self._browser = self.set_browser(page_load_timeout, headless)
+    The "default" profile is a full, maximized Chrome (headless if asked).
+    The "scrape" profile is always headless, returns pages once the DOM is
+    parsed (eager page loads) and never fetches images, media, fonts or
+    tracking endpoints; `page_source` is all the scraper reads.
+    """
+
+    def __init__(
+        self, page_load_timeout: int, headless: bool, profile: str = "default"
+    ) -> None:
+        if profile not in BROWSER_PROFILES:
+            raise ValueError(
+                f"unknown browser profile {profile!r}, expected one of {BROWSER_PROFILES}"
+            )
+        self.profile = profile
+        self._browser = self.set_browser(page_load_timeout, headless, profile)
+        self.page_load_timeout = page_load_timeout
+        self.pages_loaded = 0
+        # Per domain, the generation of the cached cookie jar this browser carries
+        self.session_generations = {}
+        self._http_session = None
 
     @staticmethod
-    def set_browser(page_load_timeout: int, headless: bool) -> WebDriver:
+    def set_browser(
+        page_load_timeout: int, headless: bool, profile: str = "default"
+    ) -> WebDriver:
         options = Options()
-        options.headless = headless
         options.add_experimental_option("detach", True)
         options.add_argument("--incognito")
+        if profile == "scrape":
+            for argument in SCRAPE_CHROME_ARGUMENTS:
+                options.add_argument(argument)
+            # Hand back the page at DOMContentLoaded, not after every subresource
+            options.page_load_strategy = "eager"
+            options.add_experimental_option(
+                "prefs",
+                {
+                    "profile.managed_default_content_settings.images": 2,
+                    "profile.default_content_setting_values.notifications": 2,
+                },
+            )
+        elif headless:
+            # `Options.headless` is deprecated and ignored by current Selenium
+            options.add_argument("--headless=new")
         browser = webdriver.Chrome(
-            service=Service(ChromeDriverManager().install()), options=options
+            service=Service(chrome_driver_path()), options=options
         )
-        browser.maximize_window()
+        if profile == "scrape":
+            browser.execute_cdp_cmd("Network.enable", {})
+            browser.execute_cdp_cmd(
+                "Network.setBlockedURLs", {"urls": list(SCRAPE_BLOCKED_URLS)}
+            )
+        else:
+            browser.maximize_window()
         browser.set_page_load_timeout(page_load_timeout)
         return browser
 
@@ -69,11 +220,282 @@ class Browser:
                         f"Wrong tab id given,\nMaximum allow 'tab_id' is {len(tabs)}"
                     )
 
+    def http_session(self) -> requests.Session:
+        """
+        Keep-alive HTTP session that lives as long as this browser and
+        presents the same user agent and cookies.
+        """
+        if self._http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update(
+                {
+                    "User-Agent": self._browser.execute_script(
+                        "return navigator.userAgent;"
+                    ),
+                    "Accept-Language": "en-US,en;q=0.9",
+                    "Accept": "text/html,application/xhtml+xml",
+                }
+            )
+            self._http_session = session
+        return self._http_session
+
+    def sync_cookies(self) -> None:
+        """Copy the browser's cookies (sign-in, captcha clearance) into the HTTP session."""
+        session = self.http_session()
+        for cookie in self._browser.get_cookies():
+            session.cookies.set(
+                cookie["name"],
+                cookie["value"],
+                domain=cookie.get("domain"),
+                path=cookie.get("path", "/"),
+            )
+
+    def load_cookies(self, cookies: list) -> None:
+        """Give the browser and its HTTP session cookies cleared elsewhere."""
+        set_browser_cookies(self._browser, cookies)
+        session = self.http_session()
+        for cookie in cookies:
+            session.cookies.set(
+                cookie["name"],
+                cookie["value"],
+                domain=cookie.get("domain"),
+                path=cookie.get("path", "/"),
+            )
+
+    def is_alive(self) -> bool:
+        try:
+            self._browser.execute_script("return 1;")
+            return True
+        except WebDriverException:
+            return False
+
+    def quit(self) -> None:
+        if self._http_session is not None:
+            self._http_session.close()
+        try:
+            self._browser.quit()
+        except WebDriverException:
+            pass
+
     def __del__(self) -> None:
-        tabs = self.all_tabs()
-        for tab in tabs:
-            self.switch_tab(tab)
-            self._browser.close()
+        try:
+            tabs = self.all_tabs()
+            for tab in tabs:
+                self.switch_tab(tab)
+                self._browser.close()
+        except WebDriverException:
+            # Already quit by a BrowserPool or the driver has crashed
+            pass
+
+
+class BrowserPool:
+    """
+    Bounded pool of long-lived `Browser` instances shared across ASINs.
+
+    Browsers are started lazily up to `size`, health-checked on checkout and
+    replaced after `max_pages` page loads or when the driver has crashed.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        page_load_timeout: int = 10,
+        headless: bool = False,
+        max_pages: int = 200,
+        profile: str = "default",
+    ) -> None:
+        self.size = size
+        self.page_load_timeout = page_load_timeout
+        self.headless = headless
+        self.profile = profile
+        self.max_pages = max_pages
+        self._idle = Queue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    def _new_browser(self) -> Browser:
+        return Browser(
+            page_load_timeout=self.page_load_timeout,
+            headless=self.headless,
+            profile=self.profile,
+        )
+
+    def _retire(self, browser: Browser) -> None:
+        browser.quit()
+
+    @contextmanager
+    def checkout(self):
+        """
+        Borrow a healthy browser for the duration of a `with` block, waiting
+        for one to be returned when all `size` browsers are busy.
+        """
+        if self._closed:
+            raise RuntimeError("BrowserPool is closed")
+        self._slots.acquire()
+        browser = None
+        try:
+            while browser is None:
+                try:
+                    browser = self._idle.get_nowait()
+                except Empty:
+                    browser = self._new_browser()
+                    break
+                if not browser.is_alive():
+                    self._retire(browser)
+                    browser = None
+            try:
+                yield browser
+            except WebDriverException:
+                if not browser.is_alive():
+                    self._retire(browser)
+                    browser = None
+                raise
+        finally:
+            if browser is not None:
+                if self._closed or browser.pages_loaded >= self.max_pages:
+                    self._retire(browser)
+                else:
+                    self._idle.put(browser)
+            self._slots.release()
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                self._retire(self._idle.get_nowait())
+            except Empty:
+                break
+
+
+class PageFetcher:
+    """
+    Fetch pages over the browser's keep-alive HTTP session and only fall back
+    to a full Selenium navigation when a captcha or sign-in wall comes back.
+
+    With a `SessionCache`, the browser is handed the latest cleared cookie
+    jar before its first page on a site, a jar that runs into a wall again
+    is invalidated, and captchas solved here are shared with other browsers.
+    """
+
+    def __init__(
+        self,
+        browser: Browser,
+        http_first: bool = True,
+        session_cache: Union[SessionCache, None] = None,
+    ) -> None:
+        self.browser = browser
+        self.http_first = http_first
+        self.session_cache = session_cache
+        self.stats = {"http": 0, "browser": 0, "blocked": 0}
+        self._lock = threading.Lock()
+        self._browser_lock = threading.Lock()
+        self._cookies_synced = False
+
+    @staticmethod
+    def is_blocked(page_source: str) -> bool:
+        return any(marker in page_source for marker in BLOCKED_PAGE_MARKERS)
+
+    def _count(self, path: str) -> None:
+        with self._lock:
+            self.stats[path] += 1
+
+    def _restore_session(self, url: str) -> None:
+        """Load the cached jar for `url`'s site if it is newer than the browser's."""
+        domain = session_domain(url)
+        if self.session_cache.generation(domain) <= self.browser.session_generations.get(domain, 0):
+            return
+        entry = self.session_cache.get(domain)
+        if entry is None:
+            return
+        with self._browser_lock:
+            self.browser.load_cookies(entry["cookies"])
+            self.browser.session_generations[domain] = entry["generation"]
+        SESSION_RESTORES_TOTAL.inc()
+
+    def _fetch_http(self, url: str) -> Union[str, None]:
+        with self._browser_lock:
+            if not self._cookies_synced:
+                self.browser.sync_cookies()
+                self._cookies_synced = True
+        try:
+            with PAGE_FETCH_SECONDS.time(path="http"):
+                response = self.browser.http_session().get(
+                    url, timeout=self.browser.page_load_timeout
+                )
+        except requests.RequestException as e:
+            print(f"HTTP fetch failed for {url}: {e}")
+            return None
+        if (
+            response.status_code != 200
+            or "/ap/signin" in response.url
+            or self.is_blocked(response.text)
+        ):
+            self._count("blocked")
+            CAPTCHA_ENCOUNTERS_TOTAL.inc(where="http")
+            if self.session_cache is not None:
+                # The jar this browser carries no longer clears the wall
+                domain = session_domain(url)
+                generation = self.browser.session_generations.pop(domain, None)
+                if generation is not None:
+                    self.session_cache.invalidate(domain, generation)
+            return None
+        self._count("http")
+        return response.text
+
+    def fetch(self, url: str) -> str:
+        """
+        Return the page source for `url`.
+
+        Args:
+            url (str): The page to load.
+
+        Returns:
+            str: The HTML, from the HTTP session when possible, otherwise
+            from the browser after solving any captcha.
+        """
+        if self.session_cache is not None:
+            self._restore_session(url)
+        if self.http_first:
+            page_source = self._fetch_http(url)
+            if page_source is not None:
+                return page_source
+        # One WebDriver can only drive one navigation at a time
+        with self._browser_lock, PAGE_FETCH_SECONDS.time(path="browser"):
+            current_browser = self.browser.current_browser()
+            generation = AmazonScraper.bypass_captcha(
+                current_browser, url, self.session_cache
+            )
+            if generation:
+                self.browser.session_generations[session_domain(url)] = generation
+            self.browser.pages_loaded += 1
+            self._count("browser")
+            if self.http_first:
+                # Pick up whatever the browser just cleared for the next requests
+                self.browser.sync_cookies()
+            return current_browser.page_source
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def default_browser_pool() -> BrowserPool:
+    """
+    Process-wide pool sized by the BROWSER_POOL_SIZE environment variable,
+    with browsers in the BROWSER_PROFILE profile ("scrape" by default).
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = BrowserPool(
+                size=int(os.getenv("BROWSER_POOL_SIZE", "2")),
+                max_pages=int(os.getenv("BROWSER_MAX_PAGES", "200")),
+                profile=os.getenv("BROWSER_PROFILE", "scrape"),
+            )
+        return _default_pool
 
 
 class AmazonScraper:
@@ -82,36 +504,134 @@ class AmazonScraper:
     #     self, asin: str, sky_number:str, page_load_timeout: int = 10, headless: bool = False
     # ) -> None:
     def __init__(
-        self, asin: str, page_load_timeout: int = 10, headless: bool = False
+        self,
+        asin: str,
+        page_load_timeout: int = 10,
+        headless: bool = False,
+        browser: Union[Browser, None] = None,
+        profile: str = "default",
+        http_first: bool = True,
+        fetch_concurrency: int = 4,
+        max_planned_pages: int = 10,
+        state_store: Union[ScrapeStateStore, None] = None,
+        full_refresh: bool = False,
+        session_cache: Union[SessionCache, None] = None,
     ) -> None:
-        self.amazon_browser = Browser(
-            page_load_timeout=page_load_timeout, headless=headless
+        # A browser handed in (e.g. from a BrowserPool) is borrowed, not owned
+        self._owns_browser = browser is None
+        self.amazon_browser = browser or Browser(
+            page_load_timeout=page_load_timeout, headless=headless, profile=profile
+        )
+        self.fetcher = PageFetcher(
+            self.amazon_browser, http_first=http_first, session_cache=session_cache
         )
+        self.fetch_concurrency = max(1, fetch_concurrency)
+        self.max_planned_pages = max_planned_pages
+        self.pages_per_star = {}
         self.asin = asin
         # self.sky_number = sky_number
         self.sign_in_url = "https://www.amazon.in/-/hi/ap/signin?openid.pape.max_auth_age=3600&openid.return_to=https%3A%2F%2Fwww.amazon.in%2Fspr%2Freturns%2Fgift&openid.identity=http%3A%2F%2Fspecs.openid.net%2Fauth%2F2.0%2Fidentifier_select&openid.assoc_handle=amzn_psr_desktop_in&openid.mode=checkid_setup&language=en_IN&openid.claimed_id=http%3A%2F%2Fspecs.openid.net%2Fauth%2F2.0%2Fidentifier_select&openid.ns=http%3A%2F%2Fspecs.openid.net%2Fauth%2F2.0"
         self.product_url = f"https://www.amazon.com/gp/product/{self.asin}"
         self.review_url = f"https://www.amazon.com/product-reviews/{self.asin}/?pageNumber=page_no&filterByStar=no_of_star_ratings"
+        # Incremental mode: newest reviews first, stop at the first known one
+        self.state_store = state_store
+        self.known_review_ids = set()
+        if state_store is not None and not full_refresh:
+            self.known_review_ids = state_store.known_review_ids(asin)
+        self.incremental = bool(self.known_review_ids)
+        if self.incremental:
+            self.review_url += "&sortBy=recent"
 
     @staticmethod
-    def bypass_captcha(browser, url: str) -> None:
-        browser.get(url)
+    def captcha_link(browser) -> Union[str, None]:
         try:
-            link = browser.find_element(
+            return browser.find_element(
                 By.XPATH, "//div[@class = 'a-row a-text-center']//img"
             ).get_attribute("src")
         except:
-            pass
-        else:
-            captcha = AmazonCaptcha.fromlink(link)
-            captcha_value = AmazonCaptcha.solve(captcha)
-            browser.find_element(By.ID, "captchacharacters").send_keys(captcha_value)
-            button = browser.find_element(By.CLASS_NAME, "a-button-text")
-            button.click()
+            return None
+
+    @staticmethod
+    def solve_captcha(
+        browser, link: str, session_cache: Union[SessionCache, None] = None
+    ) -> bool:
+        """Solve and submit the captcha on the current page; True if it went away."""
+        start = time.perf_counter()
+        with CAPTCHA_SOLVE_SECONDS.time():
+            try:
+                captcha = AmazonCaptcha.fromlink(link)
+                captcha_value = AmazonCaptcha.solve(captcha)
+                browser.find_element(By.ID, "captchacharacters").send_keys(
+                    captcha_value
+                )
+                button = browser.find_element(By.CLASS_NAME, "a-button-text")
+                button.click()
+                solved = "captchacharacters" not in browser.page_source
+            except WebDriverException:
+                raise
+            except Exception as e:
+                print(f"Captcha solve failed: {e!r}")
+                solved = False
+        CAPTCHA_SOLVES_TOTAL.inc(outcome="solved" if solved else "failed")
+        if session_cache is not None:
+            session_cache.record_solve(solved, time.perf_counter() - start)
+        return solved
+
+    @staticmethod
+    def bypass_captcha(
+        browser, url: str, session_cache: Union[SessionCache, None] = None
+    ) -> Union[int, None]:
+        """
+        Load `url`, solving a captcha if one comes up.
+
+        With a `session_cache`, only one browser per site solves at a time:
+        a browser that waited takes the jar the other one stored instead of
+        solving again, and a solved jar is stored for every other browser.
+
+        Returns:
+            int or None: The generation of the cached jar the browser now
+            carries, if it took or stored one.
+        """
+        browser.get(url)
+        link = AmazonScraper.captcha_link(browser)
+        if link is None:
+            return None
+        CAPTCHA_ENCOUNTERS_TOTAL.inc(where="browser")
+        if session_cache is None:
+            AmazonScraper.solve_captcha(browser, link)
+            return None
+        domain = session_domain(url)
+        seen = session_cache.generation(domain)
+        with session_cache.solving(domain):
+            entry = session_cache.get(domain)
+            if entry is not None and entry["generation"] != seen:
+                # Solved by another browser while this one waited
+                set_browser_cookies(browser, entry["cookies"])
+                SESSION_RESTORES_TOTAL.inc()
+                browser.get(url)
+                link = AmazonScraper.captcha_link(browser)
+                if link is None:
+                    return entry["generation"]
+            if AmazonScraper.solve_captcha(browser, link, session_cache):
+                return session_cache.store(domain, browser.get_cookies())
+        return None
 
     def sign_in(self) -> None:
+        """
+        Sign in with the EMAIL and PWD environment variables, or reuse a
+        signed-in jar from the session cache.
+        """
         current_browser = self.amazon_browser.current_browser()
-        self.bypass_captcha(current_browser, self.sign_in_url)
+        cache = self.fetcher.session_cache
+        domain = session_domain(self.sign_in_url)
+        if cache is not None:
+            entry = cache.get(domain)
+            if entry is not None and entry["signed_in"]:
+                self.amazon_browser.load_cookies(entry["cookies"])
+                self.amazon_browser.session_generations[domain] = entry["generation"]
+                SESSION_RESTORES_TOTAL.inc()
+                return
+        self.bypass_captcha(current_browser, self.sign_in_url, cache)
         email = os.getenv("EMAIL")
         pwd = os.getenv("PWD")
         try:
@@ -120,83 +640,154 @@ class AmazonScraper:
             button = current_browser.find_element(By.ID, "signInSubmit")
             button.click()
         except:
-            pass
+            return
+        if cache is not None and "/ap/signin" not in current_browser.current_url:
+            self.amazon_browser.session_generations[domain] = cache.store(
+                domain, current_browser.get_cookies(), signed_in=True
+            )
 
     def scrap_reviews(self):
         reviews_data = {}
+        reviews = list(self.iter_reviews(reviews_data))
+        if reviews:
+            reviews_data["reviews"] = reviews
+        return reviews_data
+
+    def iter_reviews(self, reviews_data: Union[dict, None] = None):
+        """
+        Yield new reviews page by page as they are scraped, so screening can
+        start before the last page is fetched.
+
+        Nothing is saved to the state store here: reviews only count as
+        seen once they are screened, see `record_screened`.
+
+        Args:
+            reviews_data (dict, optional): Filled with the product header
+                ("product title", "total ratings", ...) from the first page,
+                and once scraping ends with "new review ids", the IDs of the
+                reviews yielded.
+
+        Yields:
+            dict: One review ("id", "title", "rating", "body").
+        """
+        reviews_data = {} if reviews_data is None else reviews_data
+        seen_ids = set()
+        page_reviews = []
+        reached_known = False
 
         def get_reviews_data(page_source):
-            soup = BeautifulSoup(page_source, "html.parser")
-            reviews = soup.findAll("div", {"data-hook": "review"})
-            if reviews:
-                for item in reviews:
-                    if "product title" not in reviews_data.keys():
-                        reviews_data["product title"] = soup.title.text.replace(
-                            "Amazon.com: Customer reviews: ", ""
-                        ).strip()
-                        reviews_data["overall rating"] = soup.find(
-                            "span", {"data-hook": "rating-out-of-text"}
-                        ).text.strip()
-                        reviews_data["total ratings"] = (
-                            soup.find("div", {"data-hook": "total-review-count"})
-                            .find("span", {"class": "a-size-base a-color-secondary"})
-                            .text.strip()
-                            .replace(" global ratings", "")
-                        )
-                        rating = soup.findAll(
-                            "tr", {"class": "a-histogram-row a-align-center"}
-                        )
-                        rating_percentages = {}
-                        for r in rating:
-                            match = RATING_PERCENTAGE_PATTERN.search(
-                                r.get("aria-label")
-                            )
-                            if match:
-                                stars = int(match.group(1))
-                                percentage = int(match.group(2))
-                                rating_percentages[stars] = percentage
-                        reviews_data["rating percentages"] = rating_percentages
-
-                    try:
-                        review = {
-                            "title": "\n".join(
-                                item.find(
-                                    "a", {"data-hook": "review-title"}
-                                ).text.split("\n")[1:]
-                            ).strip(),
-                            "rating": item.find(
-                                "i", {"data-hook": "review-star-rating"}
-                            ).text.strip(),
-                            "body": item.find(
-                                "span", {"data-hook": "review-body"}
-                            ).text.strip(),
-                        }
-                    except Exception as e:
-                        print(self.asin, e)
-                    else:
-                        if "reviews" not in reviews_data.keys():
-                            reviews_data["reviews"] = [review]
-                        else:
-                            reviews_data["reviews"].append(review)
-                return True
-            else:
+            nonlocal reached_known
+            with PAGE_PARSE_SECONDS.time():
+                reviews, errors = parse_reviews(page_source)
+            if errors:
+                PARSE_ERRORS_TOTAL.inc(len(errors))
+            for error in errors:
+                print(self.asin, error)
+            if not reviews and not errors:
                 return False
+            if "product title" not in reviews_data.keys():
+                header = parse_header(page_source)
+                if header is not None:
+                    reviews_data.update(header)
+
+            new_reviews = 0
+            for review in reviews:
+                review_id = review["id"]
+                if review_id and review_id in seen_ids:
+                    continue
+                if review_id in self.known_review_ids:
+                    reached_known = True
+                    continue
+                new_reviews += 1
+                if review_id:
+                    seen_ids.add(review_id)
+                page_reviews.append(review)
+            # A page that only repeats reviews we already have is the end,
+            # as is reaching the previous run's reviews in incremental mode
+            return (new_reviews > 0 or bool(errors)) and not reached_known
+
+        def page_url(star, page):
+            return self.review_url.replace("page_no", f"{page}").replace(
+                "no_of_star_ratings", star
+            )
+
+        def planned_pages(star):
+            # Estimate from the histogram on the first page; ratings without a
+            # written review make this an upper bound, hence the empty-page stop.
+            percentage = reviews_data.get("rating percentages", {}).get(
+                STAR_VALUES[star]
+            )
+            match = re.search(r"[\d,]+", reviews_data.get("total ratings", ""))
+            if percentage is None or not match:
+                return 1
+            total = int(match.group().replace(",", "") or 0)
+            return max(
+                1,
+                min(
+                    self.max_planned_pages,
+                    math.ceil(total * percentage / 100 / REVIEWS_PER_PAGE),
+                ),
+            )
 
         star_list = ["one_star", "two_star", "three_star"]
-        for star in star_list:
-            i = 1
-            while True:
-                review_page_url = self.review_url.replace("page_no", f"{i}").replace(
-                    "no_of_star_ratings", star
+        with ThreadPoolExecutor(max_workers=self.fetch_concurrency) as executor:
+            for star in star_list:
+                page = 1
+                reached_known = False
+                self.pages_per_star[star] = 0
+                if "total ratings" not in reviews_data:
+                    # The first page carries the histogram used for planning
+                    self.pages_per_star[star] += 1
+                    PAGES_TOTAL.inc(star=star)
+                    reviews_present = get_reviews_data(
+                        self.fetcher.fetch(page_url(star, 1))
+                    )
+                    yield from page_reviews
+                    page_reviews.clear()
+                    if not reviews_present:
+                        continue
+                    page = 2
+                # New reviews are usually within the first page or two, so
+                # incremental runs walk pages one at a time
+                planned = 1 if self.incremental else planned_pages(star)
+                exhausted = False
+                while not exhausted:
+                    # Fetch the planned pages in waves of `fetch_concurrency`;
+                    # past the plan, continue one page at a time.
+                    wave_size = min(max(planned - page + 1, 1), self.fetch_concurrency)
+                    wave = [page_url(star, p) for p in range(page, page + wave_size)]
+                    self.pages_per_star[star] += len(wave)
+                    PAGES_TOTAL.inc(len(wave), star=star)
+                    fetch = propagate(self.fetcher.fetch)
+                    for page_source in executor.map(fetch, wave):
+                        reviews_present = get_reviews_data(page_source)
+                        yield from page_reviews
+                        page_reviews.clear()
+                        if reviews_present:
+                            page += 1
+                        else:
+                            exhausted = True
+                            break
+        print(
+            f"{self.asin} pages: {self.fetcher.stats['http']} via HTTP,"
+            f" {self.fetcher.stats['browser']} via browser"
+            f" ({self.fetcher.stats['blocked']} blocked HTTP attempts),"
+            f" per star filter: {self.pages_per_star}"
+        )
+        if self.fetcher.session_cache is not None:
+            solves = self.fetcher.session_cache.solve_stats()
+            if solves["attempts"]:
+                print(
+                    f"Captcha solves this process: {solves['attempts']},"
+                    f" {solves['solve_rate']:.0%} solved,"
+                    f" {solves['mean_seconds']:.1f}s mean"
                 )
-                current_browser = self.amazon_browser.current_browser()
-                self.bypass_captcha(current_browser, review_page_url)
-                reviews_present = get_reviews_data(current_browser.page_source)
-                if reviews_present:
-                    i += 1
-                    continue
-                else:
-                    break
+        if self.incremental:
+            print(
+                f"{self.asin} incremental: {len(seen_ids)}"
+                f" new reviews since the last run"
+            )
+        reviews_data["new review ids"] = list(seen_ids)
         # print(reviews_data)
         # try:
         #     print('In_nextpage')
@@ -209,14 +800,14 @@ class AmazonScraper:
         #     break
         # else:
         #     self.amazon_browser.redirect(next_page_url)
-        return reviews_data
 
     def scrap_product_info(self, is_captcha_bypass: bool = True) -> dict:
         current_browser = self.amazon_browser.current_browser()
         if is_captcha_bypass:
             self.amazon_browser.redirect(self.product_url)
         else:
-            self.bypass_captcha(current_browser, self.product_url)
+            self.bypass_captcha(current_browser, self.product_url, self.fetcher.session_cache)
+        self.amazon_browser.pages_loaded += 1
         soup = BeautifulSoup(current_browser.page_source, "html.parser")
         info = {}
 
@@ -272,27 +863,87 @@ class AmazonScraper:
         return scrap_data
 
     def __del__(self) -> None:
-        del self.amazon_browser
+        if self._owns_browser:
+            del self.amazon_browser
 
 
 # def scrap_from_amazon(asin_number: str, sky_number: str):
 #     scraper = AmazonScraper(asin=asin_number, sky_number=sky_number)
-def scrap_from_amazon(asin_number: str):
-    scraper = AmazonScraper(asin=asin_number)
-    scrap_data = scraper()
-    del scraper
+def scrap_from_amazon(
+    asin_number: str,
+    pool: Union[BrowserPool, None] = None,
+    full_refresh: bool = False,
+):
+    pool = pool or default_browser_pool()
+    with pool.checkout() as browser:
+        scraper = AmazonScraper(
+            asin=asin_number,
+            browser=browser,
+            state_store=default_state_store(),
+            full_refresh=full_refresh,
+            session_cache=default_session_cache(),
+        )
+        scrap_data = scraper()
+        del scraper
     return scrap_data
 
 
+def record_screened(
+    asin: str,
+    reviews_data: dict,
+    unscreened: list = (),
+    state_store: Union[ScrapeStateStore, None] = None,
+) -> None:
+    """
+    Save an ASIN's header and seen review IDs once its reviews are screened,
+    leaving out `unscreened` reviews so the next incremental scrape picks
+    them up again.
+
+    Args:
+        asin (str): The scraped ASIN.
+        reviews_data (dict): As filled by `AmazonScraper.iter_reviews`.
+        unscreened (list): Reviews that got no verdict.
+        state_store (ScrapeStateStore, optional): Defaults to the process-wide store.
+    """
+    state_store = state_store or default_state_store()
+    skipped = {review.get("id") for review in unscreened}
+    review_ids = [i for i in reviews_data.get("new review ids", ()) if i not in skipped]
+    state_store.record_scrape(asin, reviews_data, review_ids)
+
+
+def stream_from_amazon(
+    asin_number: str,
+    pool: Union[BrowserPool, None] = None,
+    full_refresh: bool = False,
+    reviews_data: Union[dict, None] = None,
+):
+    """
+    Yield an ASIN's low-star reviews as each page is scraped. Product info is
+    not scraped since screening does not use it. The pooled browser is held
+    until the generator is exhausted or closed. Pass `reviews_data` to get
+    the header and new review IDs for `record_screened`.
+    """
+    pool = pool or default_browser_pool()
+    with pool.checkout() as browser:
+        scraper = AmazonScraper(
+            asin=asin_number,
+            browser=browser,
+            state_store=default_state_store(),
+            full_refresh=full_refresh,
+            session_cache=default_session_cache(),
+        )
+        yield from scraper.iter_reviews(reviews_data)
+        del scraper
+
+
 if __name__ == "__main__":
     asins = [
         "B0C88FHVFV"
     ]
-    # with ThreadPoolExecutor(max_workers=2) as executor:
-    #     futures = [executor.submit(scrap_from_amazon, no) for no in asins]
-    #     wait(futures)
-    #     results = [f.result() for f in futures]
-    # print(results)
-    for asin in asins:
-        print(asin)
-        scrap_from_amazon(asin, sky_number="SKY6966")
+    pool = BrowserPool(size=2)
+    with ThreadPoolExecutor(max_workers=pool.size) as executor:
+        futures = [executor.submit(scrap_from_amazon, no, pool) for no in asins]
+        wait(futures)
+        results = [f.result() for f in futures]
+    pool.close()
+    print(results)
@@ -1,38 +1,81 @@
 # subscriber.py
 import os
 import json
-from google.cloud import pubsub_v1
+import time
+
+try:
+    from google.cloud import pubsub_v1
+except ImportError:
+    pubsub_v1 = None
+
+from review_sink import BatchSink, make_sink
 
 credentials_path = r"xxx.json"
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = credentials_path
 
 subscription_path = "projects/qwerty-dev/subscriptions/Reviews-sub"
 
-def callback(message):
+
+def make_callback(sink: BatchSink):
     """
-    Callback function to handle incoming Pub/Sub messages.
+    Build the callback that handles incoming Pub/Sub messages.
 
     Args:
-        message (pubsub_v1.subscriber.message.Message): The message received from Pub/Sub.
+        sink (BatchSink): Where decoded messages are written. A message is
+            acked only once the sink has flushed it, and nacked if the write
+            fails.
+
+    Returns:
+        Callable: The callback for `SubscriberClient.subscribe`.
     """
-    non_compliant_reviews = json.loads(message.data.decode("utf-8"))
-    print(f" [x] Received {non_compliant_reviews}")
-    # Process the non-compliant reviews here
-    # For example, save to a file or a database
-    with open("non_compliant_reviews_output.json", "a") as fp:
-        json.dump(non_compliant_reviews, fp, indent=4)
-        fp.write('\n')
-    
-    message.ack()
+
+    def callback(message):
+        """
+        Args:
+            message (pubsub_v1.subscriber.message.Message): The message received from Pub/Sub.
+        """
+        try:
+            non_compliant_reviews = json.loads(message.data.decode("utf-8"))
+        except ValueError as e:
+            print(f" [!] Undecodable message {message.message_id}: {e}")
+            message.nack()
+            return
+        sink.put(
+            {
+                "message_id": message.message_id,
+                "sku": message.attributes.get("sku"),
+                "received_at": time.time(),
+                "data": non_compliant_reviews,
+            },
+            on_done=message.ack,
+            on_error=message.nack,
+        )
+
+    return callback
+
 
 def main():
     """
     Main function to set up the Pub/Sub subscriber and start listening for messages.
     """
+    # SINK=jsonl|sqlite|parquet, SINK_PATH overrides the output file
+    sink = make_sink(
+        os.environ.get("SINK", "jsonl"),
+        os.environ.get("SINK_PATH"),
+        max_batch=int(os.environ.get("SINK_MAX_BATCH", 500)),
+        flush_interval=float(os.environ.get("SINK_FLUSH_INTERVAL", 1.0)),
+    )
+    flow_control = pubsub_v1.types.FlowControl(
+        max_messages=int(os.environ.get("SUBSCRIBER_MAX_MESSAGES", 1000)),
+        max_bytes=int(os.environ.get("SUBSCRIBER_MAX_BYTES", 100 * 1024 * 1024)),
+    )
+
     subscriber = pubsub_v1.SubscriberClient()
     subscription_path = subscriber.subscription_path("cdnassets", "Reviews-sub")
 
-    streaming_pull_future = subscriber.subscribe(subscription_path, callback=callback)
+    streaming_pull_future = subscriber.subscribe(
+        subscription_path, callback=make_callback(sink), flow_control=flow_control
+    )
     print("Listening for messages on {}...".format(subscription_path))
 
     with subscriber:
@@ -41,6 +84,10 @@ def main():
         except KeyboardInterrupt:
             streaming_pull_future.cancel()
             streaming_pull_future.result()
+        finally:
+            # Write (and ack) whatever is still buffered
+            sink.close()
+            print(f" [x] Sink: {sink.stats()}")
 
 if __name__ == "__main__":
     main()
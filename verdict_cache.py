@@ -0,0 +1,142 @@
+# verdict_cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Union
+
+
+def normalize_body(body: str) -> str:
+    """Canonical form of a review body used for cache keys."""
+    return " ".join(unicodedata.normalize("NFC", body).split())
+
+
+def fingerprint(*parts: str) -> str:
+    """
+    Hash everything a verdict depends on besides the review itself
+    (model name, guidelines, prompt template, ...). Changing any part yields
+    new keys, so stale verdicts are never served and age out by eviction.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class VerdictCache:
+    """
+    On-disk, content-addressed store of screening verdicts.
+
+    Entries are keyed by sha256(fingerprint + normalized body), expire after
+    `max_age_days` and the least recently used ones are dropped once the
+    store grows past `max_entries`.
+    """
+
+    def __init__(
+        self,
+        path: str = "verdict_cache.sqlite3",
+        max_entries: int = 500_000,
+        max_age_days: Union[float, None] = 30,
+    ) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # bulk_screen.py workers write here concurrently
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS verdicts (
+                key TEXT PRIMARY KEY,
+                verdict TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS verdicts_last_used ON verdicts (last_used)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def key(fingerprint: str, body: str) -> str:
+        return hashlib.sha256(
+            f"{fingerprint}\0{normalize_body(body)}".encode("utf-8")
+        ).hexdigest()
+
+    def get_many(self, keys: list[str]) -> dict:
+        """
+        Look up several keys at once.
+
+        Args:
+            keys (list[str]): Cache keys built with `key`.
+
+        Returns:
+            dict: Verdicts found, by key. Expired entries count as misses.
+        """
+        now = time.time()
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, verdict, created_at FROM verdicts"
+                    f" WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for key, verdict, created_at in rows:
+                    if self.max_age is None or now - created_at < self.max_age:
+                        found[key] = json.loads(verdict)
+            if found:
+                self._conn.executemany(
+                    "UPDATE verdicts SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(set(keys)) - len(found)
+        return found
+
+    def put_many(self, items: dict) -> None:
+        """Store verdicts by key, then apply eviction."""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO verdicts (key, verdict, created_at, last_used)"
+                " VALUES (?, ?, ?, ?)",
+                [(key, json.dumps(v), now, now) for key, v in items.items()],
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        if self.max_age is not None:
+            self._conn.execute(
+                "DELETE FROM verdicts WHERE created_at < ?", (now - self.max_age,)
+            )
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM verdicts WHERE key IN"
+                " (SELECT key FROM verdicts ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": size}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()